@@ -31,24 +31,25 @@ Most consumers will want to import framework.backends and work directly with
 the helper functions here. For some more detailed uses (test cases especially)
 the modules themselves may be used.
 
-When this module is loaded it will search through framework/backends for python
-modules (those ending in .py), and attempt to import them. Then it will look
-for an attribute REGISTRY in those modules, and if it as a
-framework.register.Registry instance, it will add the name of that module (sans
-.py) as a key, and the instance as a value to the BACKENDS dictionary. Each of
-the helper functions in this module uses that dictionary to find the function
-that a user actually wants.
+Each backend is a module in framework/backends with a REGISTRY attribute, which
+is a framework.register.Registry instance. The BACKENDS mapping has the name of
+each module as a key, and its REGISTRY as the value. Each of the helper
+functions in this module uses that mapping to find the function that a user
+actually wants.
+
+Some backends are slow to import, and most commands only use one of them, so
+the modules are listed in _BACKEND_MODULES with the file extensions they load,
+and each one is only imported the first time its REGISTRY is looked up.
 
 """
 
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import collections
 import os
 import importlib
 
-import six
-
 from .register import Registry
 from .compression import COMPRESSION_SUFFIXES
 
@@ -70,26 +71,57 @@ class BackendNotImplementedError(NotImplementedError):
     pass
 
 
-def _register():
-    """Register backends.
+# The backend modules, and the extensions of the files that each one loads.
+# These must match the REGISTRY of the module.
+_BACKEND_MODULES = collections.OrderedDict([
+    ('json', ['.json']),
+    ('junit', ['.xml']),
+])
+
 
-    Walk through the list of backends and register them to a name in a
-    dictionary, so that they can be referenced from helper functions.
+class _Backends(collections.MutableMapping):
+    """A mapping of backend names to Registry instances.
+
+    The module of a backend is imported the first time its Registry is looked
+    up. Until then the extensions() method uses _BACKEND_MODULES, so that
+    finding the backend for a file doesn't import all of them.
 
     """
-    registry = {}
+    def __init__(self, modules):
+        self.__modules = modules
+        self.__registries = collections.OrderedDict(
+            (name, None) for name in modules)
+
+    def __getitem__(self, name):
+        registry = self.__registries[name]
+        if registry is None:
+            mod = importlib.import_module(
+                'framework.backends.{}'.format(name))
+            assert isinstance(mod.REGISTRY, Registry), name
+            registry = self.__registries[name] = mod.REGISTRY
+        return registry
 
-    for module in os.listdir(os.path.dirname(os.path.abspath(__file__))):
-        module, extension = os.path.splitext(module)
-        if extension == '.py':
-            mod = importlib.import_module('framework.backends.{}'.format(module))
-            if hasattr(mod, 'REGISTRY') and isinstance(mod.REGISTRY, Registry):
-                registry[module] = mod.REGISTRY
+    def __setitem__(self, name, registry):
+        self.__registries[name] = registry
 
-    return registry
+    def __delitem__(self, name):
+        del self.__registries[name]
 
+    def __iter__(self):
+        return iter(self.__registries)
 
-BACKENDS = _register()
+    def __len__(self):
+        return len(self.__registries)
+
+    def extensions(self, name):
+        """Return the extensions a backend loads, without importing it."""
+        registry = self.__registries[name]
+        if registry is None:
+            return self.__modules[name]
+        return registry.extensions
+
+
+BACKENDS = _Backends(_BACKEND_MODULES)
 
 
 def get_backend(backend):
@@ -122,6 +154,10 @@ def load(file_path):
     extension), and then pass the file path into the appropriate loader, and
     then return the TestrunResult instance.
 
+    Loaded results are stored in an on disk cache (see backends.cache), if the
+    file hasn't changed since it was last loaded the cached copy is returned
+    instead.
+
     """
     def get_extension(file_path):
         """Get the extension name to use when searching for a loader.
@@ -164,15 +200,23 @@ def load(file_path):
 
     extension, compression = get_extension(file_path)
 
-    for backend in six.itervalues(BACKENDS):
-        if extension in backend.extensions:
-            loader = backend.load
+    for name in BACKENDS:
+        if extension in BACKENDS.extensions(name):
+            loader = BACKENDS[name].load
 
             if loader is None:
                 raise BackendNotImplementedError(
                     'Loader for {} is not implemented'.format(extension))
 
-            return loader(file_path, compression)
+            # The cache imports results and the json backend, so only
+            # import it once something is actually being loaded.
+            from . import cache
+
+            result = cache.get(file_path)
+            if result is None:
+                result = loader(file_path, compression)
+                cache.put(file_path, result)
+            return result
 
     raise BackendError(
         'No module supports file extensions "{}"'.format(extension))
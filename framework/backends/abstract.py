@@ -30,6 +30,7 @@ from __future__ import (
 )
 import abc
 import contextlib
+import functools
 import itertools
 import os
 import shutil
@@ -149,6 +150,22 @@ class Backend(object):
 
         """
 
+    def write_tests(self, tests):
+        """Write many finished tests into the backend store at once.
+
+        This is meant for results that are known before the tests are
+        scheduled (such as tests that will skip), so there is no incomplete
+        status to write first. The default implementation calls write_test()
+        for each test.
+
+        Arguments:
+        tests -- an iterable of (name, TestResult) pairs
+
+        """
+        for name, data in tests:
+            with self.write_test(name) as w:
+                w(data)
+
 
 class FileBackend(Backend):
     """ A baseclass for file based backends
@@ -192,6 +209,35 @@ class FileBackend(Backend):
     def _file_extension(self):
         """The file extension of the backend."""
 
+    def _write_file(self, write):
+        """Write a new file in the tests directory.
+
+        The file is written to a temporary file which is then moved into
+        place, so it's never seen half written.
+
+        Arguments:
+        write -- a callable that writes the contents, it is passed the file
+
+        """
+        file_ = os.path.join(self._dest, 'tests', '{}.{}'.format(
+            next(self._counter), self._file_extension))
+        tfile = file_ + '.tmp'
+        with open(tfile, 'w') as f:
+            write(f)
+            self.__fsync(f)
+        shutil.move(tfile, file_)
+
+    def write_tests(self, tests):
+        """Write many finished tests.
+
+        Since the results are final there's no need for the placeholder that
+        write_test() writes, each one is written straight into it's file.
+
+        """
+        for name, data in tests:
+            self._write_file(functools.partial(self._write, name=name,
+                                               data=data))
+
     @contextlib.contextmanager
     def write_test(self, name):
         """Write a test.
@@ -0,0 +1,229 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""An on disk cache of loaded results.
+
+Loading a results file means decompressing and parsing a (potentially very
+large) json or xml file. Since summaries are often generated over and over
+again from the same files, the loaded TestrunResult is pickled into a cache
+directory, and loaded from there as long as the file hasn't changed.
+
+Entries are keyed by the path, size, and modification time of the results
+files, and the version of the results format. Partial results (those that
+would be resumed) are never cached.
+
+The cache lives in $XDG_CACHE_HOME/piglit/results (or ~/.cache if
+XDG_CACHE_HOME isn't set). Its size is capped, when an entry is added that
+takes it over the cap the least recently used entries are removed. The cap is
+read from the PIGLIT_RESULTS_CACHE_SIZE environment variable, then the
+piglit.conf [core]:results_cache_size key, finally DEFAULT_SIZE is used. The
+size is in MiB, and a size of 0 disables the cache.
+
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import errno
+import hashlib
+import os
+import tempfile
+import warnings
+
+from six.moves import cPickle as pickle
+
+from framework import results
+from framework.core import PIGLIT_CONFIG
+from .json import CURRENT_JSON_VERSION
+
+__all__ = [
+    'get',
+    'put',
+]
+
+# Bump this if the layout of the cached objects changes
+CACHE_VERSION = 1
+
+# The default size cap of the cache in MiB
+DEFAULT_SIZE = 512
+
+_SUFFIX = '.pickle'
+
+
+def get_dir():
+    """Return the directory the cache is stored in."""
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME',
+                       os.path.join(os.path.expanduser('~'), '.cache')),
+        'piglit', 'results')
+
+
+def get_size():
+    """Return the size cap of the cache in bytes."""
+    size = (os.environ.get('PIGLIT_RESULTS_CACHE_SIZE') or
+            PIGLIT_CONFIG.safe_get('core', 'results_cache_size') or
+            DEFAULT_SIZE)
+    try:
+        return int(size) * 1024 * 1024
+    except ValueError:
+        warnings.warn('Invalid results cache size "{}", using the default '
+                      'of {} MiB'.format(size, DEFAULT_SIZE))
+        return DEFAULT_SIZE * 1024 * 1024
+
+
+def _signature(file_path):
+    """Return a value that uniquely identifies the state of a results path.
+
+    Returns None if the path shouldn't be cached.
+
+    """
+    file_path = os.path.realpath(file_path)
+
+    if not os.path.isdir(file_path):
+        files = [file_path]
+    else:
+        # A directory with a tests directory is a partial run, it can still
+        # change, so don't cache it.
+        if os.path.exists(os.path.join(file_path, 'tests')):
+            return None
+        files = sorted(
+            os.path.join(file_path, f) for f in os.listdir(file_path)
+            if f.startswith('result') and not f.endswith('.old'))
+
+    stats = []
+    for each in files:
+        try:
+            stat = os.stat(each)
+        except OSError:
+            return None
+        if not os.path.isfile(each):
+            return None
+        stats.append((each, stat.st_size, stat.st_mtime))
+
+    if not stats:
+        return None
+
+    return (CACHE_VERSION, CURRENT_JSON_VERSION, file_path, tuple(stats))
+
+
+def _entry(signature):
+    """Return the path of the cache entry for a signature."""
+    return os.path.join(
+        get_dir(),
+        hashlib.sha1(repr(signature).encode('utf-8')).hexdigest() + _SUFFIX)
+
+
+def get(file_path):
+    """Return the cached TestrunResult for file_path, or None."""
+    if not get_size():
+        return None
+
+    signature = _signature(file_path)
+    if signature is None:
+        return None
+
+    entry = _entry(signature)
+    try:
+        with open(entry, 'rb') as f:
+            result = pickle.load(f)
+    except (IOError, OSError):
+        return None
+    except Exception:  # pylint: disable=broad-except
+        # A corrupt or incompatible entry, throw it away and load the
+        # results normally.
+        _remove(entry)
+        return None
+
+    # Update the modification time of the entry, this is used to find the
+    # least recently used entries.
+    try:
+        os.utime(entry, None)
+    except OSError:
+        pass
+
+    return result
+
+
+def put(file_path, result):
+    """Add a TestrunResult to the cache, evicting old entries if needed.
+
+    Failing to write to the cache is not an error, it will just be missed the
+    next time.
+
+    """
+    size = get_size()
+    if not size or not isinstance(result, results.TestrunResult):
+        return
+
+    signature = _signature(file_path)
+    if signature is None:
+        return
+
+    directory = get_dir()
+    try:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # Write to a temporary file and then rename it, so that a concurrent
+        # reader never sees a partial entry.
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp, _entry(signature))
+        except Exception:
+            _remove(temp)
+            raise
+    except (IOError, OSError, pickle.PicklingError):
+        return
+
+    _evict(directory, size)
+
+
+def _remove(path):
+    """Remove a file, ignoring it if it's already gone."""
+    try:
+        os.unlink(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _evict(directory, size):
+    """Remove the least recently used entries until the cache fits in size."""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(e[1] for e in entries)
+    for _, entry_size, path in sorted(entries):
+        if total <= size:
+            break
+        _remove(path)
+        total -= entry_size
@@ -206,6 +206,18 @@ class JSONBackend(FileBackend):
     def _write(f, name, data):
         json.dump({name: data}, f, default=piglit_encoder)
 
+    def write_tests(self, tests):
+        """Write many finished tests into a single file.
+
+        finalize() and resume merge the contents of every file in the tests
+        directory, so a file can hold any number of results.
+
+        """
+        tests = collections.OrderedDict(tests)
+        if tests:
+            self._write_file(functools.partial(
+                json.dump, tests, default=piglit_encoder))
+
 
 def load_results(filename, compression_):
     """ Loader function for TestrunResult class
@@ -21,9 +21,10 @@
 
 """ Module implementing classes for reading posix dmesg
 
-Currently this module only has the default DummyDmesg, and a LinuxDmesg.
-The method used on Linux requires that timetamps are enabled, and no other
-posix system has timestamps.
+Currently this module only has the default DummyDmesg, and two
+implementations for Linux: LinuxKmsgDmesg, which reads new records from
+/dev/kmsg, and LinuxDmesg, which runs dmesg and requires that timetamps are
+enabled. No other posix system has timestamps.
 
 On OSX and *BSD one would likely want to implement a system that reads the
 sysloger, since timestamps can be added by the sysloger, and are not inserted
@@ -39,10 +40,15 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import abc
+import collections
+import errno
 import gzip
+import itertools
+import os
 import re
 import subprocess
 import sys
+import threading
 import warnings
 
 import six
@@ -53,6 +59,7 @@ __all__ = [
     'BaseDmesg',
     'DummyDmesg',
     'LinuxDmesg',
+    'LinuxKmsgDmesg',
     'get_dmesg',
 ]
 
@@ -69,12 +76,18 @@ class BaseDmesg(object):
     override, as this method is used to to actually read the dmesg ringbuffer,
     and the command used, and the options given are OS dependent.
 
-    This class is not thread safe, because it does not black between the start
-    of the test and the reading of dmesg, which means that if two tests run at
-    the same time, and test A creates an entri in dmesg, but test B finishes
-    first, test B will be marked as having the dmesg error.
+    Tests call begin() before they start and end() after they finish. By
+    default these just call update_dmesg() and update_result(), which is not
+    thread safe, because it does not black between the start of the test and
+    the reading of dmesg, which means that if two tests run at the same time,
+    and test A creates an entri in dmesg, but test B finishes first, test B
+    will be marked as having the dmesg error. Subclasses that can attribute
+    messages to tests running at the same time set concurrent to True.
 
     """
+    # True if messages are attributed correctly when tests run concurrently
+    concurrent = False
+
     @abc.abstractmethod
     def __init__(self):
         # A list containing all messages since the last time dmesg was read.
@@ -102,6 +115,27 @@ class BaseDmesg(object):
         """
         pass
 
+    def begin(self, result):  # pylint: disable=unused-argument
+        """ Called before a test starts
+
+        Returns a token to pass to end() when the test finishes.
+
+        Arguments:
+        result -- the TestResult of the test that is starting
+
+        """
+        self.update_dmesg()
+
+    def end(self, token, result):  # pylint: disable=unused-argument
+        """ Called after a test finishes, updates its result
+
+        Arguments:
+        token -- the value returned by begin()
+        result -- the TestResult of the test that finished
+
+        """
+        return self.update_result(result)
+
     def update_result(self, result):
         """ Takes a TestResult object and updates it with dmesg statuses
 
@@ -112,6 +146,18 @@ class BaseDmesg(object):
         Arguments:
         result -- A TestResult instance
 
+        """
+        # Get a new snapshot of dmesg
+        self.update_dmesg()
+        return self._update_result(result, self._new_messages)
+
+    def _update_result(self, result, messages, lines=None):
+        """ Update result for a list of new messages
+
+        If messages is not empty (and one matches the regex, if set) the
+        statuses are replaced, and lines (which defaults to messages) are
+        stored in result.dmesg.
+
         """
         def replace(res):
             """ helper to replace statuses with the new dmesg status
@@ -126,15 +172,12 @@ class BaseDmesg(object):
                 "fail": "dmesg-fail"
             }.get(res, res)
 
-        # Get a new snapshot of dmesg
-        self.update_dmesg()
-
-        # if update_dmesg() found new entries replace the results of the test
-        # and subtests
-        if self._new_messages:
+        # if there are new entries replace the results of the test and
+        # subtests
+        if messages:
 
             if self.regex:
-                for line in self._new_messages:
+                for line in messages:
                     if self.regex.search(line):
                         break
                 else:
@@ -147,7 +190,7 @@ class BaseDmesg(object):
                 result.subtests[key] = replace(value)
 
             # Add the dmesg values to the result
-            result.dmesg = "\n".join(self._new_messages)
+            result.dmesg = "\n".join(lines or messages)
 
         return result
 
@@ -227,6 +270,196 @@ class LinuxDmesg(BaseDmesg):
         return 'LinuxDmesg()'
 
 
+_Record = collections.namedtuple('_Record', ['seq', 'line', 'pid', 'comm'])
+
+
+class LinuxKmsgDmesg(BaseDmesg):
+    """ Read new dmesg records from /dev/kmsg
+
+    This keeps /dev/kmsg open for the whole run, and reads only the records
+    that were added since the last read, without blocking. Each record has a
+    sequence number, so there is no need to search the buffer for the last
+    message seen, and records that were lost because the ring buffer wrapped
+    are simply skipped.
+
+    Only records with the same levels as LinuxDmesg.DMESG_COMMAND are kept,
+    and they are formatted with the same timestamp prefix that dmesg uses.
+
+    This is safe to use when tests run concurrently. The sequence numbers are
+    used as a clock: begin() and end() record the last sequence number read
+    when a test starts and finishes, and each record is attributed to the
+    tests whose window contains it. If the record names a process (the caller
+    field from CONFIG_PRINTK_CALLER, or a pid or comm in the message) that
+    belongs to one of those tests, it's attributed to just that test.
+    Otherwise it is attributed to all of them, and if there is more than one
+    the line is marked as ambiguous in the result.
+
+    """
+    KMSG = '/dev/kmsg'
+
+    # The lowest priority record to keep: notice
+    LEVEL = 5
+
+    concurrent = True
+
+    _PID_RE = re.compile(r'\bpid[=:]?\s*(\d+)', re.IGNORECASE)
+    _COMM_RE = re.compile(r'\bcomm[=:]?\s*([^\s,]+)|\bin (\S+) \[\d+\]',
+                          re.IGNORECASE)
+
+    def __init__(self):
+        """ Open /dev/kmsg, this raises OSError if it can't be read """
+        self._fd = os.open(self.KMSG, os.O_RDONLY | os.O_NONBLOCK)
+
+        # Start after the last record, everything already in the buffer is old
+        os.lseek(self._fd, 0, os.SEEK_END)
+
+        self._lock = threading.Lock()
+        self._records = []   # records read, but not yet seen by every test
+        self._seq = -1       # the last sequence number read
+        self._updated = -1   # the sequence number of the last update_dmesg()
+        self._windows = {}   # token: [start seq, end seq or None, result]
+        self._tokens = itertools.count()
+        super(LinuxKmsgDmesg, self).__init__()
+
+    def _read(self):
+        """ Yield each record that can be read without blocking """
+        while True:
+            try:
+                record = os.read(self._fd, 8192)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return
+                elif e.errno == errno.EPIPE:
+                    # Records were overwritten before they were read, the
+                    # next read returns the oldest record still available
+                    continue
+                raise
+            if not record:
+                return
+            yield record
+
+    @classmethod
+    def _parse(cls, record):
+        """ Parse a record into a (level, _Record) tuple
+
+        A record looks like "<prio>,<seq>,<usec>,<flags>[,...];<message>\n",
+        where prio also contains the facility, followed by lines of key=value
+        pairs that are not needed here. None is returned for malformed
+        records.
+
+        """
+        header, _, message = record.decode('utf-8', 'replace').partition(';')
+        message = message.split('\n', 1)[0]
+        fields = header.split(',')
+        try:
+            prio, seq, usec = int(fields[0]), int(fields[1]), int(fields[2])
+        except (IndexError, ValueError):
+            return None
+
+        pid = None
+        for field in fields[4:]:
+            if field.startswith('caller=T'):
+                pid = int(field[len('caller=T'):])
+        if pid is None:
+            match = cls._PID_RE.search(message)
+            if match:
+                pid = int(match.group(1))
+        match = cls._COMM_RE.search(message)
+        comm = (match.group(1) or match.group(2)) if match else None
+
+        line = '[{:5d}.{:06d}] {}'.format(usec // 1000000, usec % 1000000,
+                                          message)
+        return prio & 7, _Record(seq, line, pid, comm)
+
+    def _drain(self):
+        """ Read the new records, this must be called with the lock held """
+        for record in self._read():
+            parsed = self._parse(record)
+            if parsed is None:
+                continue
+            level, record = parsed
+            if record.seq <= self._seq:
+                continue
+            self._seq = record.seq
+            if level <= self.LEVEL:
+                self._records.append(record)
+
+    def _prune(self):
+        """ Forget records and windows that no test can need any more """
+        oldest = min([w[0] for w in six.itervalues(self._windows)
+                      if w[1] is None] + [self._seq])
+        self._records = [r for r in self._records if r.seq > oldest]
+        for token, window in list(six.iteritems(self._windows)):
+            if window[1] is not None and window[1] <= oldest:
+                del self._windows[token]
+
+    def update_dmesg(self):
+        """ Read the records added since the last call """
+        with self._lock:
+            self._drain()
+            self._new_messages = [r.line for r in self._records
+                                  if r.seq > self._updated]
+            self._updated = self._seq
+            self._prune()
+
+    @staticmethod
+    def _owns(result, record):
+        """ Return True if the record names a process of result's test """
+        if record.pid is not None and record.pid in result.pid:
+            return True
+        if record.comm is not None and result.command:
+            comm = os.path.basename(result.command.split(' ', 1)[0])
+            # The kernel truncates comm to 15 characters
+            return comm[:15] == record.comm[:15]
+        return False
+
+    def begin(self, result):
+        """ Open a window for a test, starting at the last record read """
+        with self._lock:
+            self._drain()
+            token = next(self._tokens)
+            self._windows[token] = [self._seq, None, result]
+        return token
+
+    def end(self, token, result):
+        """ Close a test's window, and attribute the records in it """
+        with self._lock:
+            self._drain()
+            window = self._windows[token]
+            window[1] = self._seq
+
+            messages = []
+            lines = []
+            for record in self._records:
+                if not window[0] < record.seq <= window[1]:
+                    continue
+
+                overlapping = [
+                    w[2] for w in six.itervalues(self._windows)
+                    if w[0] < record.seq and (w[1] is None or
+                                              record.seq <= w[1])]
+                owners = [r for r in overlapping if self._owns(r, record)]
+                if owners:
+                    if not any(r is result for r in owners):
+                        continue
+                else:
+                    owners = overlapping
+
+                messages.append(record.line)
+                if len(owners) > 1:
+                    lines.append('{} (ambiguous: {} tests were running)'.format(
+                        record.line, len(owners)))
+                else:
+                    lines.append(record.line)
+
+            self._prune()
+
+        return self._update_result(result, messages, lines)
+
+    def __repr__(self):
+        return 'LinuxKmsgDmesg()'
+
+
 class DummyDmesg(BaseDmesg):
     """ An dummy class for dmesg on non unix-like systems
 
@@ -237,6 +470,8 @@ class DummyDmesg(BaseDmesg):
     """
     DMESG_COMMAND = []
 
+    concurrent = True
+
     def __init__(self):
         pass
 
@@ -259,7 +494,12 @@ def get_dmesg(not_dummy=True):
     your system. However, if Dummy is True then it will always return a
     DummyDmesg instance.
 
+    On Linux /dev/kmsg is used if it can be read, otherwise dmesg is run.
+
     """
     if sys.platform.startswith('linux') and not_dummy:
-        return LinuxDmesg()
+        try:
+            return LinuxKmsgDmesg()
+        except (OSError, IOError):
+            return LinuxDmesg()
     return DummyDmesg()
@@ -0,0 +1,461 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""A database of test status timelines built from many results.
+
+Pairwise summaries can only say what changed between runs. The history
+database records the status of every test (and subtest) in every run that has
+been ingested, so that questions like "when did this test start failing" and
+"how often does this test flip" can be answered.
+
+Each test has a Timeline, which stores its statuses as a run-length encoded
+list of [status, count] pairs, and the total time and number of timed runs for
+computing an average duration. Tests that are missing from a run are recorded
+as notrun, so every timeline ends at the latest run.
+
+The database is a directory holding:
+index.jsonl -- a line naming each ingested run, in order
+segments.jsonl -- a line for each run since the checkpoint, with only the
+                  tests whose status changed in that run, and the durations
+timelines.json -- a checkpoint of the run-length encoded timelines, compressed
+                  with piglit's compression mode
+
+Ingesting a run appends one segment and one index line, and never rewrites
+what is already there. Once COMPACT_AFTER segments have built up they are
+folded into a new checkpoint, so rebuilding the timelines for a query reads
+the checkpoint and at most that many segments. Loading only reads the index,
+which is enough to tell whether a run has already been ingested.
+
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import collections
+import datetime
+import os
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import six
+
+from framework import exceptions, grouptools
+from framework import status as so
+from framework.backends import compression
+
+__all__ = [
+    'History',
+    'Timeline',
+    'get_default_path',
+]
+
+# Bump this if the format of the database changes
+HISTORY_VERSION = 3
+
+# The number of segments to keep before writing a new checkpoint
+COMPACT_AFTER = 32
+
+
+def get_default_path():
+    """Return the default location of the database."""
+    return os.path.join(
+        os.environ.get('XDG_DATA_HOME',
+                       os.path.join(os.path.expanduser('~'), '.local',
+                                    'share')),
+        'piglit', 'history')
+
+
+def _get_compression(path):
+    """Return the compression mode to use based on the path's suffix."""
+    suffix = os.path.splitext(path)[1]
+    if suffix in compression.COMPRESSION_SUFFIXES:
+        return suffix[1:]
+    return 'none'
+
+
+def _checkpoints(path):
+    """Yield the paths a checkpoint could have, one for each compression."""
+    yield os.path.join(path, 'timelines.json')
+    for suffix in compression.COMPRESSION_SUFFIXES:
+        yield os.path.join(path, 'timelines.json' + suffix)
+
+
+def _flatten(run):
+    """Return a dict of name: [status, time] for each test and subtest."""
+    tests = {}
+    for name, result in six.iteritems(run.tests):
+        if result.subtests:
+            for sub, status in six.iteritems(result.subtests):
+                tests[grouptools.join(name, sub)] = [
+                    six.text_type(status), None]
+        else:
+            tests[name] = [six.text_type(result.result), result.time.total]
+    return tests
+
+
+def _is_bad(status):
+    """Returns True if a status counts as failing."""
+    return status > so.PASS
+
+
+class Timeline(object):
+    """The statuses of a single test across all ingested runs.
+
+    Arguments:
+    start -- the index of the first run the timeline covers. Earlier runs
+             didn't contain the test.
+
+    """
+    __slots__ = ['start', 'statuses', 'time', 'timed']
+
+    def __init__(self, start=0):
+        self.start = start
+        self.statuses = []
+        self.time = 0.0
+        self.timed = 0
+
+    def __len__(self):
+        return sum(c for _, c in self.statuses)
+
+    @property
+    def last(self):
+        """The status of the test in the latest run."""
+        return self.statuses[-1][0]
+
+    def append(self, status, time=None):
+        """Add the status of the test for the next run."""
+        status = six.text_type(status)
+        if self.statuses and self.statuses[-1][0] == status:
+            self.statuses[-1][1] += 1
+        else:
+            self.statuses.append([status, 1])
+
+        if time is not None:
+            self.time += time
+            self.timed += 1
+
+    def _ran(self):
+        """Yield (run index, Status) for each run the test was run in."""
+        index = self.start
+        for status, count in self.statuses:
+            status = so.status_lookup(status)
+            if status is not so.NOTRUN:
+                for i in six.moves.range(index, index + count):
+                    yield i, status
+            index += count
+
+    @property
+    def first_bad(self):
+        """The index of the run the current failure streak started, or None.
+
+        If the test isn't failing in the last run it was run in this is None.
+
+        """
+        first = None
+        for i, status in self._ran():
+            if _is_bad(status):
+                if first is None:
+                    first = i
+            elif status is not so.SKIP:
+                first = None
+        return first
+
+    @property
+    def flips(self):
+        """The number of changes in status, and the number of chances to
+        change.
+
+        Runs where the test wasn't run are ignored, and changes to and from
+        skip are not counted.
+
+        """
+        flips = 0
+        chances = 0
+        prev = None
+        for _, status in self._ran():
+            if status is so.SKIP:
+                continue
+            if prev is not None:
+                chances += 1
+                if status != prev:
+                    flips += 1
+            prev = status
+        return flips, chances
+
+    def to_json(self):
+        return {
+            'start': self.start,
+            'statuses': self.statuses,
+            'time': self.time,
+            'timed': self.timed,
+        }
+
+    @classmethod
+    def from_dict(cls, dict_):
+        inst = cls(dict_['start'])
+        inst.statuses = dict_['statuses']
+        inst.time = dict_['time']
+        inst.timed = dict_['timed']
+        return inst
+
+
+_Row = collections.namedtuple(
+    '_Row', ['name', 'first_bad', 'flip_rate', 'average_time', 'tests'])
+
+
+class History(object):
+    """A collection of Timelines, one for each test ever ingested.
+
+    Arguments:
+    path -- the directory the database is stored in. If this is None the
+            database only exists in memory.
+
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.runs = []
+        self._ids = set()
+        # The number of runs the checkpoint covers
+        self._checkpoint = 0
+        # Without a path there is nothing to build the timelines from, so they
+        # are kept up to date from the start.
+        self._tests = {} if path is None else None
+
+    def __contains__(self, run):
+        return self._identity(run) in self._ids
+
+    @staticmethod
+    def _identity(run):
+        return (run.name, run.time_elapsed.start)
+
+    @property
+    def tests(self):
+        """A dict of test name: Timeline, built on first use."""
+        if self._tests is None:
+            self._tests = {}
+            self._load_checkpoint()
+
+            # A segment that was written without its index line (because
+            # piglit was killed in between) is replaced when that run index is
+            # ingested again, so the last segment for each index wins.
+            segments = {}
+            path = os.path.join(self.path, 'segments.jsonl')
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    for line in f:
+                        segment = json.loads(line)
+                        segments[segment['run']] = segment
+            for index in six.moves.range(self._checkpoint, len(self.runs)):
+                segment = segments[index]
+                self._apply(index, segment['statuses'], segment['time'])
+        return self._tests
+
+    def _load_checkpoint(self):
+        """Read the timelines of the checkpoint, if there is one."""
+        for path in _checkpoints(self.path):
+            if os.path.exists(path):
+                with compression.DECOMPRESSORS[_get_compression(path)](
+                        path) as f:
+                    checkpoint = json.load(f)
+                self._checkpoint = checkpoint['runs']
+                self._tests = dict(
+                    (n, Timeline.from_dict(t))
+                    for n, t in six.iteritems(checkpoint['tests']))
+                return
+
+    def _changes(self, tests):
+        """Return the statuses that changed and the durations of a run."""
+        statuses = {}
+        times = {}
+        for name, (status, time) in six.iteritems(tests):
+            timeline = self.tests.get(name)
+            if timeline is None or timeline.last != status:
+                statuses[name] = status
+            if time is not None:
+                times[name] = time
+
+        notrun = six.text_type(so.NOTRUN)
+        for name, timeline in six.iteritems(self.tests):
+            if name not in tests and timeline.last != notrun:
+                statuses[name] = notrun
+        return statuses, times
+
+    def _apply(self, index, statuses, times):
+        """Append run index to the end of every timeline.
+
+        Only the statuses that changed are given, every other test keeps its
+        last status.
+
+        """
+        for name in statuses:
+            if name not in self._tests:
+                self._tests[name] = Timeline(index)
+
+        for name, timeline in six.iteritems(self._tests):
+            status = statuses[name] if name in statuses else timeline.last
+            timeline.append(status, times.get(name))
+
+    def ingest(self, run):
+        """Append a TestrunResult to the end of every timeline.
+
+        If the database has a path the run is written out immediately.
+
+        """
+        index = len(self.runs)
+        statuses, times = self._changes(_flatten(run))
+        entry = {
+            'name': run.name,
+            'start': run.time_elapsed.start,
+        }
+
+        if self.path is not None:
+            # The segment is written first, so a run only counts as ingested
+            # once its line is in the index.
+            self._append('segments.jsonl',
+                         {'run': index, 'statuses': statuses, 'time': times})
+            self._append('index.jsonl', entry,
+                         {'history_version': HISTORY_VERSION})
+
+        self.runs.append(entry)
+        self._ids.add(self._identity(run))
+        self._apply(index, statuses, times)
+
+        if (self.path is not None and
+                len(self.runs) - self._checkpoint >= COMPACT_AFTER):
+            self._compact()
+
+    def _append(self, name, entry, header=None):
+        """Append a line to a file, starting it with header if it's new."""
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        path = os.path.join(self.path, name)
+        lines = [json.dumps(entry)]
+        if header is not None and not os.path.exists(path):
+            lines.insert(0, json.dumps(header))
+        with open(path, 'a') as f:
+            f.write(''.join(l + '\n' for l in lines))
+
+    def _compact(self):
+        """Write the timelines to a new checkpoint, and drop the segments.
+
+        Each step leaves a database that loads correctly: until the segments
+        are emptied they still cover the runs after any older checkpoint.
+
+        """
+        mode = compression.get_mode()
+        path = os.path.join(
+            self.path,
+            'timelines.json' + ('' if mode == 'none' else '.' + mode))
+        temp = os.path.join(self.path, '.tmp-' + os.path.basename(path))
+        with compression.COMPRESSORS[mode](temp) as f:
+            json.dump({'runs': len(self.runs), 'tests': self._tests}, f,
+                      default=lambda o: o.to_json())
+        os.rename(temp, path)
+
+        for old in _checkpoints(self.path):
+            if old != path and os.path.exists(old):
+                os.unlink(old)
+        open(os.path.join(self.path, 'segments.jsonl'), 'w').close()
+        self._checkpoint = len(self.runs)
+
+    def _row(self, name, timelines):
+        """Build a row of query results over one or more timelines."""
+        first_bad = None
+        flips = 0
+        chances = 0
+        time = 0.0
+        timed = 0
+        for timeline in timelines:
+            bad = timeline.first_bad
+            if bad is not None and (first_bad is None or bad < first_bad):
+                first_bad = bad
+            f, c = timeline.flips
+            flips += f
+            chances += c
+            time += timeline.time
+            timed += timeline.timed
+
+        return _Row(
+            name=name,
+            first_bad=self.runs[first_bad]['name'] if first_bad is not None
+            else None,
+            flip_rate=flips / chances if chances else 0.0,
+            average_time=time / timed if timed else None,
+            tests=len(timelines))
+
+    def query(self, names, group=False):
+        """Return rows of first bad run, flip rate and average time.
+
+        Each name may be a test or a group. If group is False there is one
+        row for each test in, or matching, names. Otherwise there is a single
+        row for each name, aggregating all of the tests in it.
+
+        """
+        rows = []
+        for name in names:
+            name = name.lower()
+            prefix = name + grouptools.SEPARATOR
+            matches = sorted(t for t in self.tests
+                             if not name or t == name or t.startswith(prefix))
+            if group:
+                rows.append(self._row(name, [self.tests[t] for t in matches]))
+            else:
+                rows.extend(self._row(t, [self.tests[t]]) for t in matches)
+        return rows
+
+    @classmethod
+    def load(cls, path):
+        """Load the index of a database, or return an empty one if it doesn't
+        exist.
+        """
+        inst = cls(path)
+        index = os.path.join(path, 'index.jsonl')
+        if not os.path.exists(index):
+            inst._tests = {}
+            return inst
+
+        with open(index, 'r') as f:
+            version = json.loads(f.readline()).get('history_version')
+            if version != HISTORY_VERSION:
+                raise exceptions.PiglitFatalError(
+                    'Unsupported history database version "{}"'.format(
+                        version))
+            for line in f:
+                entry = json.loads(line)
+                inst.runs.append(entry)
+                inst._ids.add((entry['name'], entry['start']))
+        return inst
+
+
+def format_row(row):
+    """Format a query row for printing."""
+    return '{name}: first bad: {bad}, flip rate: {rate:.3f}, ' \
+           'average time: {time}'.format(
+               name=grouptools.format(row.name) or 'all',
+               bad=row.first_bad or '-',
+               rate=row.flip_rate,
+               time=(str(datetime.timedelta(seconds=row.average_time))
+                     if row.average_time is not None else '-'))
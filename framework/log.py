@@ -31,6 +31,9 @@ from __future__ import (
 )
 import sys
 import abc
+import bisect
+import math
+import time
 import itertools
 import threading
 import collections
@@ -41,6 +44,7 @@ except ImportError:
 
 import six
 from six.moves.BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn
 
 from framework.core import PIGLIT_CONFIG
 from framework import grouptools
@@ -104,6 +108,11 @@ class QuietLog(BaseLog):
     It uses \r to print over the same line when printing to a tty. If
     sys.stdout is not a tty then it prints \n at the end of the line instead
 
+    When the shared state has a renderer (LogManager always adds one) the
+    tests only update the counters in the state, and all printing is done by
+    the renderer thread, at a fixed rate. Without a renderer everything is
+    printed immediately by the calling thread.
+
     Arguments:
     status -- the status to print
 
@@ -127,7 +136,11 @@ class QuietLog(BaseLog):
         # This cannot be done in the constructor, since the constructor gets
         # called for the final summary too.
         with self._LOCK:
-            self._state['running'].append(self.__counter)
+            self._start(name)
+
+    def _start(self, name):  # pylint: disable=unused-argument
+        """ non-locked helper for start """
+        self._state['running'].append(self.__counter)
 
     def _log(self, status):
         """ non-locked helper for logging
@@ -144,7 +157,7 @@ class QuietLog(BaseLog):
             'Invalid status for logger: {}'.format(status)
         self._state['summary'][status] += 1
 
-        self._print_summary()
+        self._refresh()
         self._state['running'].remove(self.__counter)
 
     def log(self, status):
@@ -152,20 +165,44 @@ class QuietLog(BaseLog):
             self._log(status)
 
     def summary(self):
+        renderer = self._state.get('renderer')
+        if renderer is not None:
+            # Let the renderer print anything that is still queued
+            renderer.stop()
         with self._LOCK:
             self._print_summary()
             self._print('\n')
 
-    def _print_summary(self):
-        """ Print the summary result
+    def _refresh(self):
+        """ Print the status line, or tell the renderer that it changed
 
-        this prints '[done/total] {status}', it is a private method hidden from
-        the children of this class (VerboseLog)
+        This must be called with the lock held.
+
+        """
+        renderer = self._state.get('renderer')
+        if renderer is None:
+            self._print_summary()
+        else:
+            renderer.refresh(self)
+
+    def _output(self, func, *args):
+        """ Call an output function now, or queue it for the renderer
+
+        This must be called with the lock held, so that output is queued in
+        the same order the state is changed.
 
         """
+        renderer = self._state.get('renderer')
+        if renderer is None:
+            func(*args)
+        else:
+            renderer.queue(func, args)
+
+    def _format_summary(self):
+        """ Return the summary line, this must be called with the lock held """
         assert self._LOCK.locked()
 
-        out = '[{done}/{total}] {status} {running}'.format(
+        return '[{done}/{total}] {status} {running}'.format(
             done=str(self._state['complete']).zfill(self._pad),
             total=str(self._state['total']).zfill(self._pad),
             status=', '.join('{0}: {1}'.format(k, v) for k, v in
@@ -173,12 +210,22 @@ class QuietLog(BaseLog):
             running=''.join('|/-\\'[x % 4] for x in self._state['running'])
         )
 
-        self._print(out)
+    def _print_summary(self):
+        """ Print the summary result
+
+        this prints '[done/total] {status}', it is a private method hidden from
+        the children of this class (VerboseLog)
+
+        """
+        self._print(self._format_summary())
 
     def _print(self, out):
-        """ Shared print method that ensures any bad lines are overwritten """
-        assert self._LOCK.locked()
+        """ Shared print method that ensures any bad lines are overwritten
 
+        This is only ever called by one thread at a time, either with the lock
+        held or from the renderer.
+
+        """
         # If the new line is shorter than the old one add trailing
         # whitespace
         pad = self._state['lastlength'] - len(out)
@@ -224,18 +271,28 @@ class VerboseLog(QuietLog):
             sys.stdout.write('\n')
             sys.stdout.flush()
 
-    def start(self, name):
+    def _print_line(self, out, reset=False):
+        """ Print a static line
+
+        If reset is True the length of the last line is forgotten, so no
+        padding is printed after the next line.
+
+        """
+        self._print(out, newline=True)
+        if reset:
+            self._state['lastlength'] = 0
+
+    def _start(self, name):
         """ Print the test that is being run next
 
         This printings a running: <testname> message before the test run
         starts.
 
         """
-        super(VerboseLog, self).start(name)
-        with self._LOCK:
-            self._print('running: {}'.format(name), newline=True)
-            self.__name = name
-            self._print_summary()
+        super(VerboseLog, self)._start(name)
+        self._output(self._print_line, 'running: {}'.format(name))
+        self.__name = name
+        self._refresh()
 
     def _log(self, value):
         """ Print a message after the test finishes
@@ -244,14 +301,72 @@ class VerboseLog(QuietLog):
         before calling super() to print the status line.
 
         """
-        self._print('{0}: {1}'.format(value, self.__name), newline=True)
-
         # Set lastlength to 0, this prevents printing needless padding in
         # super()
-        self._state['lastlength'] = 0
+        self._output(self._print_line, '{0}: {1}'.format(value, self.__name),
+                     True)
         super(VerboseLog, self)._log(value)
 
 
+class _Renderer(threading.Thread):
+    """ A thread that does all of the printing for QuietLog and VerboseLog
+
+    Tests only update the shared counters (holding the lock for just that
+    long), and queue any static lines they need printed. This thread wakes up
+    at a fixed rate, takes the queued lines and formats the status line with
+    the lock held, and then prints them without it. This means that test
+    threads never wait on the terminal, and the status line is redrawn at most
+    rate times per second no matter how fast tests finish.
+
+    Arguments:
+    state_lock -- the lock protecting the shared state
+
+    Keyword Arguments:
+    rate -- the number of times per second to redraw. Default: 10
+
+    """
+    def __init__(self, state_lock, rate=10):
+        super(_Renderer, self).__init__()
+        self.daemon = True
+        self.__lock = state_lock
+        self.__interval = 1.0 / rate
+        self.__queue = collections.deque()
+        self.__log = None
+        self.__done = threading.Event()
+
+    def queue(self, func, args):
+        """ Queue an output function to be called by the renderer """
+        self.__queue.append((func, args))
+
+    def refresh(self, log):
+        """ Mark the status line as changed, log will be used to draw it """
+        self.__log = log
+
+    def __render(self):
+        with self.__lock:
+            ops = []
+            while self.__queue:
+                ops.append(self.__queue.popleft())
+            log, self.__log = self.__log, None
+            out = log._format_summary() if log is not None else None
+
+        for func, args in ops:
+            func(*args)
+        if out is not None:
+            log._print(out)
+
+    def run(self):
+        while not self.__done.wait(self.__interval):
+            self.__render()
+        self.__render()
+
+    def stop(self):
+        """ Stop the thread, after printing anything that is queued """
+        if self.is_alive():
+            self.__done.set()
+            self.join()
+
+
 class DummyLog(BaseLog):
     """ A Logger that does nothing """
     def __init__(self, state, state_lock):
@@ -267,44 +382,293 @@ class DummyLog(BaseLog):
         pass
 
 
+class _EventStream(object):
+    """ A bounded buffer of test events, with waiting for new events
+
+    Events are numbered in order, and the last maxlen of them are kept so that
+    a client that reconnects can pick up where it left off. The stream has
+    its own condition, so waiting on it never blocks the state lock.
+
+    Keyword Arguments:
+    maxlen -- the number of events to keep. Default: 1000
+
+    """
+    def __init__(self, maxlen=1000):
+        self.__events = collections.deque(maxlen=maxlen)
+        self.__cond = threading.Condition()
+        self.__next = 0
+        self.closed = False
+
+    def publish(self, kind, data):
+        """ Add an event to the stream and wake any waiting clients """
+        with self.__cond:
+            self.__events.append((self.__next, kind, data))
+            self.__next += 1
+            self.__cond.notify_all()
+
+    def close(self):
+        """ Mark the stream as finished, no more events will be published """
+        with self.__cond:
+            self.closed = True
+            self.__cond.notify_all()
+
+    def since(self, last, timeout=None):
+        """ Return the events after the event numbered last
+
+        If there are none and the stream isn't closed this waits up to timeout
+        seconds for one to be published. A last of None returns only events
+        published after the call.
+
+        """
+        with self.__cond:
+            if last is None:
+                last = self.__next - 1
+            if self.__next - 1 <= last and not self.closed:
+                self.__cond.wait(timeout)
+            return [e for e in self.__events if e[0] > last], last
+
+
+class _Histogram(object):
+    """ Counts of test durations in fixed buckets
+
+    This takes the same space however many tests finish, so copying it for a
+    request is cheap. It isn't thread safe, it's protected by the state lock
+    like the rest of the shared state.
+
+    """
+    # The upper bounds of the buckets, in seconds. The last bucket catches
+    # everything else.
+    BOUNDS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+              60.0, 300.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """ Count a duration """
+        self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.sum += value
+
+    def copy(self):
+        """ Return a copy, for taking a snapshot """
+        new = _Histogram()
+        new.counts = list(self.counts)
+        new.sum = self.sum
+        return new
+
+    def buckets(self):
+        """ Return (upper bound, cumulative count) pairs, like Prometheus """
+        total = 0
+        for bound, count in zip(self.BOUNDS + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
 class HTTPLogServer(threading.Thread):
+    """ A thread serving live status information about a run over http
+
+    The following paths are served:
+    /summary -- a JSON object with the counts of completed and running tests
+    /running -- a JSON list of running tests and how long they've been running
+    /metrics -- the same counters, test rate and durations in the Prometheus
+                text format
+    /events  -- every test start and result as a Server-Sent Events stream
+
+    Each request is handled on its own thread. Handlers copy what they need
+    out of the shared state with the lock held, and release it before writing
+    anything to the socket, so a slow client never stalls the tests.
+
+    The server stops after it has served /summary for a finished run, so that
+    a client can always get the final results.
+
+    Arguments:
+    state -- the state dict from LogManager
+    state_lock -- the lock protecting state
+
+    """
+    class _Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
     class RequestHandler(BaseHTTPRequestHandler):
         INDENT = 4
 
+        # How long an event stream waits before sending a keepalive comment
+        KEEPALIVE = 15
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            # Don't print each request on stderr, it would break up the
+            # terminal output of the run
+            pass
+
+        def _send(self, body, content_type):
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _snapshot(self):
+            """ Copy the state that the handlers need, under the lock """
+            state = self.server.state
+            with self.server.state_lock:
+                return {
+                    'complete': state['complete'],
+                    'running': list(state['running']),
+                    'total': state['total'],
+                    'results': dict(state['summary']),
+                    'started': dict(state['started']),
+                    'durations': state['durations'].copy(),
+                    'start_time': state['start_time'],
+                }
+
         def do_GET(self):
-            if self.path == "/summary":
-                self.send_response(200)
-                self.end_headers()
-                with self.server.state_lock:
-                    status = {
-                        "complete": self.server.state["complete"],
-                        "running" : self.server.state["running"],
-                        "total"   : self.server.state["total"],
-                        "results" : self.server.state["summary"],
-                    }
-                self.wfile.write(json.dumps(status, indent=self.INDENT))
+            path = self.path.split('?', 1)[0]
+            if path == '/summary':
+                self._summary()
+            elif path == '/running':
+                self._running()
+            elif path == '/metrics':
+                self._metrics()
+            elif path == '/events':
+                self._events()
             else:
                 self.send_response(404)
                 self.end_headers()
 
+        def _summary(self):
+            snap = self._snapshot()
+            status = {
+                "complete": snap["complete"],
+                "running" : snap["running"],
+                "total"   : snap["total"],
+                "results" : snap["results"],
+            }
+            self._send(json.dumps(status, indent=self.INDENT),
+                       'application/json')
+
+            if snap['complete'] == snap['total']:
+                self.server.finished.set()
+
+        def _running(self):
+            snap = self._snapshot()
+            now = time.time()
+            running = sorted(
+                ({'name': n, 'elapsed': now - s}
+                 for n, s in six.iteritems(snap['started'])),
+                key=lambda x: x['elapsed'], reverse=True)
+            self._send(json.dumps(running, indent=self.INDENT),
+                       'application/json')
+
+        def _metrics(self):
+            snap = self._snapshot()
+            durations = snap['durations']
+            elapsed = time.time() - snap['start_time']
+
+            lines = []
+
+            def metric(name, kind, help_, values):
+                lines.append('# HELP piglit_{} {}'.format(name, help_))
+                lines.append('# TYPE piglit_{} {}'.format(name, kind))
+                for labels, value in values:
+                    lines.append('piglit_{}{} {}'.format(name, labels, value))
+
+            metric('tests_total', 'gauge', 'Number of tests in the run',
+                   [('', snap['total'])])
+            metric('tests_complete', 'counter', 'Number of tests finished',
+                   [('', snap['complete'])])
+            metric('tests_running', 'gauge', 'Number of tests running',
+                   [('', len(snap['running']))])
+            metric('tests_per_second', 'gauge',
+                   'Average rate tests have finished at',
+                   [('', snap['complete'] / elapsed if elapsed > 0 else 0.0)])
+            metric('test_results', 'counter', 'Number of tests per status',
+                   [('{{status="{}"}}'.format(k), v) for k, v in
+                    sorted(six.iteritems(snap['results']))])
+            buckets = list(durations.buckets())
+            metric('test_duration_seconds', 'histogram',
+                   'Time taken by finished tests',
+                   [('_bucket{{le="{}"}}'.format(
+                       '+Inf' if math.isinf(b) else b), c)
+                    for b, c in buckets] +
+                   [('_sum', durations.sum),
+                    ('_count', buckets[-1][1])])
+
+            self._send('\n'.join(lines) + '\n',
+                       'text/plain; version=0.0.4')
+
+        def _events(self):
+            stream = self.server.state['events']
+            last = self.headers.get('Last-Event-ID')
+            last = int(last) if last and last.isdigit() else None
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+
+            try:
+                while True:
+                    events, last = stream.since(last, self.KEEPALIVE)
+                    if not events:
+                        if stream.closed:
+                            break
+                        self.wfile.write(b':\n\n')
+                    for num, kind, data in events:
+                        self.wfile.write(
+                            'id: {}\nevent: {}\ndata: {}\n\n'.format(
+                                num, kind, json.dumps(data)).encode('utf-8'))
+                        last = num
+                    self.wfile.flush()
+            except (IOError, OSError):
+                # The client went away
+                pass
+
     def __init__(self, state, state_lock):
         super(HTTPLogServer, self).__init__()
         port = int(PIGLIT_CONFIG.safe_get("http", "port", fallback=8080))
-        self._httpd = HTTPServer(("", port), HTTPLogServer.RequestHandler)
+        self._httpd = self._Server(("", port), HTTPLogServer.RequestHandler)
         self._httpd.state = state
         self._httpd.state_lock = state_lock
+        self._httpd.finished = threading.Event()
+
+    @property
+    def port(self):
+        """ The port the server is listening on """
+        return self._httpd.server_address[1]
 
     def run(self):
-        while True:
-            with self._httpd.state_lock:
-                # stop handling requests after the request for the final results
-                if self._httpd.state["complete"] == self._httpd.state["total"]:
-                    break;
-            self._httpd.handle_request()
+        with self._httpd.state_lock:
+            if self._httpd.state["complete"] == self._httpd.state["total"]:
+                self._httpd.finished.set()
+
+        watcher = threading.Thread(target=self.__wait_finished)
+        watcher.daemon = True
+        watcher.start()
+        self._httpd.serve_forever()
+        self._httpd.server_close()
+
+    def __wait_finished(self):
+        self._httpd.finished.wait()
+        self._httpd.shutdown()
+
+    def stop(self):
+        """ Stop serving, without waiting for a request for the results """
+        self._httpd.finished.set()
+        self.join()
 
 
 class HTTPLog(BaseLog):
-    """ A Logger that serves status information over http """
+    """ A Logger that serves status information over http
+
+    Besides the counters it records when each running test started and how
+    long each finished test took, and publishes an event for each start and
+    result to the state's event stream. See HTTPLogServer for how these are
+    served.
+
+    """
 
     def __init__(self, state, state_lock):
         super(HTTPLog, self).__init__(state, state_lock)
@@ -314,6 +678,8 @@ class HTTPLog(BaseLog):
         with self._LOCK:
             self._name = name
             self._state['running'].append(self._name)
+            self._state['started'][self._name] = time.time()
+        self._state['events'].publish('start', {'name': name})
 
     def log(self, status):
         with self._LOCK:
@@ -321,9 +687,22 @@ class HTTPLog(BaseLog):
             self._state['complete'] += 1
             assert status in self.SUMMARY_KEYS
             self._state['summary'][str(status)] += 1
+            duration = time.time() - self._state['started'].pop(self._name)
+            self._state['durations'].observe(duration)
+            complete = self._state['complete']
+            done = complete == self._state['total']
+
+        self._state['events'].publish('result', {
+            'name': self._name,
+            'status': str(status),
+            'duration': duration,
+            'complete': complete,
+        })
+        if done:
+            self._state['events'].close()
 
     def summary(self):
-        pass
+        self._state['events'].close()
 
 
 class LogManager(object):
@@ -363,11 +742,52 @@ class LogManager(object):
         }
         self._state_lock = threading.Lock()
 
+        # The terminal loggers do their printing from a separate thread, so
+        # that the test threads never wait on the terminal
+        if issubclass(self._log, QuietLog):
+            self._state['renderer'] = _Renderer(self._state_lock)
+            self._state['renderer'].start()
+
         # start the http server for http logger
+        self.log_server = None
         if logger == 'http':
+            self._state['started'] = {}
+            self._state['durations'] = _Histogram()
+            self._state['start_time'] = time.time()
+            self._state['events'] = _EventStream()
             self.log_server = HTTPLogServer(self._state, self._state_lock)
             self.log_server.start()
 
     def get(self):
         """ Return a new log instance """
         return self._log(self._state, self._state_lock)
+
+    def close(self):
+        """ Stop the threads started for the logger
+
+        Anything still queued for the terminal is printed first. The http
+        server keeps serving until a client has fetched the final summary, so
+        it is only stopped here if the run didn't finish, since then that will
+        never happen.
+
+        """
+        renderer = self._state.get('renderer')
+        if renderer is not None:
+            renderer.stop()
+
+        if self.log_server is not None:
+            with self._state_lock:
+                done = self._state['complete'] == self._state['total']
+            if not done:
+                self.log_server.stop()
+
+    def record(self, status, count):
+        """Count tests that finished without being run.
+
+        This is used for tests that are resolved before they are scheduled,
+        like tests that will skip, without starting and logging each one.
+
+        """
+        with self._state_lock:
+            self._state['complete'] += count
+            self._state['summary'][status] += count
@@ -0,0 +1,161 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Merge several results into a single TestrunResult.
+
+This is used to combine the results of a run that was split across machines
+(shards). The results are loaded in parallel, but only a bounded number at a
+time, and each one is folded into the merged result and released as soon as
+it is loaded, so memory use depends on the number of tests, not the number of
+results being merged.
+
+When a test appears in more than one result a policy decides which result is
+kept, see POLICIES.
+
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import collections
+import multiprocessing
+import multiprocessing.dummy
+
+import six
+
+from framework import backends, results
+from framework import status as so
+
+__all__ = [
+    'POLICIES',
+    'Merger',
+    'merge',
+]
+
+
+def _worst(old, new):
+    """Keep the result with the worst status."""
+    return new if new.result > old.result else old
+
+
+def _best(old, new):
+    """Keep the result with the best status.
+
+    Statuses that mean the test didn't run (skip and notrun) are considered
+    worse than any status from a test that did run.
+
+    """
+    def key(res):
+        return (res.result in (so.SKIP, so.NOTRUN), res.result)
+
+    return new if key(new) < key(old) else old
+
+
+def _latest(old, new):
+    """Keep the result that finished last, or the new one on a tie."""
+    return new if new.time.end >= old.time.end else old
+
+
+POLICIES = collections.OrderedDict([
+    ('worst', _worst),
+    ('best', _best),
+    ('latest', _latest),
+])
+
+# Metadata that is taken from the first result that has a value for it
+_METADATA = ['uname', 'options', 'glxinfo', 'wglinfo', 'clinfo', 'lspci',
+             'wflinfo']
+
+
+class Merger(object):
+    """Fold TestrunResults one at a time into a single TestrunResult.
+
+    Arguments:
+    policy -- the name of a policy in POLICIES used to resolve tests that are
+              in more than one result.
+
+    """
+    def __init__(self, policy='worst'):
+        self.__policy = POLICIES[policy]
+        self.__first = True
+        self.result = results.TestrunResult()
+        self.conflicts = 0
+
+    def add(self, run):
+        """Merge a TestrunResult into the merged result."""
+        merged = self.result
+
+        if self.__first:
+            merged.name = run.name
+            merged.time_elapsed.start = run.time_elapsed.start
+            merged.time_elapsed.end = run.time_elapsed.end
+            self.__first = False
+        else:
+            merged.time_elapsed.start = min(merged.time_elapsed.start,
+                                            run.time_elapsed.start)
+            merged.time_elapsed.end = max(merged.time_elapsed.end,
+                                          run.time_elapsed.end)
+
+        for name in _METADATA:
+            if not getattr(merged, name) and getattr(run, name):
+                setattr(merged, name, getattr(run, name))
+
+        for name, test in six.iteritems(run.tests):
+            if name in merged.tests:
+                self.conflicts += 1
+                merged.tests[name] = self.__policy(merged.tests[name], test)
+            else:
+                merged.tests[name] = test
+
+    def finalize(self, name=None):
+        """Recompute the totals and return the merged TestrunResult."""
+        if name:
+            self.result.name = name
+        self.result.totals = collections.defaultdict(results.Totals)
+        self.result.calculate_group_totals()
+        return self.result
+
+
+def merge(paths, policy='worst', jobs=None):
+    """Load and merge a list of results, returning a Merger.
+
+    At most jobs results are loaded at the same time (by default the number
+    of CPUs), each is merged as soon as it is loaded, in the order given.
+
+    """
+    jobs = jobs or multiprocessing.cpu_count()
+    merger = Merger(policy)
+    pool = multiprocessing.dummy.Pool(jobs)
+    pending = collections.deque()
+
+    try:
+        for path in paths:
+            pending.append(pool.apply_async(backends.load, (path, )))
+            if len(pending) >= jobs:
+                merger.add(pending.popleft().get())
+        while pending:
+            merger.add(pending.popleft().get())
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return merger
@@ -38,6 +38,7 @@ import abc
 import errno
 import os
 import re
+import stat
 
 import six
 
@@ -75,6 +76,9 @@ class Monitoring(object):
         # Get the monitoring rules from piglit.conf and store them into a dict.
         self._monitoring_rules = {}
 
+        # The file sources, shared by all of the rules for each file
+        self._sources = {}
+
         if monitoring_enabled and PIGLIT_CONFIG.has_section('monitored-errors'):
             for key, _ in PIGLIT_CONFIG.items('monitored-errors'):
                 if PIGLIT_CONFIG.has_section(key):
@@ -110,12 +114,12 @@ class Monitoring(object):
         """
         rule = None
 
-        if type == 'file':
-            rule = MonitoringFile(parameters,
-                                  regex)
-        elif type == 'locked_file':
+        if type in ['file', 'locked_file']:
+            if parameters not in self._sources:
+                self._sources[parameters] = _FileSource(parameters)
             rule = MonitoringFile(parameters,
-                                  regex, True)
+                                  regex, type == 'locked_file',
+                                  source=self._sources[parameters])
         elif type == 'dmesg':
             rule = MonitoringLinuxDmesg(parameters,
                                         regex)
@@ -132,14 +136,39 @@ class Monitoring(object):
         key -- The rule key
 
         """
-        self._monitoring_rules.pop(key, None)
+        rule = self._monitoring_rules.pop(key, None)
+        source = getattr(rule, 'source', None)
+        if source is not None:
+            source.remove_pattern(rule._monitoring_regex.pattern)
+            if not source.patterns:
+                del self._sources[source.path]
+                source.close()
 
     def update_monitoring(self):
         """Update the new messages for each monitoring object"""
+        # Read each file once, for all of the rules using it
+        for source in six.itervalues(self._sources):
+            try:
+                source.update()
+            except (OSError, IOError):
+                # if an error occured, we consider there are no new messages
+                pass
+
         if self._monitoring_rules:
             for monitoring_rule in six.itervalues(self._monitoring_rules):
                 monitoring_rule.update_monitoring()
 
+    def close(self):
+        """Close everything the rules hold open
+
+        The sources are opened again if monitoring is updated after this.
+
+        """
+        for source in six.itervalues(self._sources):
+            source.close()
+        for rule in six.itervalues(self._monitoring_rules):
+            rule.close()
+
     def check_monitoring(self):
         """Check monitoring objects statue
 
@@ -204,6 +233,10 @@ class BaseMonitoring(object):
         """
         pass
 
+    def close(self):
+        """Close anything the rule holds open, by default nothing"""
+        pass
+
     def check_monitoring(self):
         """Check _new_messages
 
@@ -219,80 +252,324 @@ class BaseMonitoring(object):
 
 
 if os.name == 'posix':
-    import fcntl
+    import ctypes
+    import ctypes.util
+
+
+    class _Inotify(object):
+        """Tells if a file may have changed, using inotify
+
+        This raises OSError if inotify is not available.
+
+        """
+        _NONBLOCK = 0o4000
+        _CLOEXEC = 0o2000000
+
+        # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF |
+        # IN_MOVE_SELF
+        _MASK = 0x2 | 0x4 | 0x8 | 0x400 | 0x800
+
+        def __init__(self):
+            try:
+                self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                         use_errno=True)
+                self._fd = self._libc.inotify_init1(self._NONBLOCK |
+                                                    self._CLOEXEC)
+            except (OSError, AttributeError) as e:
+                raise OSError(errno.ENOSYS, str(e))
+            if self._fd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+            self._wd = None
+
+        def watch(self, path):
+            """Watch path, instead of any file watched before"""
+            self.unwatch()
+            wd = self._libc.inotify_add_watch(
+                self._fd, path.encode('utf-8'), self._MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+            self._wd = wd
+
+        def unwatch(self):
+            """Stop watching the watched file"""
+            if self._wd is not None:
+                self._libc.inotify_rm_watch(self._fd, self._wd)
+                self._wd = None
+
+        def close(self):
+            """Close the inotify file descriptor, and with it the watch"""
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+                self._wd = None
+
+        def changed(self):
+            """Return True if there were events since the last call"""
+            changed = False
+            while True:
+                try:
+                    if not os.read(self._fd, 4096):
+                        break
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        break
+                    raise
+                changed = True
+            return changed
+
+
+    class _FileSource(object):
+        """Reads the lines added to a file since the last read
+
+        For regular files this remembers the offset read up to, and the bytes
+        just before it. Each read checks those bytes are still there, and then
+        reads from the offset, so only the appended data is read. If the bytes
+        don't match, the file was truncated or rewritten, and it's read from
+        the start. If the path now names a different file (it was rotated)
+        the rest of the old file is read, and then the new one from the start.
+
+        When the size reported by stat() matches the data read, inotify (if
+        available) is used to skip reading entirely when the file hasn't
+        changed. Files in debugfs and sysfs don't report their real size, and
+        don't send inotify events, so they are always read.
+
+        Other files, like /dev/kmsg, are kept open and read until no more data
+        is available.
+
+        A line without a trailing newline is reported, but read again with
+        the rest of the line; it's reported again only when it changes.
+
+        All of the rules for a file share one _FileSource, which tests new
+        lines against a regex combining all of their regexes, so the rules
+        only have to look at the lines that match one of them.
+
+        Arguments:
+        path -- the file to read
+
+        """
+        # How many bytes before the offset to check
+        _TAIL = 64
+
+        def __init__(self, path):
+            self.path = path
+            self.lines = []
+            self.matching = []
+            self._patterns = []
+            self._regex = None
+            self._fd = None
+            self._regular = False
+            self._offset = 0
+            self._tail = b''
+            self._partial = b''
+            self._inotify = None
+            self._force = False
+
+        def add_pattern(self, pattern):
+            """Add a rule's regex to the combined regex"""
+            self._patterns.append(pattern)
+            self._compile()
+
+        def remove_pattern(self, pattern):
+            """Remove a rule's regex from the combined regex"""
+            self._patterns.remove(pattern)
+            self._compile()
+
+        @property
+        def patterns(self):
+            """The regexes of the rules using this file"""
+            return list(self._patterns)
+
+        def _compile(self):
+            try:
+                self._regex = re.compile('|'.join(
+                    '(?:{})'.format(p) for p in self._patterns))
+            except re.error:
+                # Some regexes (like ones with inline flags) can't be
+                # combined, then every line has to be given to every rule
+                self._regex = None
+
+        def _open(self):
+            try:
+                self._fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                return
+            self._regular = stat.S_ISREG(os.fstat(self._fd).st_mode)
+            self._offset = 0
+            self._tail = b''
+            self._partial = b''
+            if self._inotify is not None:
+                try:
+                    self._inotify.watch(self.path)
+                except OSError:
+                    self._inotify.close()
+                    self._inotify = None
+
+        def _close(self):
+            os.close(self._fd)
+            self._fd = None
+            if self._inotify is not None:
+                self._inotify.unwatch()
+
+        def close(self):
+            """Close the file and the inotify descriptor
+
+            If update() is called again the file is opened again, and read
+            from the start.
+
+            """
+            if self._fd is not None:
+                self._close()
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+        def _read_stream(self):
+            data = []
+            while True:
+                try:
+                    chunk = os.read(self._fd, 65536)
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        break
+                    elif e.errno == errno.EPIPE:
+                        # The kernel overwrote records that weren't read yet
+                        continue
+                    raise
+                if not chunk:
+                    break
+                data.append(chunk)
+            return b''.join(data)
+
+        def _read_regular(self):
+            # Check that the data before the offset hasn't changed
+            start = self._offset - len(self._tail)
+            os.lseek(self._fd, start, os.SEEK_SET)
+            if self._tail and os.read(self._fd, len(self._tail)) != self._tail:
+                self._offset = 0
+                self._tail = b''
+                self._partial = b''
+                os.lseek(self._fd, 0, os.SEEK_SET)
+
+            data = self._read_stream()
+            end = data.rfind(b'\n') + 1
+            complete, partial = data[:end], data[end:]
+            size = self._offset + len(data)
+
+            self._offset += end
+            self._tail = (self._tail + complete)[-self._TAIL:]
+            if partial == self._partial:
+                partial = b''
+            else:
+                self._partial = partial
+            return complete + partial, size
+
+        def _read(self):
+            if not self._regular:
+                return self._read_stream()
+
+            data, size = self._read_regular()
+            if (self._inotify is None and size and
+                    os.fstat(self._fd).st_size == size):
+                inotify = None
+                try:
+                    inotify = _Inotify()
+                    inotify.watch(self.path)
+                except OSError:
+                    if inotify is not None:
+                        inotify.close()
+                else:
+                    self._inotify = inotify
+                    # Anything written before the watch was added has no
+                    # event, so read once more before trusting them
+                    self._force = True
+            return data
+
+        def update(self):
+            """Read the new lines into self.lines"""
+            self.lines = []
+            self.matching = []
+            if (self._inotify is not None and self._fd is not None and
+                    not self._inotify.changed() and not self._force):
+                return
+            self._force = False
+
+            data = []
+            try:
+                current = os.stat(self.path)
+            except OSError:
+                current = None
+            if self._fd is not None:
+                opened = os.fstat(self._fd)
+                if (current is None or (current.st_dev, current.st_ino) !=
+                        (opened.st_dev, opened.st_ino)):
+                    # The file was rotated or removed
+                    data.append(self._read())
+                    self._close()
+            if self._fd is None and current is not None:
+                self._open()
+            if self._fd is not None:
+                data.append(self._read())
+
+            self.lines = b''.join(
+                d if d.endswith(b'\n') else d + b'\n' for d in data if d
+            ).decode('utf-8', 'replace').splitlines()
+            if self._regex is None:
+                self.matching = self.lines
+            else:
+                self.matching = [l for l in self.lines if self._regex.search(l)]
 
 
     class MonitoringFile(BaseMonitoring):
         """Monitoring from a file
 
         This class is for monitoring the system from a file that
-        can be a standard file or a locked file. The locked file
-        algorithm uses fnctl, so it doesn't work on non Unix systems
+        can be a standard file or a locked file. Files are opened without
+        blocking, so locked files and character devices can be read as well.
 
         Arguments:
         is_locked -- True if the target is a locked file
 
+        Keyword Arguments:
+        source -- a _FileSource shared with other rules, which the caller
+                  updates. By default the rule has its own.
+
         """
         _is_locked = False
 
-        def __init__(self, monitoring_source, regex, is_locked=False):
+        def __init__(self, monitoring_source, regex, is_locked=False,
+                     source=None):
             """Create a MonitoringFile instance"""
-            self._last_message = None
             self._is_locked = is_locked
+            self._shared = source is not None
+            self._source = source or _FileSource(monitoring_source)
+            self._source.add_pattern(regex)
             super(MonitoringFile, self).__init__(monitoring_source, regex)
 
+        @property
+        def source(self):
+            """The _FileSource that this rule reads from"""
+            return self._source
+
         def update_monitoring(self):
-            """Open the file and get the differences
+            """Get the new lines of the file
 
-            Get the contents of the file, then calculate new messages.
-            This implements also a specific method for reading locked files.
+            Only the lines that match one of the rules for the file are kept,
+            since only they can match this rule.
 
             """
-
-            try:
-                with open(self._monitoring_source, 'r') as f:
-                    lines = []
-                    if self._is_locked:
-                        # Create a duplicated file descriptor, this avoid lock
-                        fd = os.dup(f.fileno())
-                        # use I/O control for reading the lines
-                        fcntl.fcntl(fd, fcntl.F_SETFL, os.O_NONBLOCK)
-
-                        while True:
-                            try:
-                                line = os.read(fd, 1024)
-                                if not line:
-                                    break;
-                            except OSError as e:
-                                if e.errno == errno.EAGAIN:
-                                    break
-                                else:
-                                    raise e
-                            lines.append(line.decode("utf-8", "strict"))
-                        os.close(fd)
-
-                    else:
-                        lines = f.read().splitlines()
-
-                    f.close()
-
-                    # Find all new entries, do this by slicing the list of the
-                    # lines to only returns elements after the last element
-                    # stored. If there are not matches a value error is raised,
-                    # that means all of the lines are new
-                    l = 0
-                    for index, item in enumerate(reversed(lines)):
-                        if item == self._last_message:
-                            l = len(lines) - index  # don't include the matched element
-                            break
-                    self._new_messages = lines[l:]
-                    # Attempt to store the last element of lines,
-                    # unless there was no line
-                    self._last_message = lines[-1] if lines else None
-            except Exception:
-                # if an error occured, we consider there are no new messages
-                self._new_messages = []
-                pass
+            if not self._shared:
+                try:
+                    self._source.update()
+                except (OSError, IOError):
+                    # if an error occured, we consider there are no new
+                    # messages
+                    pass
+            self._new_messages = self._source.matching
+
+        def close(self):
+            """Close the source, unless it's shared with other rules"""
+            if not self._shared:
+                self._source.close()
 
 
     class MonitoringLinuxDmesg(BaseMonitoring, LinuxDmesg):
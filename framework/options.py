@@ -50,6 +50,7 @@ class _Options(object):  # pylint: disable=too-many-instance-attributes
     valgrind -- True if valgrind is to be used
     env -- environment variables set for each test before run
     deqp_mustpass -- True to enable the use of the deqp mustpass list feature.
+    output_dir -- directory that output left out of results is written to
     """
 
     def __init__(self):
@@ -58,6 +59,7 @@ class _Options(object):  # pylint: disable=too-many-instance-attributes
         self.sync = False
         self.deqp_mustpass = False
         self.process_isolation = True
+        self.output_dir = None
 
         # env is used to set some base environment variables that are not going
         # to change across runs, without sending them to os.environ which is
@@ -39,24 +39,133 @@ import multiprocessing
 import multiprocessing.dummy
 import os
 import re
+import sys
+import threading
 
 import six
 
-from framework import grouptools, exceptions
+from framework import grouptools, exceptions, trace
 from framework.dmesg import get_dmesg
 from framework.log import LogManager
 from framework.monitoring import Monitoring
+from framework.options import OPTIONS
 from framework.test.base import Test
 
 __all__ = [
     'RegexFilter',
     'TestDict',
     'TestProfile',
+    'load_filters',
     'load_test_profile',
     'run',
+    'share_filters',
 ]
 
 
+# Characters that end the plain string at the start of a regex
+_REGEX_SPECIAL = frozenset('.^$*+?{}[]\\|()')
+
+# Characters that make the character before them optional or repeated
+_REGEX_QUANTIFIERS = frozenset('*+?{')
+
+# Backreferences can't be combined into one regex, their group numbers change
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def _split_prefix(regex):
+    """Split a regex into a plain string prefix and the remaining regex.
+
+    Returns None if the regex can't be split, either because it doesn't start
+    with a plain string or because of a top level alternation.
+
+    """
+    if '|' in regex or _BACKREFERENCE.search(regex):
+        return None
+
+    end = 0
+    while end < len(regex) and regex[end] not in _REGEX_SPECIAL:
+        end += 1
+    if end < len(regex) and regex[end] in _REGEX_QUANTIFIERS:
+        # The quantifier applies to the last character of the prefix
+        end -= 1
+    if end <= 0:
+        return None
+    return regex[:end], regex[end:]
+
+
+def _prefix_trie_regex(filters):
+    """Build a regex that matches any of filters, as a trie of their prefixes.
+
+    Each filter is a (prefix, rest) pair as returned by _split_prefix. An
+    alternation of many regexes tries each one in turn at every position of
+    the name, whereas the trie only follows the branches that match the
+    characters seen so far, so hundreds of group names cost little more than
+    one.
+
+    """
+    trie = {}
+    for prefix, rest in filters:
+        node = trie
+        for char in prefix.lower():
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(rest)
+
+    def build(node):
+        rests = node.get(None, set())
+        # If a plain string ends here anything longer matches anyway
+        if '' in rests:
+            return ''
+        branches = ['(?:{})'.format(r) for r in sorted(rests)]
+        branches.extend(re.escape(c) + build(node[c])
+                        for c in sorted(c for c in node if c is not None))
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:{})'.format('|'.join(branches))
+
+    return re.compile(build(trie), flags=re.IGNORECASE)
+
+
+def _compile_filters(filters):
+    """Compile a list of regex strings into as few regexes as possible.
+
+    Most -t and -x arguments are group names, or start with one, so those are
+    compiled into a single trie. The rest are combined into a single
+    alternation, apart from any that can't be combined which are left on
+    their own.
+
+    """
+    prefixed = []
+    regexes = []
+    for filter_ in filters:
+        split = _split_prefix(filter_)
+        if split is None:
+            regexes.append(filter_)
+        else:
+            prefixed.append(split)
+
+    compiled = []
+    if prefixed:
+        try:
+            compiled.append(_prefix_trie_regex(prefixed))
+        except re.error:
+            regexes.extend(p + r for p, r in prefixed)
+
+    combinable = [f for f in regexes if not _BACKREFERENCE.search(f)]
+    if len(combinable) > 1:
+        try:
+            compiled.append(re.compile(
+                '|'.join('(?:{})'.format(f) for f in combinable),
+                flags=re.IGNORECASE))
+        except re.error:
+            # Something like a global flag in the middle of the expression
+            pass
+        else:
+            regexes = [f for f in regexes if f not in combinable]
+    compiled.extend(re.compile(f, flags=re.IGNORECASE) for f in regexes)
+
+    return compiled
+
+
 class RegexFilter(object):
     """An object to be passed to TestProfile.filter.
 
@@ -67,6 +176,9 @@ class RegexFilter(object):
     a test that matches any regex will not be scheduled. Regardless of the
     value of the inverse flag if filters is empty then the test will be run.
 
+    The regexes are combined into as few as possible before searching, since
+    there can be hundreds of them, see _compile_filters.
+
     Arguments:
     filters -- a list of regex compiled objects.
 
@@ -77,6 +189,7 @@ class RegexFilter(object):
     def __init__(self, filters, inverse=False):
         self.filters = [re.compile(f, flags=re.IGNORECASE) for f in filters]
         self.inverse = inverse
+        self.__compiled = _compile_filters(filters)
 
     def __call__(self, name, _):  # pylint: disable=invalid-name
         # This needs to match the signature (name, test), since it doesn't need
@@ -88,9 +201,9 @@ class RegexFilter(object):
             return True
 
         if not self.inverse:
-            return any(r.search(name) for r in self.filters)
+            return any(r.search(name) for r in self.__compiled)
         else:
-            return not any(r.search(name) for r in self.filters)
+            return not any(r.search(name) for r in self.__compiled)
 
 
 class TestDict(collections.MutableMapping):
@@ -103,13 +216,27 @@ class TestDict(collections.MutableMapping):
     This class doesn't accept keyword arguments, this is intentional. This is
     because the TestDict class is ordered, and keyword arguments are unordered,
     which is a design mismatch.
+
+    A TestDict can be an overlay on another (base) TestDict, which is how
+    profiles are copied. The overlay only stores the tests that are added or
+    reassigned and the names that are deleted, and looks everything else up in
+    the base, which it never modifies. Changes made to the base are seen
+    through the overlay. Tests in the base keep their position when they are
+    reassigned, like in an OrderedDict, and new tests come after them.
+
+    Keyword Arguments:
+    base -- a TestDict to overlay. Default: None
     """
-    def __init__(self):
+    def __init__(self, base=None):
         # This counter is incremented once when the allow_reassignment context
         # manager is opened, and decremented each time it is closed. This
         # allows stacking of the context manager
         self.__allow_reassignment = 0
         self.__container = collections.OrderedDict()
+        self.__base = base
+        # Names in base that have been deleted, if they're added again they're
+        # new tests, which go at the end
+        self.__deleted = set()
 
     def __setitem__(self, key, value):
         """Enforce types on set operations.
@@ -138,13 +265,13 @@ class TestDict(collections.MutableMapping):
         key = key.lower()
 
         # If there is already a test of that value in the tree it is an error
-        if not self.__allow_reassignment and key in self.__container:
-            if self.__container[key] != value:
+        if not self.__allow_reassignment and key in self:
+            if self[key] != value:
                 error = (
                     'Further, the two tests are not the same,\n'
                     'The original test has this command:   "{0}"\n'
                     'The new test has this command:        "{1}"'.format(
-                        ' '.join(self.__container[key].command),
+                        ' '.join(self[key].command),
                         ' '.join(value.command))
                 )
             else:
@@ -158,17 +285,92 @@ class TestDict(collections.MutableMapping):
 
     def __getitem__(self, key):
         """Lower the value before returning."""
-        return self.__container[key.lower()]
+        key = key.lower()
+        if key in self.__container or self.__base is None:
+            return self.__container[key]
+        if key in self.__deleted:
+            raise KeyError(key)
+        return self.__base[key]
 
     def __delitem__(self, key):
         """Lower the value before returning."""
-        del self.__container[key.lower()]
+        key = key.lower()
+        found = key in self.__container
+        if found:
+            del self.__container[key]
+        if (self.__base is not None and key not in self.__deleted and
+                key in self.__base):
+            self.__deleted.add(key)
+            found = True
+        if not found:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        key = key.lower()
+        if key in self.__container:
+            return True
+        return (self.__base is not None and key not in self.__deleted and
+                key in self.__base)
 
     def __len__(self):
-        return len(self.__container)
+        if self.__base is None:
+            return len(self.__container)
+        # Only count the deleted names that are still in base, it may have
+        # dropped some of them since.
+        return (len(self.__base) -
+                sum(1 for k in self.__deleted if k in self.__base) +
+                sum(1 for k in self.__container if self.__is_new(k)))
 
     def __iter__(self):
-        return iter(self.__container)
+        if self.__base is None:
+            return iter(self.__container)
+        if not self.__container and not self.__deleted:
+            return iter(self.__base)
+        return self.__iter_overlay()
+
+    def items(self):
+        return _TestDictItems(self)
+
+    if six.PY2:
+        def iteritems(self):
+            return self._iteritems()
+
+    def _iteritems(self):
+        """Iterate over (name, test) pairs, in the same order as iter()."""
+        if self.__base is None:
+            return six.iteritems(self.__container)
+        if not self.__container and not self.__deleted:
+            return self.__base._iteritems()
+        return self.__iteritems_overlay()
+
+    def __is_new(self, key):
+        """Return True if key isn't a reassignment of a test in base."""
+        return key in self.__deleted or key not in self.__base
+
+    def __iter_overlay(self):
+        """Iterate over the base and then the new tests."""
+        for key in self.__base:
+            if key not in self.__deleted:
+                yield key
+        for key in self.__container:
+            if self.__is_new(key):
+                yield key
+
+    def __iteritems_overlay(self):
+        """Iterate over the items of the base and then the new tests.
+
+        This walks the items of the base rather than looking each name up,
+        so iterating over an overlay costs little more than iterating over
+        its base.
+        """
+        container = self.__container
+        deleted = self.__deleted
+        for key, value in self.__base._iteritems():
+            if key not in deleted:
+                yield key, container.get(key, value)
+        for key, value in six.iteritems(container):
+            if self.__is_new(key):
+                yield key, value
 
     @contextlib.contextmanager
     def group_manager(self, test_class, group, **default_args):
@@ -260,6 +462,13 @@ class TestDict(collections.MutableMapping):
         self.__allow_reassignment -= 1
 
 
+class _TestDictItems(collections.ItemsView):
+    """The items of a TestDict, see TestDict._iteritems."""
+
+    def __iter__(self):
+        return self._mapping._iteritems()  # pylint: disable=protected-access
+
+
 class TestProfile(object):
     """Class that holds a list of tests for execution.
 
@@ -299,9 +508,12 @@ class TestProfile(object):
         This method creates a copy with references to the original instance
         using copy.copy. This allows profiles to be "subclassed" by other
         profiles, without modifying the original.
+
+        The test_list of the copy is an overlay on the original one, so
+        copying is cheap however many tests there are, see TestDict.
         """
         new = copy.copy(self)
-        new.test_list = copy.copy(self.test_list)
+        new.test_list = TestDict(base=self.test_list)
         new.forced_test_list = copy.copy(self.forced_test_list)
         new.filters = copy.copy(self.filters)
         return new
@@ -323,7 +535,53 @@ class TestProfile(object):
                 yield k, v
 
 
-def load_test_profile(filename):
+# The modules being imported by load_test_profile with the filters passed to
+# it: the one that was asked for, and any that it shares its filters with
+_LOADING = (frozenset(), [])
+
+
+def load_filters(name):
+    """Return the filters that the profile module name is being loaded with.
+
+    A profile module may use these to avoid creating tests (and doing the work
+    that requires, like parsing files) that would be filtered out anyway. Each
+    filter is called with the name of the test and None for the test.
+
+    The filters only apply to the module passed to load_test_profile, a
+    profile module that is imported by another one has all of its tests,
+    unless the importing module passes them on with share_filters.
+
+    Arguments:
+    name -- the __name__ of the profile module
+    """
+    if name in _LOADING[0]:
+        return _LOADING[1]
+    return []
+
+
+def share_filters(name, base):
+    """Pass the filters that name is being loaded with on to base.
+
+    A profile module that is built from another one calls this before
+    importing it, so the imported module can leave out tests too. This is
+    only correct if the module keeps the test names of base (it only copies,
+    filters, or reassigns tests), and doesn't need any test of base to exist.
+    A module that renames tests, like no_error, must not call this.
+
+    Arguments:
+    name -- the __name__ of the profile module
+    base -- the name of the module it imports, like 'tests.all'
+    """
+    global _LOADING  # pylint: disable=global-statement
+
+    # If base has already been imported it has all of its tests, and the
+    # import won't run it again.
+    names, filters = _LOADING
+    if name in names and base not in sys.modules:
+        _LOADING = (names | frozenset([base]), filters)
+
+
+def load_test_profile(filename, filters=None):
     """Load a python module and return it's profile attribute.
 
     All of the python test files provide a profile attribute which is a
@@ -343,15 +601,35 @@ def load_test_profile(filename):
 
     Arguments:
     filename -- the name of a python module to get a 'profile' from
+
+    Keyword Arguments:
+    filters -- filters that will be added to the profile before it's run,
+               which the module can use to leave out tests, see load_filters.
+               They must only use the name of the test. Default: None
     """
+    global _LOADING  # pylint: disable=global-statement
+
+    name = 'tests.{0}'.format(os.path.splitext(os.path.basename(filename))[0])
+    # If the module has already been imported then it has all of its tests,
+    # otherwise it may only have the ones that pass the filters.
+    partial = bool(filters) and name not in sys.modules
+
+    _LOADING = (frozenset([name] if partial else []), filters or [])
     try:
-        mod = importlib.import_module('tests.{0}'.format(
-            os.path.splitext(os.path.basename(filename))[0]))
+        mod = importlib.import_module(name)
     except ImportError:
         raise exceptions.PiglitFatalError(
             'Failed to import "{}", there is either something wrong with the '
             'module or it doesn\'t exist. Check your spelling?'.format(
                 filename))
+    finally:
+        loaded = _LOADING[0]
+        _LOADING = (frozenset(), [])
+
+    # Don't let anything else that imports these modules get a profile with
+    # only some of the tests.
+    for each in loaded:
+        sys.modules.pop(each, None)
 
     try:
         return mod.profile
@@ -361,7 +639,115 @@ def load_test_profile(filename):
             'Did you specify the right file?'.format(filename))
 
 
-def run(profiles, logger, backend, concurrency):
+class _Writer(object):
+    """Writes the results of the tests being run to the backend.
+
+    Tests with a batch_of attribute are batches of one larger test that are
+    scheduled separately, so that they can be run in parallel. Their results
+    are merged, and written under the name in batch_of once the last batch in
+    the run is finished, so the names of the results don't depend on how the
+    tests are split into batches.
+
+    Arguments:
+    backend    -- a results.Backend derived instance.
+    test_lists -- a list of lists of (name, test) pairs that will be written.
+
+    """
+    def __init__(self, backend, test_lists):
+        self.__backend = backend
+        self.__lock = threading.Lock()
+        self.__remaining = collections.Counter(
+            t.batch_of for l in test_lists for _, t in l
+            if t.batch_of is not None)
+        self.__batches = {}
+
+    @contextlib.contextmanager
+    def write_test(self, name, test):
+        """Write the result of test, like Backend.write_test."""
+        if test.batch_of is None:
+            with self.__backend.write_test(name) as w:
+                yield w
+            return
+
+        name = test.batch_of
+        with self.__lock:
+            if name not in self.__batches:
+                # The incomplete result is written when the first batch
+                # starts, and replaced when the last batch finishes.
+                context = self.__backend.write_test(name)
+                self.__batches[name] = [context, context.__enter__(), None]
+
+        def write(result):
+            with self.__lock:
+                batch = self.__batches[name]
+                if batch[2] is None:
+                    batch[2] = result
+                else:
+                    batch[2].merge(result)
+                self.__remaining[name] -= 1
+                if self.__remaining[name]:
+                    return
+                del self.__batches[name]
+            batch[1](batch[2])
+            batch[0].__exit__(None, None, None)
+
+        yield write
+
+    def write_tests(self, tests):
+        """Write the results of many finished tests, like
+        Backend.write_tests.
+
+        Arguments:
+        tests -- an iterable of (name, test) pairs
+
+        """
+        tests = list(tests)
+        self.__backend.write_tests(
+            [(n, t.result) for n, t in tests if t.batch_of is None])
+        for name, test in tests:
+            if test.batch_of is not None:
+                with self.write_test(name, test) as w:
+                    w(test.result)
+
+
+@contextlib.contextmanager
+def _untraced():
+    """Stand in for trace.Tracer.test when there is no tracer."""
+    yield {}
+
+
+def _resolve_skips(profiles, log, writer):
+    """Record the tests that will skip without scheduling them.
+
+    Checking whether a test will skip (because of a missing extension or
+    executable, or the wrong platform) doesn't require running anything, so
+    all of the checks are done up front, and the results are written with a
+    single backend call instead of going through the pools one at a time.
+
+    Returns the profiles with only the tests that need to be run.
+
+    """
+    skipped = []
+    resolved = []
+    for profile, test_list in profiles:
+        remaining = []
+        for name, test in test_list:
+            if test.resolve_skip():
+                skipped.append((name, test))
+            else:
+                remaining.append((name, test))
+        resolved.append((profile, remaining))
+
+    if skipped:
+        writer.write_tests(skipped)
+        log.record('skip', len(skipped))
+        for _, test in skipped:
+            test.release()
+
+    return resolved
+
+
+def run(profiles, logger, backend, concurrency, tracer=None):
     """Runs all tests using Thread pool.
 
     When called this method will flatten out self.tests into self.test_list,
@@ -378,6 +764,10 @@ def run(profiles, logger, backend, concurrency):
     profiles -- a list of Profile instances.
     logger   -- a log.LogManager instance.
     backend  -- a results.Backend derived instance.
+
+    Keyword Arguments:
+    tracer   -- a trace.Tracer instance to record when each test runs.
+                Default: None
     """
     chunksize = 1
 
@@ -391,11 +781,24 @@ def run(profiles, logger, backend, concurrency):
     if not any(l for _, l in profiles):
         raise exceptions.PiglitUserError('no matching tests')
 
+    writer = _Writer(backend, [l for _, l in profiles])
+    if OPTIONS.execute:
+        profiles = _resolve_skips(profiles, log, writer)
+
     def test(name, test, profile, this_pool=None):
         """Function to call test.execute from map"""
-        with backend.write_test(name) as w:
+        if tracer is None:
+            traced = _untraced()
+        else:
+            traced = tracer.test(
+                name, 'serial' if this_pool is single else 'concurrent')
+
+        with traced as args, writer.write_test(name, test) as w:
             test.execute(name, log.get(), profile.options)
-            w(test.result)
+            args['status'] = str(test.result.result)
+            with trace.phase('write'):
+                w(test.result)
+        test.release()
         if profile.options['monitor'].abort_needed:
             this_pool.terminate()
 
@@ -445,6 +848,9 @@ def run(profiles, logger, backend, concurrency):
             pool.join()
     finally:
         log.get().summary()
+        log.close()
+        for p, _ in profiles:
+            p.options['monitor'].close()
 
     for p, _ in profiles:
         if p.options['monitor'].abort_needed:
@@ -0,0 +1,105 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Commands for building and querying the history database."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import argparse
+
+from framework import backends, core, exceptions, history
+from . import parsers
+
+__all__ = [
+    'ingest',
+    'query',
+]
+
+
+def _database_parser():
+    """Return a parser with the database option, shared by all commands."""
+    parser = argparse.ArgumentParser(parents=[parsers.CONFIG])
+    parser.add_argument("-d", "--database",
+                        default=history.get_default_path(),
+                        help="The history database to use. "
+                             "Default: %(default)s")
+    return parser
+
+
+@exceptions.handler
+def ingest(input_):
+    """Add one or more results to the history database."""
+    unparsed = parsers.parse_config(input_)[1]
+
+    parser = _database_parser()
+    parser.add_argument("-l", "--list",
+                        action="store",
+                        help="Load a newline separated list of results. These "
+                             "results will be prepended to any Results "
+                             "specified on the command line")
+    parser.add_argument("results",
+                        metavar="<Results Path(s)>",
+                        nargs="*",
+                        help="Results to add, oldest first")
+    args = parser.parse_args(unparsed)
+
+    if args.list:
+        args.results = core.parse_listfile(args.list) + args.results
+    if not args.results:
+        parser.error("Missing required option -l or <Results Path(s)>")
+
+    db = history.History.load(args.database)
+    for path in args.results:
+        run = backends.load(path)
+        if run in db:
+            print("Skipping {}, it has already been ingested.".format(path))
+            continue
+        db.ingest(run)
+
+
+@exceptions.handler
+def query(input_):
+    """Print the first bad run, flip rate, and average time of tests."""
+    unparsed = parsers.parse_config(input_)[1]
+
+    parser = _database_parser()
+    parser.add_argument("-g", "--group",
+                        action="store_true",
+                        help="Print a single line for each name, aggregating "
+                             "all of the tests in it, rather than one line "
+                             "per test")
+    parser.add_argument("names",
+                        metavar="<Test or Group Name(s)>",
+                        nargs="*",
+                        default=[''],
+                        help="Names of tests or groups to query, in piglit's "
+                             "'@' separated format. Default: all tests")
+    args = parser.parse_args(unparsed)
+
+    db = history.History.load(args.database)
+    if not db.runs:
+        raise exceptions.PiglitFatalError(
+            'No runs have been ingested into {}'.format(args.database))
+
+    for row in db.query(args.names, group=args.group):
+        print(history.format_row(row))
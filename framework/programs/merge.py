@@ -0,0 +1,97 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Command for merging several results into one."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import argparse
+import errno
+
+from framework import backends, core, exceptions, merge as merge_
+from . import parsers
+
+__all__ = [
+    'merge',
+]
+
+
+@exceptions.handler
+def merge(input_):
+    """Merge the results of a run that was split into shards."""
+    unparsed = parsers.parse_config(input_)[1]
+
+    # Adding the parent is necissary to get the help options
+    parser = argparse.ArgumentParser(parents=[parsers.CONFIG])
+    parser.add_argument("-o", "--output",
+                        default="results.json",
+                        help="name of output file, the compression suffix is "
+                             "added automatically. Default: results.json")
+    parser.add_argument("-n", "--name",
+                        help="The name of the merged results. Default: the "
+                             "name of the first results")
+    parser.add_argument("-p", "--policy",
+                        choices=list(merge_.POLICIES),
+                        default="worst",
+                        help="How to resolve a test that is in more than one "
+                             "result: keep the worst status, the best status "
+                             "or the result that finished last. "
+                             "Default: %(default)s")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=None,
+                        help="The number of results to load at once. "
+                             "Default: the number of CPUs")
+    parser.add_argument("-l", "--list",
+                        action="store",
+                        help="Load a newline separated list of results. These "
+                             "results will be prepended to any Results "
+                             "specified on the command line")
+    parser.add_argument("results",
+                        metavar="<Results Path(s)>",
+                        nargs="*",
+                        help="Results to merge, json or junit")
+    args = parser.parse_args(unparsed)
+
+    if args.list:
+        args.results = core.parse_listfile(args.list) + args.results
+    if len(args.results) < 2:
+        parser.error("At least two results are required")
+
+    merger = merge_.merge(args.results, args.policy, args.jobs)
+    results = merger.finalize(args.name)
+    backends.set_meta('json', results)
+
+    try:
+        backends.json._write(results, args.output)
+    except IOError as e:
+        if e.errno == errno.EPERM:
+            raise exceptions.PiglitFatalError(
+                "Unable to write merged file, permission denied.")
+        raise
+
+    print("Merged {} results, {} tests were in more than one.".format(
+        len(args.results), merger.conflicts))
+    mode = backends.compression.get_mode()
+    print("Merged file written to: {}{}".format(
+        args.output, '.' + mode if mode != 'none' else ''))
@@ -37,7 +37,9 @@ from framework import core, backends, exceptions, options
 from framework import dmesg
 from framework import monitoring
 from framework import profile
+from framework import trace
 from framework.results import TimeAttribute
+from framework.test import opengl
 from . import parsers
 
 __all__ = ['run',
@@ -149,7 +151,8 @@ def _run_parser(input_):
     parser.add_argument("--dmesg",
                         action="store_true",
                         help="Capture a difference in dmesg before and "
-                             "after each test. Implies -1/--no-concurrency")
+                             "after each test. Implies -1/--no-concurrency "
+                             "unless /dev/kmsg can be read")
     parser.add_argument("--abort-on-monitored-error",
                         action="store_true",
                         dest="monitored",
@@ -160,6 +163,12 @@ def _run_parser(input_):
     parser.add_argument("-s", "--sync",
                         action="store_true",
                         help="Sync results to disk after every test")
+    parser.add_argument("--trace-events",
+                        metavar="<file>",
+                        help="Write a trace of when each test ran, and on "
+                             "which worker, to <file>. The trace can be "
+                             "loaded by about:tracing or Perfetto, or "
+                             "analysed with 'piglit summary timeline'")
     parser.add_argument("--junit_suffix",
                         type=str,
                         default="",
@@ -241,6 +250,19 @@ def _create_metadata(args, name, forced_test_list):
     return metadata
 
 
+def _wflinfo_metadata():
+    """Return a metadata dict with the values wflinfo calculated.
+
+    This is empty if no test needed the values.
+
+    """
+    info = getattr(opengl.FastSkip, 'info', None)
+    if info is None or not info.started:
+        return {}
+    info.probe()
+    return {'wflinfo': info.to_json()}
+
+
 def _disable_windows_exception_messages():
     """Disable Windows error message boxes for this and all child processes."""
     if sys.platform == 'win32':
@@ -279,9 +301,11 @@ def run(input_):
     args = _run_parser(input_)
     _disable_windows_exception_messages()
 
-    # If dmesg is requested we must have serial run, this is because dmesg
-    # isn't reliable with threaded run
-    if args.dmesg or args.monitored:
+    # Reading dmesg by running the dmesg command can't tell which test caused
+    # a message, so it requires a serial run, as does monitoring. Reading
+    # /dev/kmsg can attribute messages to concurrent tests.
+    dmesg_ = dmesg.get_dmesg(args.dmesg) if args.dmesg else None
+    if args.monitored or (dmesg_ is not None and not dmesg_.concurrent):
         args.concurrency = "none"
 
     # Pass arguments into Options
@@ -290,9 +314,12 @@ def run(input_):
     options.OPTIONS.sync = args.sync
     options.OPTIONS.deqp_mustpass = args.deqp_mustpass
     options.OPTIONS.process_isolation = args.process_isolation
+    options.OPTIONS.output_dir = path.join(args.results_path, 'output')
 
     # Set the platform to pass to waffle
     options.OPTIONS.env['PIGLIT_PLATFORM'] = args.platform
+    # Probe wflinfo in the background as soon as a test needs it
+    opengl.FastSkip.start_early = True
 
     # Change working directory to the root of the piglit directory
     piglit_dir = path.dirname(path.realpath(sys.argv[0]))
@@ -328,7 +355,20 @@ def run(input_):
     backend.initialize(_create_metadata(
         args, args.name or path.basename(args.results_path), forced_test_list))
 
-    profiles = [profile.load_test_profile(p) for p in args.test_profile]
+    filters = []
+    if args.exclude_tests:
+        filters.append(profile.RegexFilter(args.exclude_tests, inverse=True))
+    if args.include_tests:
+        filters.append(profile.RegexFilter(args.include_tests))
+
+    # The profiles can leave out the tests that won't be run
+    load_filters = list(filters)
+    if forced_test_list:
+        forced = frozenset(t.lower() for t in forced_test_list)
+        load_filters.append(lambda n, _: n.lower() in forced)
+
+    profiles = [profile.load_test_profile(p, load_filters)
+                for p in args.test_profile]
     for p in profiles:
         p.results_dir = args.results_path
 
@@ -336,28 +376,33 @@ def run(input_):
     if forced_test_list:
         profiles[0].forced_test_list = forced_test_list
 
-    # Set the dmesg type
-    if args.dmesg:
+    # Set the dmesg type, every profile shares the same reader
+    if dmesg_ is not None:
         for p in profiles:
-            p.options['dmesg'] = dmesg.get_dmesg(args.dmesg)
+            p.options['dmesg'] = dmesg_
 
     if args.monitored:
         for p in profiles:
             p.options['monitor'] = monitoring.Monitoring(args.monitored)
 
     for p in profiles:
-        if args.exclude_tests:
-            p.filters.append(profile.RegexFilter(args.exclude_tests,
-                                                 inverse=True))
-        if args.include_tests:
-            p.filters.append(profile.RegexFilter(args.include_tests))
+        p.filters.extend(filters)
+
+    tracer = trace.Tracer() if args.trace_events else None
 
     time_elapsed = TimeAttribute(start=time.time())
 
-    profile.run(profiles, args.log_level, backend, args.concurrency)
+    try:
+        profile.run(profiles, args.log_level, backend, args.concurrency,
+                    tracer=tracer)
+    finally:
+        if tracer is not None:
+            tracer.write(args.trace_events)
 
     time_elapsed.end = time.time()
-    backend.finalize({'time_elapsed': time_elapsed.to_json()})
+    metadata = {'time_elapsed': time_elapsed.to_json()}
+    metadata.update(_wflinfo_metadata())
+    backend.finalize(metadata)
 
     print('Thank you for running Piglit!\n'
           'Results have been written to ' + args.results_path)
@@ -388,10 +433,12 @@ def resume(input_):
     options.OPTIONS.sync = results.options['sync']
     options.OPTIONS.deqp_mustpass = results.options['deqp_mustpass']
     options.OPTIONS.proces_isolation = results.options['process_isolation']
+    options.OPTIONS.output_dir = path.join(args.results_path, 'output')
 
     core.get_config(args.config_file)
 
     options.OPTIONS.env['PIGLIT_PLATFORM'] = results.options['platform']
+    opengl.FastSkip.start_early = True
 
     results.options['env'] = core.collect_system_info()
     results.options['name'] = results.name
@@ -409,27 +456,48 @@ def resume(input_):
         if args.no_retry or result.result != 'incomplete':
             exclude_tests.add(name)
 
-    profiles = [profile.load_test_profile(p)
+    concurrency = results.options['concurrent']
+    dmesg_ = None
+    if results.options['dmesg']:
+        dmesg_ = dmesg.get_dmesg(results.options['dmesg'])
+        if not dmesg_.concurrent:
+            concurrency = "none"
+
+    def not_done(name, test):
+        """Keep tests that haven't completed."""
+        # Batches are written as the test they are part of.
+        if test is not None and test.batch_of is not None:
+            name = test.batch_of
+        return name not in exclude_tests
+
+    filters = []
+    if exclude_tests:
+        filters.append(not_done)
+    if results.options['exclude_filter']:
+        filters.append(profile.RegexFilter(results.options['exclude_filter'],
+                                           inverse=True))
+    if results.options['include_filter']:
+        filters.append(profile.RegexFilter(results.options['include_filter']))
+
+    load_filters = list(filters)
+    if results.options['forced_test_list']:
+        forced = frozenset(
+            t.lower() for t in results.options['forced_test_list'])
+        load_filters.append(lambda n, _: n.lower() in forced)
+
+    profiles = [profile.load_test_profile(p, load_filters)
                 for p in results.options['profile']]
     for p in profiles:
         p.results_dir = args.results_path
 
-        if results.options['dmesg']:
-            p.dmesg = dmesg.get_dmesg(results.options['dmesg'])
+        if dmesg_ is not None:
+            p.options['dmesg'] = dmesg_
 
         if results.options['monitoring']:
             p.options['monitor'] = monitoring.Monitoring(
                 results.options['monitoring'])
 
-        if exclude_tests:
-            p.filters.append(lambda n, _: n not in exclude_tests)
-        if results.options['exclude_filter']:
-            p.filters.append(
-                profile.RegexFilter(results.options['exclude_filter'],
-                                    inverse=True))
-        if results.options['include_filter']:
-            p.filters.append(
-                profile.RegexFilter(results.options['include_filter']))
+        p.filters.extend(filters)
 
         if results.options['forced_test_list']:
             p.forced_test_list = results.options['forced_test_list']
@@ -439,9 +507,9 @@ def resume(input_):
         profiles,
         results.options['log_level'],
         backend,
-        results.options['concurrent'])
+        concurrency)
 
-    backend.finalize()
+    backend.finalize(_wflinfo_metadata())
 
     print("Thank you for running Piglit!\n"
           "Results have been written to {0}".format(args.results_path))
@@ -39,7 +39,8 @@ __all__ = [
     'console',
     'csv',
     'html',
-    'feature'
+    'feature',
+    'timeline',
 ]
 
 
@@ -72,6 +73,11 @@ def html(input_):
                              "given as arguments. This speeds up HTML "
                              "generation, but reduces the info in the HTML "
                              "pages. May be used multiple times")
+    parser.add_argument("--spa",
+                        action="store_true",
+                        help="Generate a single html page which loads "
+                             "compressed data files on demand, rather than "
+                             "one html file per test")
     parser.add_argument("summaryDir",
                         metavar="<Summary Directory>",
                         help="Directory to put HTML files in")
@@ -114,7 +120,10 @@ def html(input_):
         args.resultsFiles.extend(core.parse_listfile(args.list))
 
     # Create the HTML output
-    summary.html(args.resultsFiles, args.summaryDir, args.exclude_details)
+    if args.spa:
+        summary.spa(args.resultsFiles, args.summaryDir, args.exclude_details)
+    else:
+        summary.html(args.resultsFiles, args.summaryDir, args.exclude_details)
 
 
 @exceptions.handler
@@ -148,6 +157,10 @@ def console(input_):
     parser.add_argument("-l", "--list",
                         action="store",
                         help="Use test results from a list file")
+    parser.add_argument("--stream",
+                        action="store_true",
+                        help="With -d/--diff, compare the results as sorted "
+                             "streams rather than loading them into memory")
     parser.add_argument("results",
                         metavar="<Results Path(s)>",
                         nargs="+",
@@ -161,12 +174,15 @@ def console(input_):
         parser.error('-d/--diff cannot be specified unless two or more '
                      'results files are specified')
 
+    if args.stream and args.mode != 'diff':
+        parser.error('--stream can only be used with -d/--diff')
+
     # make list of results
     if args.list:
         args.results.extend(core.parse_listfile(args.list))
 
     # Generate the output
-    summary.console(args.results, args.mode or 'all')
+    summary.console(args.results, args.mode or 'all', stream=args.stream)
 
 
 @exceptions.handler
@@ -252,6 +268,11 @@ def feature(input_):
     parser.add_argument("-o", "--overwrite",
                         action="store_true",
                         help="Overwrite existing directories")
+    parser.add_argument("-p", "--profile",
+                        action="store_true",
+                        help="Only count tests that are in the profile the "
+                             "results were generated from. This requires "
+                             "loading the profile, which can be slow")
     parser.add_argument("featureFile",
                         metavar="<Feature json file>",
                         help="Json file containing the features description")
@@ -279,4 +300,32 @@ def feature(input_):
     # If the requested directory doesn't exist, create it or throw an error
     core.checkDir(args.summaryDir, not args.overwrite)
 
-    summary.feat(args.resultsFiles, args.summaryDir, args.featureFile)
+    summary.feat(args.resultsFiles, args.summaryDir, args.featureFile,
+                 use_profile=args.profile)
+
+
+@exceptions.handler
+def timeline(input_):
+    """Print where the time of a run went, from a trace of its events."""
+    unparsed = parsers.parse_config(input_)[1]
+
+    # Adding the parent is necissary to get the help options
+    parser = argparse.ArgumentParser(parents=[parsers.CONFIG])
+    parser.add_argument("-g", "--gap",
+                        type=float,
+                        default=1.0,
+                        metavar="<seconds>",
+                        help="Only list idle gaps at least this long. "
+                             "Default: 1.0")
+    parser.add_argument("-n", "--top",
+                        type=int,
+                        default=10,
+                        metavar="<count>",
+                        help="The number of longest tests to list. "
+                             "Default: 10")
+    parser.add_argument("trace",
+                        metavar="<Trace File>",
+                        help="A trace written by piglit run --trace-events")
+    args = parser.parse_args(unparsed)
+
+    summary.timeline(args.trace, gap=args.gap, top=args.top)
@@ -148,7 +148,7 @@ class TestResult(object):
     """An object represting the result of a single test."""
     __slots__ = ['returncode', '_err', '_out', 'time', 'command', 'traceback',
                  'environment', 'subtests', 'dmesg', '__result', 'images',
-                 'exception', 'pid']
+                 'exception', 'pid', 'truncated']
     err = StringDescriptor('_err')
     out = StringDescriptor('_out')
 
@@ -163,6 +163,10 @@ class TestResult(object):
         self.traceback = None
         self.exception = None
         self.pid = []
+        # A dict for each stream of output that was too long to keep all of,
+        # with its name, total size, the bytes left out, and the file they
+        # were written to (see framework.test.base._Output)
+        self.truncated = []
         if result:
             self.result = result
         else:
@@ -190,6 +194,35 @@ class TestResult(object):
         except exceptions.PiglitInternalError as e:
             raise exceptions.PiglitFatalError(str(e))
 
+    def merge(self, other):
+        """Add the result of another run of the same test to this one.
+
+        This is used for tests that are run in batches, see
+        framework.profile.run. The subtests are combined, the worst result is
+        kept, the output is concatenated, and the time covers both runs.
+
+        """
+        # pylint: disable=assigning-non-slot
+        self.subtests.update(other.subtests)
+        self.__result = max(self.__result, other.__result)
+        if other.returncode:
+            self.returncode = other.returncode
+        elif self.returncode is None:
+            self.returncode = other.returncode
+        for attr in ['command', 'out', 'err', 'dmesg']:
+            value = '\n'.join(v for v in [getattr(self, attr),
+                                          getattr(other, attr)] if v)
+            setattr(self, attr, value)
+        self.exception = self.exception or other.exception
+        self.traceback = self.traceback or other.traceback
+        self.environment = self.environment or other.environment
+        self.pid.extend(other.pid)
+        self.truncated.extend(other.truncated)
+        if other.time.start and (not self.time.start or
+                                 other.time.start < self.time.start):
+            self.time.start = other.time.start
+        self.time.end = max(self.time.end, other.time.end)
+
     def to_json(self):
         """Return the TestResult as a json serializable object."""
         obj = {
@@ -206,6 +239,7 @@ class TestResult(object):
             'traceback': self.traceback,
             'dmesg': self.dmesg,
             'pid': self.pid,
+            'truncated': self.truncated,
         }
         return obj
 
@@ -225,7 +259,7 @@ class TestResult(object):
         inst = cls()
 
         for each in ['returncode', 'command', 'exception', 'environment',
-                     'traceback', 'dmesg', 'pid', 'result']:
+                     'traceback', 'dmesg', 'pid', 'truncated', 'result']:
             if each in dict_:
                 setattr(inst, each, dict_[each])
 
@@ -300,6 +334,7 @@ class TestrunResult(object):
         self.wglinfo = None
         self.clinfo = None
         self.lspci = None
+        self.wflinfo = None
         self.time_elapsed = TimeAttribute()
         self.tests = collections.OrderedDict()
         self.totals = collections.defaultdict(Totals)
@@ -368,7 +403,7 @@ class TestrunResult(object):
         """
         res = cls()
         for name in ['name', 'uname', 'options', 'glxinfo', 'wglinfo', 'lspci',
-                     'results_version', 'clinfo']:
+                     'results_version', 'clinfo', 'wflinfo']:
             value = dict_.get(name)
             if value:
                 setattr(res, name, value)
@@ -27,5 +27,6 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
-from .html_ import html, feat
+from .html_ import html, feat, spa
 from .console_ import console
+from .timeline_ import timeline
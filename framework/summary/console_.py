@@ -31,6 +31,7 @@ import six
 
 from framework import grouptools, backends
 from .common import Results
+from .stream import StreamResults
 
 __all__ = [
     'console',
@@ -97,9 +98,28 @@ def _print_result(results, list_):
             statuses=' '.join(str(r) for r in results.get_result(test))))
 
 
-def console(results, mode):
-    """ Write summary information to the console """
+def _print_stream_diff(results):
+    """Print the changes between runs, then a summary."""
+    for test, statuses in results.diff():
+        print("{test}: {statuses}".format(
+            test=grouptools.format(test),
+            statuses=' '.join(str(r) for r in statuses)))
+    _print_summary(results)
+
+
+def console(results, mode, stream=False):
+    """ Write summary information to the console
+
+    If stream is True (only valid with the diff mode) the results are not
+    loaded into memory, but are merge-joined by name, see summary.stream.
+
+    """
     assert mode in ['summary', 'diff', 'incomplete', 'all'], mode
+    if stream:
+        assert mode == 'diff', mode
+        _print_stream_diff(StreamResults(results))
+        return
+
     results = Results([backends.load(r) for r in results])
 
     # Print the name of the test and the status from each test run
@@ -24,61 +24,103 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import re
 
 try:
     import simplejson as json
 except ImportError:
     import json
 
+import six
+
 from framework import profile, status
 
 
+def _compile(pattern):
+    """Compile a feature's include or exclude regex, None if it's empty."""
+    if pattern and not pattern.isspace():
+        return re.compile(pattern, flags=re.IGNORECASE)
+    return None
+
+
+def _find_members(names, features):
+    """Find the names that belong to each feature.
+
+    All of the include regexes are first combined into a single regex, which
+    is used to throw out the names that can't be in any feature with one scan.
+    Only the remaining names are matched against the regexes of each feature.
+
+    Arguments:
+    names -- an iterable of test names
+    features -- a dict mapping feature names to (include, exclude) compiled
+                regex pairs. Either may be None.
+
+    """
+    includes = [i for i, _ in six.itervalues(features)]
+    candidates = names
+    if includes and None not in includes:
+        try:
+            combined = re.compile(
+                '|'.join('(?:{})'.format(i.pattern) for i in includes),
+                flags=re.IGNORECASE)
+        except re.error:
+            # The regexes can't always be combined (named groups with the same
+            # name for example), just check every name against each feature.
+            pass
+        else:
+            candidates = [n for n in names if combined.search(n)]
+
+    members = {}
+    for feature, (include, exclude) in six.iteritems(features):
+        members[feature] = set(
+            n for n in candidates
+            if (include is None or include.search(n)) and
+            not (exclude is not None and exclude.search(n)))
+    return members
+
+
 class FeatResults(object):  # pylint: disable=too-few-public-methods
     """Container object for results.
 
     Has the results, feature profiles and feature computed results.
 
+    The membership of each feature is calculated once, over the names of the
+    tests in all of the results. If use_profile is True only tests that are
+    also in the profile the results were generated from are considered, this
+    requires importing the profile, which can be very slow.
+
     """
-    def __init__(self, results, json_file):
+    def __init__(self, results, json_file, use_profile=False):
 
         with open(json_file) as data:
             feature_data = json.load(data)
 
         self.feat_fractions = {}
         self.feat_status = {}
-        self.features = set()
+        self.features = set(feature_data)
         self.results = results
 
-        profiles = {}
-
-        # we expect all the result sets to be for the same profile
-        profile_orig = profile.load_test_profile(results[0].options['profile'][0])
+        names = set()
+        for res in results:
+            names.update(res.tests)
 
-        for feature in feature_data:
-            self.features.add(feature)
+        if use_profile:
+            # we expect all the result sets to be for the same profile
+            profile_orig = profile.load_test_profile(
+                results[0].options['profile'][0])
+            names &= set(n for n, _ in profile_orig.itertests())
 
-            profiles[feature] = profile_orig.copy()
-
-            incl_str = feature_data[feature]["include_tests"]
-            excl_str = feature_data[feature]["exclude_tests"]
-
-            profiles[feature].filters.append(
-                profile.RegexFilter(
-                    [incl_str] if incl_str and not incl_str.isspace() else []))
-            profiles[feature].filters.append(
-                profile.RegexFilter(
-                    [excl_str] if excl_str and not excl_str.isspace() else [],
-                    inverse=True))
+        members = _find_members(names, dict(
+            (f, (_compile(d["include_tests"]), _compile(d["exclude_tests"])))
+            for f, d in six.iteritems(feature_data)))
 
         for results in self.results:
             self.feat_fractions[results.name] = {}
             self.feat_status[results.name] = {}
 
             for feature in feature_data:
-                result_set = set(results.tests)
-                profile_set = set(a for a, _ in profiles[feature].itertests())
-
-                common_set = profile_set & result_set
+                common_set = [x for x in members[feature]
+                              if x in results.tests]
                 passed_list = [x for x in common_set if results.tests[x].result == status.PASS]
 
                 total = len(common_set)
@@ -25,47 +25,82 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import collections
+import copy
 import errno
 import getpass
+import itertools
 import os
 import shutil
 import sys
 import tempfile
 
-import mako
-from mako.lookup import TemplateLookup
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
 import six
 
 # a local variable status exists, prevent accidental overloading by renaming
 # the module
-from framework import backends, exceptions, core
+from framework import backends, exceptions, core, grouptools
+from framework.backends import compression
+from framework.backends.json import piglit_encoder
+from framework.results import TestResult
 
 from .common import Results, escape_filename, escape_pathname
-from .feature import FeatResults
 
 __all__ = [
     'html',
-    'feat'
+    'feat',
+    'spa',
 ]
 
-_TEMP_DIR = os.path.join(
-    tempfile.gettempdir(),
-    getpass.getuser(),
-    'python-{}'.format(sys.version.split()[0]),
-    'mako-{}'.format(mako.__version__),
-    'summary',
-    'html')
-
 _TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '../..', 'templates')
 
-# To ease the bytes/str/uincode between python 2 and python 3 the
-# output_encoding keyword is set below. This means that in both python 2 and 3
-# bytes are returned. This means that the files need to be opened in bytes mode
-# ('wb').
-_TEMPLATES = TemplateLookup(
-    _TEMPLATE_DIR,
-    output_encoding='utf-8',
-    module_directory=os.path.join(_TEMP_DIR, "html-summary"))
+# The comparison pages, these are the names of the attributes of
+# common.Names that are used to generate each page.
+_PAGES = ['changes', 'problems', 'skips', 'fixes', 'regressions', 'enabled',
+          'disabled']
+
+# The number of group levels used to split tests into data shards for the
+# single page summary. 'spec@arb_foo@bar' will be put in the 'spec@arb_foo'
+# shard with a depth of 2.
+_SPA_SHARD_DEPTH = 2
+
+# The mako TemplateLookup, see _templates()
+_TEMPLATES = None
+
+
+def _templates():
+    """Return the mako TemplateLookup for the summary templates.
+
+    mako is slow to import and only needed for html summaries, so it isn't
+    imported until the first time this is called.
+    """
+    global _TEMPLATES  # pylint: disable=global-statement
+    if _TEMPLATES is None:
+        import mako
+        from mako.lookup import TemplateLookup
+
+        temp_dir = os.path.join(
+            tempfile.gettempdir(),
+            getpass.getuser(),
+            'python-{}'.format(sys.version.split()[0]),
+            'mako-{}'.format(mako.__version__),
+            'summary',
+            'html')
+
+        # To ease the bytes/str/uincode between python 2 and python 3 the
+        # output_encoding keyword is set below. This means that in both python
+        # 2 and 3 bytes are returned. This means that the files need to be
+        # opened in bytes mode ('wb').
+        _TEMPLATES = TemplateLookup(
+            _TEMPLATE_DIR,
+            output_encoding='utf-8',
+            module_directory=os.path.join(temp_dir, "html-summary"))
+    return _TEMPLATES
 
 
 def _copy_static_files(destination):
@@ -94,7 +129,7 @@ def _make_testrun_info(results, destination, exclude=None):
                 'Duplicate value: {}'.format(name))
 
         with open(os.path.join(destination, name, "index.html"), 'wb') as out:
-            out.write(_TEMPLATES.get_template('testrun_info.mako').render(
+            out.write(_templates().get_template('testrun_info.mako').render(
                 name=each.name,
                 totals=each.totals['root'],
                 time=each.time_elapsed.delta,
@@ -114,7 +149,7 @@ def _make_testrun_info(results, destination, exclude=None):
                 core.check_dir(temp_path)
 
                 with open(html_path, 'wb') as out:
-                    out.write(_TEMPLATES.get_template(
+                    out.write(_templates().get_template(
                         'test_result.mako').render(
                             testname=key,
                             value=value,
@@ -124,14 +159,13 @@ def _make_testrun_info(results, destination, exclude=None):
 
 def _make_comparison_pages(results, destination, exclude):
     """Create the pages of comparisons."""
-    pages = frozenset(['changes', 'problems', 'skips', 'fixes',
-                       'regressions', 'enabled', 'disabled'])
+    pages = frozenset(_PAGES)
 
     # Index.html is a bit of a special case since there is index, all, and
     # alltests, where the other pages all use the same name. ie,
     # changes.html, changes, and page=changes.
     with open(os.path.join(destination, "index.html"), 'wb') as out:
-        out.write(_TEMPLATES.get_template('index.mako').render(
+        out.write(_templates().get_template('index.mako').render(
             results=results,
             page='all',
             pages=pages,
@@ -142,7 +176,7 @@ def _make_comparison_pages(results, destination, exclude):
         with open(os.path.join(destination, page + '.html'), 'wb') as out:
             # If there is information to display display it
             if sum(getattr(results.counts, page)) > 0:
-                out.write(_TEMPLATES.get_template('index.mako').render(
+                out.write(_templates().get_template('index.mako').render(
                     results=results,
                     pages=pages,
                     page=page,
@@ -150,7 +184,7 @@ def _make_comparison_pages(results, destination, exclude):
             # otherwise provide an empty page
             else:
                 out.write(
-                    _TEMPLATES.get_template('empty_status.mako').render(
+                    _templates().get_template('empty_status.mako').render(
                         page=page, pages=pages))
 
 
@@ -158,7 +192,7 @@ def _make_feature_info(results, destination):
     """Create the feature readiness page."""
 
     with open(os.path.join(destination, "feature.html"), 'wb') as out:
-        out.write(_TEMPLATES.get_template('feature.mako').render(
+        out.write(_templates().get_template('feature.mako').render(
             results=results))
 
 
@@ -179,11 +213,167 @@ def html(results, destination, exclude):
     _make_comparison_pages(results, destination, exclude)
 
 
-def feat(results, destination, feat_desc):
+def feat(results, destination, feat_desc, use_profile=False):
     """Produce HTML feature readiness summary."""
+    # feature imports framework.profile (and with it all of the test
+    # classes), which the other summaries don't need
+    from .feature import FeatResults
 
-    feat_res = FeatResults([backends.load(i) for i in results], feat_desc)
+    feat_res = FeatResults([backends.load(i) for i in results], feat_desc,
+                           use_profile=use_profile)
 
     _copy_static_files(destination)
     _make_testrun_info(feat_res, destination)
     _make_feature_info(feat_res, destination)
+
+
+def _spa_shard_key(name):
+    """Get the name of the data shard that a test belongs in."""
+    return grouptools.join(*grouptools.split(name)[:_SPA_SHARD_DEPTH])
+
+
+def _spa_owner(results, name):
+    """Get the name of the test that holds the result for name.
+
+    For tests this is the name itself, for subtests this is the name of the
+    test that the subtest belongs to.
+
+    """
+    if any(name in r.tests for r in results.results):
+        return name
+    return grouptools.groupname(name)
+
+
+def _write_spa_data(destination, filename, data):
+    """Write one gzip compressed json data file for the single page summary."""
+    with compression.COMPRESSORS['gz'](
+            os.path.join(destination, 'data', filename)) as out:
+        json.dump(data, out, default=piglit_encoder)
+
+
+def _spa_statuses(run):
+    """Return a copy of run that only has the status of each test.
+
+    The single page summary needs the statuses of every run at the same time
+    to compare them, but it only needs the details of one run at a time.
+
+    """
+    slim = copy.copy(run)
+    slim.tests = collections.OrderedDict()
+    for name, test in six.iteritems(run.tests):
+        slim.tests[name] = TestResult(test.result)
+        slim.tests[name].subtests.update(test.subtests)
+    return slim
+
+
+def _make_spa_shard(results, destination, index, names):
+    """Write the statuses file for a single shard.
+
+    This writes one file with the statuses and comparison pages of each
+    name. Returns the counts of each page for the shard.
+
+    """
+    counts = dict((p, 0) for p in _PAGES)
+    tests = []
+    for name, owner in names:
+        pages = [p for p in _PAGES
+                 if name in getattr(results.names, 'all_' + p)]
+        for page in pages:
+            counts[page] += 1
+        tests.append({
+            'name': name,
+            'owner': owner,
+            'status': results.get_result(name),
+            'pages': pages,
+        })
+    _write_spa_data(destination, '{}.json.gz'.format(index), tests)
+    return counts
+
+
+def _make_spa_details(run, index, destination, shard_of, shards, exclude):
+    """Write the details files of one testrun, one file for each shard.
+
+    Arguments:
+    run      -- the TestrunResult to write the details of
+    index    -- the index of run in the summary
+    shard_of -- a dict mapping the name of each test to its shard
+    shards   -- the number of shards
+
+    """
+    details = [{} for _ in range(shards)]
+    for name, value in six.iteritems(run.tests):
+        shard = shard_of.get(name)
+        if shard is not None and value.result not in exclude:
+            details[shard][name] = value
+    for i, each in enumerate(details):
+        _write_spa_data(destination, '{}-{}.json.gz'.format(i, index), each)
+
+
+def _make_spa_index(results, destination, shards):
+    """Write the index data file for the single page summary."""
+    _write_spa_data(destination, 'index.json.gz', {
+        'runs': [{
+            'name': each.name,
+            'totals': each.totals['root'],
+            'time': each.time_elapsed.delta,
+            'options': each.options,
+            'uname': each.uname,
+            'glxinfo': each.glxinfo,
+            'clinfo': each.clinfo,
+            'lspci': each.lspci,
+        } for each in results.results],
+        'pages': dict((p, sum(getattr(results.counts, p))) for p in _PAGES),
+        'all': results.counts.all,
+        'shards': shards,
+    })
+
+
+def spa(results, destination, exclude):
+    """Produce a single page HTML summary.
+
+    Rather than generating one HTML file for each test in each run, this
+    generates a static index page and a set of gzip compressed json files. The
+    page fetches the data files on demand and renders the results client side.
+
+    The tests are split into shards by group, with one file for the statuses
+    of all runs, and one for the details of each run. To keep the memory used
+    down only the statuses of the runs are kept while the status files are
+    written, then each run is loaded again and its details written on its
+    own, so the peak memory use is that of the largest run (plus the
+    statuses of the others), not of all of them.
+
+    """
+    paths = results
+    results = Results([_spa_statuses(backends.load(i)) for i in paths])
+    exclude = exclude or {}
+
+    core.check_dir(os.path.join(destination, 'data'))
+    _copy_static_files(destination)
+    for each in ['spa.html', 'spa.js']:
+        shutil.copy(os.path.join(_TEMPLATE_DIR, each),
+                    os.path.join(destination, each.replace('spa.', 'index.')))
+
+    names = sorted(
+        (_spa_shard_key(o), n, o)
+        for n, o in ((n, _spa_owner(results, n)) for n in results.names.all))
+
+    shards = []
+    shard_of = {}
+    for i, (group, members) in enumerate(
+            itertools.groupby(names, lambda x: x[0])):
+        members = [(n, o) for _, n, o in members]
+        counts = _make_spa_shard(results, destination, i, members)
+        shards.append({
+            'group': group,
+            'file': i,
+            'all': len(members),
+            'pages': counts,
+        })
+        for _, owner in members:
+            shard_of[owner] = i
+
+    for i, path in enumerate(paths):
+        _make_spa_details(backends.load(path), i, destination, shard_of,
+                          len(shards), exclude)
+
+    _make_spa_index(results, destination, shards)
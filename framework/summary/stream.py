@@ -0,0 +1,384 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Streaming comparison of results that doesn't load whole runs.
+
+The summary.common.Results class needs every run completely loaded into
+memory. This module provides an alternative for diffs: each results file is
+read as a stream of (name, status) pairs sorted by name, and the streams are
+merge-joined to find the changes, regressions, and fixes.
+
+Only the name and status of each test are kept. Sorting is done in chunks of
+CHUNK_SIZE tests, which are spilled to temporary files and merged, so memory
+usage is O(CHUNK_SIZE) for each run, not the size of the run. Sorting means
+that each run has to be read completely before its first test is yielded, so
+nothing is reported until every run has been read.
+
+Final json results files in the current format are parsed incrementally; any
+other kind of result (junit, an incomplete run, or json from an older version
+of piglit, which needs updating) is loaded through backends.load and then
+streamed.
+
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import heapq
+import itertools
+import os
+import tempfile
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import six
+from six.moves import range
+
+from framework import backends, grouptools, results
+from framework import status as so
+from framework.backends import compression
+
+__all__ = [
+    'ResultStream',
+    'StreamResults',
+    'merge_join',
+]
+
+# The number of tests that are sorted in memory before being spilled to disk
+CHUNK_SIZE = 50000
+
+# The number of characters read from a results file at once
+_READ_SIZE = 64 * 1024
+
+
+class _JSONReader(object):
+    """An incremental reader for piglit's json results files.
+
+    This walks the top level object of a results file, decoding one value at
+    a time with JSONDecoder.raw_decode, and refilling its buffer as needed. The
+    tests object is yielded one test at a time, so only a single test needs to
+    be held in memory at once.
+
+    """
+    def __init__(self, file_):
+        self.__file = file_
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+        self.__decoder = json.JSONDecoder()
+        self.metadata = {}
+
+    def __fill(self):
+        """Read more data into the buffer, return False at the end of file."""
+        if self.__eof:
+            return False
+        chunk = self.__file.read(_READ_SIZE)
+        if not chunk:
+            self.__eof = True
+            return False
+        self.__buffer = self.__buffer[self.__pos:] + chunk
+        self.__pos = 0
+        return True
+
+    def __peek(self):
+        """Skip whitespace and return the next character."""
+        while True:
+            while self.__pos < len(self.__buffer):
+                char = self.__buffer[self.__pos]
+                if not char.isspace():
+                    return char
+                self.__pos += 1
+            if not self.__fill():
+                raise ValueError('Unexpected end of json results')
+
+    def __expect(self, chars):
+        """Consume the next character, which must be one of chars."""
+        char = self.__peek()
+        if char not in chars:
+            raise ValueError(
+                'Expected one of "{}" but got "{}"'.format(chars, char))
+        self.__pos += 1
+        return char
+
+    def __decode(self):
+        """Decode and return the next json value."""
+        self.__peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer,
+                                                       self.__pos)
+            except ValueError:
+                if not self.__fill():
+                    raise
+                continue
+
+            # A number at the end of the buffer may have been cut short
+            if end < len(self.__buffer) or not self.__fill():
+                self.__pos = end
+                return value
+
+    def __iter__(self):
+        """Yield (name, dict) pairs for each test in the file.
+
+        Any other top level values are stored in the metadata attribute.
+
+        """
+        self.__expect('{')
+        if self.__peek() == '}':
+            return
+        while True:
+            key = self.__decode()
+            self.__expect(':')
+            if key == 'tests':
+                self.__expect('{')
+                if self.__peek() != '}':
+                    while True:
+                        name = self.__decode()
+                        self.__expect(':')
+                        yield name, self.__decode()
+                        if self.__expect(',}') == '}':
+                            break
+                else:
+                    self.__pos += 1
+            else:
+                self.metadata[key] = self.__decode()
+            if self.__expect(',}') == '}':
+                break
+
+
+def _expand(name, subtests, result):
+    """Yield (name, status) pairs for a test and its subtests."""
+    subtests = [(k, v) for k, v in six.iteritems(subtests or {})
+                if k != '__type__']
+    if subtests:
+        for sub, stat in subtests:
+            yield grouptools.join(name, sub), six.text_type(stat)
+    else:
+        yield name, six.text_type(result)
+
+
+def _spill(chunk):
+    """Write a sorted chunk to a temporary file, return the open file."""
+    f = tempfile.TemporaryFile(mode='w+')
+    for pair in chunk:
+        f.write(json.dumps(pair))
+        f.write('\n')
+    f.seek(0)
+    return f
+
+
+class _Outdated(Exception):
+    """Raised when a json results file needs to be updated to be read."""
+
+
+def _read_spill(f):
+    """Yield the (name, status) pairs from a spilled chunk."""
+    try:
+        for line in f:
+            yield tuple(json.loads(line))
+    finally:
+        f.close()
+
+
+class ResultStream(object):
+    """A single results file, as a stream of (name, status) pairs.
+
+    Iterating an instance yields each test (or subtest) in sorted order. The
+    whole file is read before the first test is yielded. The name and the root
+    totals of the run are available once the stream has been exhausted.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.name = None
+        self.totals = {'root': results.Totals()}
+
+    def _json_file(self):
+        """Return a (path, compression) pair if path is a final json file."""
+        path = self.path
+        if os.path.isdir(path):
+            for each in sorted(os.listdir(path)):
+                if each.startswith('results.json') and \
+                        not each.endswith('.old'):
+                    path = os.path.join(path, each)
+                    break
+            else:
+                return None
+
+        name, extension = os.path.splitext(path)
+        mode = 'none'
+        if extension in compression.COMPRESSION_SUFFIXES:
+            mode = extension[1:]
+            extension = os.path.splitext(name)[1]
+        if extension != '.json' or mode not in compression.DECOMPRESSORS:
+            return None
+        return path, mode
+
+    def _parsed(self, json_file):
+        """Yield (name, status) pairs from a json file, in file order.
+
+        The version may come after the tests, so _Outdated is raised after
+        all of them have been yielded if the file needs updating.
+
+        """
+        # Importing the json backend is slow, so it's only done if needed
+        from framework.backends.json import CURRENT_JSON_VERSION
+
+        with compression.DECOMPRESSORS[json_file[1]](json_file[0]) as f:
+            reader = _JSONReader(f)
+            for name, test in reader:
+                for pair in _expand(name, test.get('subtests'),
+                                    test['result']):
+                    yield pair
+        if reader.metadata.get('results_version') != CURRENT_JSON_VERSION:
+            raise _Outdated()
+        self.name = reader.metadata.get('name')
+
+    def _loaded(self):
+        """Yield (name, status) pairs from a run loaded by the backends."""
+        run = backends.load(self.path)
+        self.name = run.name
+        for name, test in six.iteritems(run.tests):
+            for pair in _expand(name, test.subtests, test.result):
+                yield pair
+
+    def _sort(self, pairs):
+        """Sort pairs, returning the last chunk and the spilled files."""
+        self.totals = {'root': results.Totals()}
+        spills = []
+        chunk = []
+        try:
+            for pair in pairs:
+                self.totals['root'][pair[1]] += 1
+                chunk.append(pair)
+                if len(chunk) >= CHUNK_SIZE:
+                    chunk.sort()
+                    spills.append(_spill(chunk))
+                    chunk = []
+            chunk.sort()
+        except BaseException:
+            for f in spills:
+                f.close()
+            raise
+        return chunk, spills
+
+    def __iter__(self):
+        json_file = self._json_file()
+        if json_file is not None:
+            try:
+                chunk, spills = self._sort(self._parsed(json_file))
+            except _Outdated:
+                chunk, spills = self._sort(self._loaded())
+        else:
+            chunk, spills = self._sort(self._loaded())
+
+        if not self.name:
+            self.name = os.path.basename(self.path)
+
+        if not spills:
+            merged = iter(chunk)
+        else:
+            merged = heapq.merge(iter(chunk),
+                                 *[_read_spill(f) for f in spills])
+
+        for name, stat in merged:
+            yield name, so.status_lookup(stat)
+
+
+def merge_join(streams):
+    """Merge-join sorted streams of (name, status) pairs.
+
+    Yields (name, [status, ...]) for each name in any stream, in sorted order,
+    with one status per stream. A stream that lacks a name gets
+    status.NOTRUN.
+
+    """
+    def tag(i, stream):
+        """Add the index of the stream to each pair."""
+        for name, stat in stream:
+            yield name, i, stat
+
+    tagged = [tag(i, s) for i, s in enumerate(streams)]
+
+    for name, group in itertools.groupby(heapq.merge(*tagged),
+                                         key=lambda x: x[0]):
+        statuses = [so.NOTRUN] * len(streams)
+        for _, i, stat in group:
+            statuses[i] = stat
+        yield name, statuses
+
+
+def _changed(prev, cur):
+    """The comparison used for the changes page in summary.common."""
+    return prev != cur and {prev, cur} != {so.SKIP, so.NOTRUN}
+
+
+def _regressed(prev, cur):
+    """The comparison used for the regressions page in summary.common."""
+    return prev < cur and min(prev, cur) >= so.PASS
+
+
+def _fixed(prev, cur):
+    """The comparison used for the fixes page in summary.common."""
+    return prev > cur and min(prev, cur) >= so.PASS
+
+
+class _StreamCounts(object):  # pylint: disable=too-few-public-methods
+    """The subset of summary.common.Counts that a stream can provide."""
+    def __init__(self, length):
+        # Like Counts there is no value for the first run, since there can't
+        # be changes from nil -> 0
+        self.changes = [0] * length
+        self.regressions = [0] * length
+        self.fixes = [0] * length
+
+
+class StreamResults(object):
+    """A streaming counterpart to summary.common.Results.
+
+    Iterating over the instance with diff() yields each test that changed
+    between any two consecutive runs. Once that is done the results and
+    counts attributes can be used in place of the ones from Results to print
+    a summary.
+
+    """
+    def __init__(self, paths):
+        self.results = [ResultStream(p) for p in paths]
+        self.counts = _StreamCounts(len(self.results))
+
+    def diff(self):
+        """Yield (name, statuses) for each test that changed."""
+        for name, statuses in merge_join(self.results):
+            changed = False
+            for i in range(1, len(statuses)):
+                prev, cur = statuses[i - 1], statuses[i]
+                if _changed(prev, cur):
+                    changed = True
+                    self.counts.changes[i] += 1
+                if _regressed(prev, cur):
+                    self.counts.regressions[i] += 1
+                if _fixed(prev, cur):
+                    self.counts.fixes[i] += 1
+            if changed:
+                yield name, statuses
@@ -0,0 +1,251 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Analyse a trace written by piglit run --trace-events.
+
+This reports how well the run used its pools: times when nothing was running
+at all, time when only the serial pool was running, how busy each pool's
+workers were, and the critical path (the chain of tests on the worker that
+finished last, which is what bounds the length of the run).
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import collections
+import heapq
+import textwrap
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import six
+
+from framework import exceptions
+from framework.trace import POOLS
+
+__all__ = [
+    'Timeline',
+    'timeline',
+]
+
+_POOL_NAMES = {v: k for k, v in six.iteritems(POOLS)}
+
+Span = collections.namedtuple('Span', ['name', 'pool', 'worker', 'start',
+                                       'end', 'status'])
+
+_TEMPLATE = textwrap.dedent("""\
+    timeline:
+            wall time: {wall:.3f}s
+            test time: {busy:.3f}s
+          parallelism: {parallelism:.2f}
+            idle time: {idle:.3f}s
+     serial-only time: {serial_only:.3f}s""")
+
+
+def _union(intervals):
+    """Merge a list of (start, end) intervals into a sorted disjoint list."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _length(intervals):
+    return sum(e - s for s, e in intervals)
+
+
+def _intersection(first, second):
+    """Return the intersection of two sorted disjoint interval lists."""
+    out = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            out.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+class Timeline(object):
+    """The tests from a trace, and analysis of them.
+
+    Times are in seconds from the start of the trace.
+
+    Arguments:
+    events -- the list of trace events
+
+    """
+    def __init__(self, events):
+        self.tests = []
+        self.phases = collections.defaultdict(lambda: 0.0)
+
+        for event in events:
+            if event.get('ph') != 'X':
+                continue
+            if event.get('cat') == 'phase':
+                self.phases[event['name']] += event['dur'] / 1000000
+            elif event.get('cat') == 'test':
+                start = event['ts'] / 1000000
+                self.tests.append(Span(
+                    event['name'],
+                    _POOL_NAMES.get(event['pid'], six.text_type(event['pid'])),
+                    event['tid'],
+                    start,
+                    start + event['dur'] / 1000000,
+                    event.get('args', {}).get('status')))
+
+        if not self.tests:
+            raise exceptions.PiglitFatalError('The trace has no tests in it.')
+        self.tests.sort(key=lambda t: t.start)
+
+        self.start = self.tests[0].start
+        self.end = max(t.end for t in self.tests)
+
+    @classmethod
+    def load(cls, path):
+        """Load a trace file."""
+        with open(path, 'r') as f:
+            trace = json.load(f)
+        if isinstance(trace, dict):
+            trace = trace.get('traceEvents', [])
+        return cls(trace)
+
+    @property
+    def wall(self):
+        """The time from the start of the first test to the end of the last."""
+        return self.end - self.start
+
+    @property
+    def busy(self):
+        """The total time spent running tests."""
+        return sum(t.end - t.start for t in self.tests)
+
+    def _covered(self, pool=None):
+        return _union((t.start, t.end) for t in self.tests
+                      if pool is None or t.pool == pool)
+
+    def idle_gaps(self, minimum=0.0):
+        """Return the (start, end) times when no test was running.
+
+        Only gaps of at least minimum seconds are returned.
+
+        """
+        covered = self._covered()
+        return [(a[1], b[0]) for a, b in zip(covered, covered[1:])
+                if b[0] - a[1] >= minimum]
+
+    def serial_only(self):
+        """Return how long the serial pool ran with the concurrent pool idle."""
+        serial = self._covered('serial')
+        return _length(serial) - _length(
+            _intersection(serial, self._covered('concurrent')))
+
+    def pools(self):
+        """Return a dict of pool name to (workers, span, busy, utilisation).
+
+        Utilisation is the fraction of the pool's span that its workers spent
+        running tests.
+
+        """
+        tests = collections.defaultdict(list)
+        for t in self.tests:
+            tests[t.pool].append(t)
+
+        out = {}
+        for pool, spans in six.iteritems(tests):
+            workers = len(set(t.worker for t in spans))
+            span = max(t.end for t in spans) - min(t.start for t in spans)
+            busy = sum(t.end - t.start for t in spans)
+            out[pool] = (workers, span, busy,
+                         busy / (workers * span) if span else 1.0)
+        return out
+
+    def critical_path(self):
+        """Return the tests run by the worker that finished last."""
+        last = max(self.tests, key=lambda t: t.end)
+        return [t for t in self.tests
+                if (t.pool, t.worker) == (last.pool, last.worker)]
+
+
+def timeline(path, gap=1.0, top=10):
+    """Print an analysis of a trace file.
+
+    Arguments:
+    path -- the trace written by piglit run --trace-events
+
+    Keyword Arguments:
+    gap -- the shortest idle gap, in seconds, to list. Default: 1.0
+    top -- the number of longest tests to list. Default: 10
+
+    """
+    line = Timeline.load(path)
+    gaps = line.idle_gaps()
+
+    print(_TEMPLATE.format(
+        wall=line.wall,
+        busy=line.busy,
+        parallelism=line.busy / line.wall if line.wall else 1.0,
+        idle=sum(e - s for s, e in gaps),
+        serial_only=line.serial_only()))
+
+    print('\npools:')
+    for pool, (workers, span, busy, util) in sorted(
+            six.iteritems(line.pools())):
+        print('    {}: {} workers, {:.3f}s span, {:.3f}s busy, {:.1%} '
+              'utilisation'.format(pool, workers, span, busy, util))
+
+    if line.phases:
+        print('\nphases:')
+        for name, total in sorted(six.iteritems(line.phases),
+                                  key=lambda x: x[1], reverse=True):
+            print('    {}: {:.3f}s'.format(name, total))
+
+    gaps = [g for g in gaps if g[1] - g[0] >= gap]
+    if gaps:
+        print('\nidle gaps:')
+        for start, end in gaps:
+            print('    {:.3f}s at {:.3f}s'.format(end - start,
+                                                   start - line.start))
+
+    critical = line.critical_path()
+    print('\ncritical path: {} worker {}, {} tests, {:.3f}s busy'.format(
+        critical[0].pool, critical[0].worker, len(critical),
+        sum(t.end - t.start for t in critical)))
+    for t in heapq.nlargest(top, critical, key=lambda t: t.end - t.start):
+        print('    {:.3f}s {} ({})'.format(t.end - t.start, t.name, t.status))
+
+    serial = [t for t in line.tests if t.pool == 'serial']
+    if serial:
+        print('\nlongest serial tests:')
+        for t in heapq.nlargest(top, serial, key=lambda t: t.end - t.start):
+            print('    {:.3f}s {} ({})'.format(t.end - t.start, t.name,
+                                               t.status))
@@ -25,6 +25,7 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import collections
 import errno
 import os
 import time
@@ -34,13 +35,17 @@ import itertools
 import abc
 import copy
 import signal
+import tempfile
+import threading
 import warnings
 
 import six
 from six.moves import range
 
+from framework import core
 from framework import exceptions
 from framework import status
+from framework import trace
 from framework.options import OPTIONS
 from framework.results import TestResult
 
@@ -119,6 +124,204 @@ __all__ = [
 _SUPPRESS_TIMEOUT = bool(os.environ.get('PIGLIT_NO_TIMEOUT', False))
 
 
+def _kill(proc):
+    """Stop a test that has timed out, and any processes it started."""
+    proc.terminate()
+    try:
+        proc.wait(timeout=3)
+    except subprocess.TimeoutExpired:
+        pass
+
+    # Processes started by the test can outlive it, and keep its stdout and
+    # stderr open, so the whole session is killed. Each test is the leader of
+    # its own session, so the process group id is the pid of the test.
+    # XXX: This is probably broken on windows, since os.killpg doesn't
+    # exist on windows. What is the right way to handle this?
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError as e:
+        if e.errno != errno.ESRCH:
+            raise
+
+
+# The default number of MiB of each of stdout and stderr that are kept in
+# memory, see get_output_limit().
+DEFAULT_OUTPUT_LIMIT = 4
+
+# Output is read one line at a time, but lines longer than this are split, so
+# that a test printing without newlines can't use unbounded memory.
+_MAX_LINE = 64 * 1024
+
+
+def get_output_limit():
+    """Return the number of bytes of stdout and stderr kept for each test.
+
+    This is read from the PIGLIT_OUTPUT_LIMIT environment variable, then the
+    piglit.conf [core]:output_limit key, finally DEFAULT_OUTPUT_LIMIT is used.
+    The limit is in MiB.
+    """
+    limit = (os.environ.get('PIGLIT_OUTPUT_LIMIT') or
+             core.PIGLIT_CONFIG.safe_get('core', 'output_limit') or
+             DEFAULT_OUTPUT_LIMIT)
+    try:
+        return int(float(limit) * 1024 * 1024)
+    except ValueError:
+        warnings.warn('Invalid output limit "{}", using the default of {} '
+                      'MiB'.format(limit, DEFAULT_OUTPUT_LIMIT))
+        return DEFAULT_OUTPUT_LIMIT * 1024 * 1024
+
+
+class _Output(object):
+    """Collects one stream of a test's output, using bounded memory.
+
+    The first and last limit / 2 bytes of the output are kept in memory (the
+    last in a ring buffer), anything printed between them is written to a
+    file in directory instead, if a directory is given. getvalue() replaces
+    the part that was left out with a marker giving its size and the file it
+    was written to. Lines starting with "PIGLIT" are always kept, since they
+    hold the results of the test, up to another limit / 2 bytes of them.
+    """
+
+    def __init__(self, limit, directory=None, prefix=''):
+        self.__half = limit // 2
+        self.__head = []
+        self.__head_size = 0
+        self.__tail = collections.deque()
+        self.__tail_size = 0
+        self.__kept = []
+        self.__kept_size = 0
+        self.__directory = directory
+        self.__prefix = prefix
+        self.__file = None
+        self.total = 0
+        self.dropped = 0
+
+    @property
+    def filename(self):
+        """The file the left out output was written to, or None."""
+        return self.__file.name if self.__file is not None else None
+
+    def write(self, line):
+        """Add a line (in bytes) of output."""
+        self.total += len(line)
+        if self.__head_size < self.__half:
+            self.__head.append(line)
+            self.__head_size += len(line)
+            return
+
+        self.__tail.append(line)
+        self.__tail_size += len(line)
+        while self.__tail_size > self.__half:
+            old = self.__tail.popleft()
+            self.__tail_size -= len(old)
+            self.__spill(old)
+
+    def __spill(self, line):
+        """Leave a line out of the output, writing it to the spill file."""
+        self.dropped += len(line)
+        if (line.startswith(b'PIGLIT') and
+                self.__kept_size + len(line) <= self.__half):
+            self.__kept.append(line)
+            self.__kept_size += len(line)
+        if self.__directory is None:
+            return
+
+        try:
+            if self.__file is None:
+                core.check_dir(self.__directory)
+                self.__file = tempfile.NamedTemporaryFile(
+                    mode='wb', dir=self.__directory, prefix=self.__prefix,
+                    suffix='.txt', delete=False)
+            self.__file.write(line)
+        except (IOError, OSError) as e:
+            # Losing the middle of the output isn't worth failing the run
+            # over, just say that it wasn't saved.
+            warnings.warn('Could not save test output: {}'.format(e))
+            self.__directory = None
+
+    def getvalue(self):
+        """Close the spill file and return the collected output as bytes.
+
+        Newlines are normalized to \\n, as universal_newlines would.
+        """
+        if self.__file is not None:
+            self.__file.close()
+
+        lines = self.__head
+        if self.dropped:
+            marker = '\n[piglit: output truncated, {} of {} bytes left out{}]\n'
+            marker = marker.format(
+                self.dropped, self.total,
+                ', written to {}'.format(self.filename)
+                if self.filename is not None else '')
+            lines = lines + [marker.encode('utf-8')] + self.__kept
+        data = b''.join(itertools.chain(lines, self.__tail))
+        return data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+
+class _StreamReader(object):
+    """Reads the stdout and stderr of a process in background threads.
+
+    The output is collected in _Output objects, so the memory used doesn't
+    depend on how much the process prints. If callback is given each line of
+    stdout is passed to it (decoded, without the trailing newline) as soon as
+    it's read, which allows the output of a test to be followed while it's
+    still running.
+    """
+
+    def __init__(self, proc, callback=None, prefix=''):
+        limit = get_output_limit()
+        self.__proc = proc
+        self.__out = _Output(limit, OPTIONS.output_dir, prefix)
+        self.__err = _Output(limit, OPTIONS.output_dir, prefix)
+        self.__threads = [
+            threading.Thread(target=self.__read,
+                             args=(proc.stdout, self.__out, callback)),
+            threading.Thread(target=self.__read,
+                             args=(proc.stderr, self.__err, None)),
+        ]
+        for thread in self.__threads:
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def __read(stream, output, callback):
+        for line in iter(lambda: stream.readline(_MAX_LINE), b''):
+            output.write(line)
+            if callback is not None:
+                callback(line.decode('utf-8', 'replace').rstrip('\r\n'))
+        stream.close()
+
+    def wait(self, timeout=None):
+        """Wait for the process to exit and return its stdout and stderr.
+
+        Raises subprocess.TimeoutExpired if stdout and stderr have not been
+        closed and the process hasn't exited within timeout seconds.
+        """
+        end = None if timeout is None else time.time() + timeout
+
+        def remaining():
+            return None if end is None else max(0, end - time.time())
+
+        for thread in self.__threads:
+            thread.join(remaining())
+            if thread.is_alive():
+                raise subprocess.TimeoutExpired(self.__proc.args, timeout)
+        # The process may close its stdout and stderr and keep running
+        try:
+            self.__proc.wait(remaining())
+        except subprocess.TimeoutExpired:
+            raise subprocess.TimeoutExpired(self.__proc.args, timeout)
+        return self.__out.getvalue(), self.__err.getvalue()
+
+    def truncated(self):
+        """Return a list with a dict for each stream that was truncated."""
+        return [{'stream': name, 'total': output.total,
+                 'dropped': output.dropped, 'file': output.filename}
+                for name, output in [('out', self.__out), ('err', self.__err)]
+                if output.dropped]
+
+
 class TestIsSkip(exceptions.PiglitException):
     """Exception raised in is_skip() if the test is a skip."""
     def __init__(self, reason):
@@ -171,8 +374,13 @@ class Test(object):
     Keyword Arguments:
     run_concurrent -- If True the test is thread safe. Default: False
 
+    Attributes:
+    batch_of -- If not None the test is one of several batches that share a
+                result with this name, see framework.profile.run.
+
     """
-    __slots__ = ['run_concurrent', 'env', 'result', 'cwd', '_command']
+    __slots__ = ['run_concurrent', '_env', '_result', 'cwd', '_command',
+                 'batch_of']
     timeout = None
 
     def __init__(self, command, run_concurrent=False):
@@ -180,9 +388,46 @@ class Test(object):
 
         self.run_concurrent = run_concurrent
         self._command = copy.copy(command)
-        self.env = {}
-        self.result = TestResult()
+        self._env = None
+        self._result = None
         self.cwd = None
+        self.batch_of = None
+
+    @property
+    def env(self):
+        """Extra environment variables to set for the test."""
+        if self._env is None:
+            self._env = {}
+        return self._env
+
+    @env.setter
+    def env(self, new):
+        self._env = new
+
+    @property
+    def result(self):
+        """The TestResult of the test.
+
+        A profile can hold tens of thousands of tests, most of which have
+        nothing to store until they run, so the TestResult is created the first
+        time it's needed.
+
+        """
+        if self._result is None:
+            self._result = TestResult()
+        return self._result
+
+    @result.setter
+    def result(self, new):
+        self._result = new
+
+    def release(self):
+        """Drop the result of the test.
+
+        This is called once the result has been written by the backend, so
+        that the results of a run aren't all held in memory until it ends.
+        """
+        self._result = None
 
     def execute(self, path, log, options):
         """ Run a test
@@ -200,11 +445,15 @@ class Test(object):
         if OPTIONS.execute:
             try:
                 self.result.time.start = time.time()
-                options['dmesg'].update_dmesg()
-                options['monitor'].update_monitoring()
-                self.run()
-                self.result.time.end = time.time()
-                self.result = options['dmesg'].update_result(self.result)
+                window = options['dmesg'].begin(self.result)
+                try:
+                    options['monitor'].update_monitoring()
+                    self.run()
+                    self.result.time.end = time.time()
+                finally:
+                    # Always close the window, even if the test raised, so
+                    # that it doesn't hold on to messages for other tests
+                    options['dmesg'].end(window, self.result)
                 options['monitor'].check_monitoring()
             # This is a rare case where a bare exception is okay, since we're
             # using it to log exceptions
@@ -252,19 +501,12 @@ class Test(object):
         * For 'returncode', the value will be the numeric exit code/value.
         * For 'command', the value will be command line program and arguments.
         """
-        self.result.command = ' '.join(self.command)
-        self.result.environment = " ".join(
-            '{0}="{1}"'.format(k, v) for k, v in itertools.chain(
-                six.iteritems(OPTIONS.env), six.iteritems(self.env)))
+        self.__set_command()
 
         try:
             self.is_skip()
         except TestIsSkip as e:
-            self.result.result = status.SKIP
-            for each in six.iterkeys(self.result.subtests):
-                self.result.subtests[each] = status.SKIP
-            self.result.out = e.reason
-            self.result.returncode = None
+            self.__set_skip(e.reason)
             return
 
         try:
@@ -277,7 +519,42 @@ class Test(object):
             self.result.returncode = None
             return
 
-        self.interpret_result()
+        with trace.phase('interpret'):
+            self.interpret_result()
+
+    def resolve_skip(self):
+        """Record a skip result if is_skip() says that this test will skip.
+
+        This allows tests to be skipped before they are scheduled, without
+        going through execute(). Returns True if the test was skipped.
+
+        """
+        try:
+            self.is_skip()
+        except TestIsSkip as e:
+            self.__set_command()
+            self.__set_skip(e.reason)
+            self.result.time.start = self.result.time.end = time.time()
+            return True
+        except Exception:  # pylint: disable=broad-except
+            # Any other error is reported when the test is run
+            return False
+        return False
+
+    def __set_command(self):
+        """Record the command and environment in the result."""
+        self.result.command = ' '.join(self.command)
+        self.result.environment = " ".join(
+            '{0}="{1}"'.format(k, v) for k, v in itertools.chain(
+                six.iteritems(OPTIONS.env), six.iteritems(self.env)))
+
+    def __set_skip(self, reason):
+        """Set the result, and the result of every subtest, to skip."""
+        self.result.result = status.SKIP
+        for each in six.iterkeys(self.result.subtests):
+            self.result.subtests[each] = status.SKIP
+        self.result.out = reason
+        self.result.returncode = None
 
     def is_skip(self):
         """ Application specific check for skip
@@ -325,19 +602,17 @@ class Test(object):
         fullenv = {f(k): f(v) for k, v in _base}
 
         try:
-            proc = subprocess.Popen(command,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,
-                                    cwd=self.cwd,
-                                    env=fullenv,
-                                    universal_newlines=True,
-                                    **_EXTRA_POPEN_ARGS)
+            with trace.phase('spawn'):
+                proc = subprocess.Popen(command,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE,
+                                        cwd=self.cwd,
+                                        env=fullenv,
+                                        **_EXTRA_POPEN_ARGS)
 
             self.result.pid.append(proc.pid)
-            if not _SUPPRESS_TIMEOUT:
-                out, err = proc.communicate(timeout=self.timeout)
-            else:
-                out, err = proc.communicate()
+            with trace.phase('exit'):
+                out, err = self._communicate(proc)
             returncode = proc.returncode
         except OSError as e:
             # Different sets of tests get built under different build
@@ -350,20 +625,8 @@ class Test(object):
         except subprocess.TimeoutExpired:
             # This can only be reached if subprocess32 is present or on python
             # 3.x, since # TimeoutExpired is never raised by the python 2.7
-            # fallback code.
-
-            proc.terminate()
-
-            # XXX: This is probably broken on windows, since os.getpgid doesn't
-            # exist on windows. What is the right way to handle this?
-            if proc.poll() is None:
-                time.sleep(3)
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-
-            # Since the process isn't running it's safe to get any remaining
-            # stdout/stderr values out and store them.
-            self.result.out, self.result.err = proc.communicate()
-
+            # fallback code. _communicate has already stopped the process and
+            # stored its output.
             raise TestRunError(
                 'Test run time exceeded timeout value ({} seconds)\n'.format(
                     self.timeout),
@@ -374,6 +637,36 @@ class Test(object):
         self.result.err = err
         self.result.returncode = returncode
 
+    def _communicate(self, proc, callback=None):
+        """Wait for the test to exit and return its stdout and stderr.
+
+        The output is read while the test runs, so its memory use is bounded,
+        see _StreamReader. callback, if given, is called with each line of
+        stdout.
+
+        If the test runs for longer than its timeout it is killed, the output
+        it printed is stored in the result, and subprocess.TimeoutExpired is
+        raised.
+        """
+        reader = _StreamReader(proc, callback,
+                               os.path.basename(self.command[0]) + '-')
+        # Timeouts can only be enforced when each test has its own session,
+        # since the whole session is killed.
+        try:
+            if (_SUPPRESS_TIMEOUT or
+                    'start_new_session' not in _EXTRA_POPEN_ARGS):
+                return reader.wait()
+            return reader.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            _kill(proc)
+
+            # Since the process isn't running it's safe to get any remaining
+            # stdout/stderr values out and store them.
+            self.result.out, self.result.err = reader.wait()
+            raise
+        finally:
+            self.result.truncated = reader.truncated()
+
     def __eq__(self, other):
         return self.command == other.command
 
@@ -465,6 +758,9 @@ class ReducedProcessMixin(object):
 
     The first way that this helps is that it provides crash detection and
     recovery, allowing a single subtest to crash
+
+    The subtests are counted as their names are printed, so that after a crash
+    the run can be resumed without searching through the output.
     """
 
     def __init__(self, command, subtests=None, **kwargs):
@@ -472,6 +768,7 @@ class ReducedProcessMixin(object):
         super(ReducedProcessMixin, self).__init__(command, **kwargs)
         self._expected = subtests
         self._populate_subtests()
+        self.__started = 0
 
     def is_skip(self):
         """Skip if the length of expected is 0."""
@@ -479,10 +776,21 @@ class ReducedProcessMixin(object):
             raise TestIsSkip('All subtests skipped')
         super(ReducedProcessMixin, self).is_skip()
 
-    def __find_sub(self):
-        """Helper for getting the next index."""
-        return len([l for l in self.result.out.split('\n')
-                    if self._is_subtest(l)])
+    def __run(self, *args, **kwargs):
+        """Run the command once, returning the number of subtests started."""
+        self.__started = 0
+        super(ReducedProcessMixin, self)._run_command(*args, **kwargs)
+        return self.__started
+
+    def _stdout_line(self, line):
+        """Called with each line of stdout as it's printed."""
+        if self._is_subtest(line):
+            self.__started += 1
+
+    def _communicate(self, proc, callback=None):
+        """Read the output while the test runs, passing it to _stdout_line."""
+        return super(ReducedProcessMixin, self)._communicate(
+            proc, self._stdout_line)
 
     @staticmethod
     def _subtest_name(test):
@@ -506,13 +814,14 @@ class ReducedProcessMixin(object):
         together for parsing later. I will separate those values with
         "\n\n====RESUME====\n\n".
         """
-        super(ReducedProcessMixin, self)._run_command(*args, **kwargs)
+        started = self.__run(*args, **kwargs)
 
         if not self._is_cherry():
             returncode = self.result.returncode
             out = [self.result.out]
             err = [self.result.err]
-            cur_sub = self.__find_sub() or 1
+            truncated = list(self.result.truncated)
+            cur_sub = started or 1
             last = len(self._expected)
 
             while cur_sub < last:
@@ -520,17 +829,18 @@ class ReducedProcessMixin(object):
                     self._subtest_name(self._expected[cur_sub - 1])] = \
                         self._stop_status()
 
-                super(ReducedProcessMixin, self)._run_command(
+                started = self.__run(
                     _command=self._resume(cur_sub) + list(args), **kwargs)
 
                 out.append(self.result.out)
                 err.append(self.result.err)
+                truncated.extend(self.result.truncated)
 
                 # If the index is 0 the next test failed without printing a
                 # name, increase by 1 so that test will be marked crash and we
                 # don't get stuck in an infinite loop, otherwise return the
                 # number of tests that did complete.
-                cur_sub += self.__find_sub() or 1
+                cur_sub += started or 1
 
             if not self._is_cherry():
                 self.result.subtests[
@@ -543,6 +853,7 @@ class ReducedProcessMixin(object):
             self.result.returncode = returncode
             self.result.out = '\n\n====RESUME====\n\n'.join(out)
             self.result.err = '\n\n====RESUME====\n\n'.join(err)
+            self.result.truncated = truncated
 
     def _is_cherry(self):
         """Method used to determine if rerunning is required.
@@ -576,9 +887,9 @@ class ReducedProcessMixin(object):
     def _is_subtest(self, line):
         """Determines if a line in stdout contains a subtest name.
 
-        This method is used during the resume detection phase of the
-        _run_command method to determine how many subtests have successfully
-        been run.
+        This method is called with each line of stdout as the test runs, to
+        count how many subtests have been started, which is used to resume the
+        run if it's interrupted.
 
         Should simply return True if the line reprents a test starting, or
         False if it does not.
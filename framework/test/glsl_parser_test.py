@@ -24,6 +24,7 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import collections
 import os
 import sys
 import re
@@ -31,8 +32,10 @@ import io
 import six
 
 from framework import exceptions
-from .base import TestIsSkip
-from .opengl import FastSkipMixin
+from framework import status
+from .base import ReducedProcessMixin, TestIsSkip
+from .opengl import FastSkipMixin, FastSkip
+from .parse_cache import CACHE
 from .piglit_test import PiglitBaseTest, TEST_BIN_DIR
 
 __all__ = [
@@ -70,6 +73,14 @@ def _is_gles_version(version):
     return version in [1.0, 3.0, 3.1, 3.2]
 
 
+# The regular expressions used to parse the config block
+_CONFIG_START = re.compile(r'(//|/\*|\*)\s*\[config\]')
+_CONFIG_END = re.compile(r'(//|/\*|\*)\s*\[end config\]')
+_CONFIG_METADATA = re.compile(
+    r'(//|/\*|\*)\s*(?P<key>[a-z_]*)\:\s(?P<value>.*)')
+_BAD_VALUES = re.compile(r'(?![\w\.\! ]).*')
+
+
 class GLSLParserNoConfigError(exceptions.PiglitInternalError):
     pass
 
@@ -98,7 +109,6 @@ class Parser(object):
 
         try:
             with io.open(filepath, mode='r', encoding='utf-8') as testfile:
-                testfile = testfile.read()
                 self.config = self.parse(testfile, filepath)
             self.command = self.get_command(filepath)
         except GLSLParserInternalError as e:
@@ -192,6 +202,10 @@ class Parser(object):
         This method parses the lines of text file, and then returns a
         StrinIO instance suitable to be parsed by a configparser class.
 
+        testfile is an iterable of lines, usually the file itself. Only the
+        lines up to the end of the config block are read, the (often much
+        larger) shader after it is never read.
+
         It will raise GLSLParserInternalError if any part of the parsing
         fails.
 
@@ -203,30 +217,24 @@ class Parser(object):
         # This allows us to run the loop until we find the header, stop and
         # then run again looking for the config sections.
         # This reduces the need for if statements substantially
-        lines = (l.strip() for l in testfile.split('\n'))
+        lines = (l.strip() for l in testfile)
 
-        is_header = re.compile(r'(//|/\*|\*)\s*\[config\]')
         for line in lines:
-            if is_header.match(line):
+            if _CONFIG_START.match(line):
                 break
         else:
             raise GLSLParserNoConfigError("No [config] section found!")
 
-        is_header = re.compile(r'(//|/\*|\*)\s*\[end config\]')
-        is_metadata = re.compile(
-            r'(//|/\*|\*)\s*(?P<key>[a-z_]*)\:\s(?P<value>.*)')
-        bad_values = re.compile(r'(?![\w\.\! ]).*')
-
         for line in lines:
             # If strip renendered '' that means we had a blank newline,
             # just go on
             if line in ['', '//', '*']:
                 continue
             # If we get to the end of the config break
-            elif is_header.match(line):
+            elif _CONFIG_END.match(line):
                 break
 
-            match = is_metadata.match(line)
+            match = _CONFIG_METADATA.match(line)
             if match:
                 if match.group('key') not in self._CONFIG_KEYS:
                     raise GLSLParserInternalError(
@@ -240,7 +248,7 @@ class Parser(object):
                         'Duplicate entry for key {}'.format(
                             match.group('key')))
                 else:
-                    bad = bad_values.search(match.group('value'))
+                    bad = _BAD_VALUES.search(match.group('value'))
                     # XXX: this always seems to return a match object, even
                     # when the match is ''
                     if bad.group():
@@ -264,6 +272,42 @@ class Parser(object):
         return keys
 
 
+def _parse(filepath):
+    """Parse a glslparser file, this is what the parse cache stores.
+
+    Files without a config block are stored as None.
+
+    """
+    try:
+        return Parser(filepath)
+    except GLSLParserNoConfigError:
+        return None
+
+
+def _context():
+    """The parsed command depends on which binaries have been built."""
+    return (_HAS_GL_BIN, _HAS_GLES_BIN, bool(_FORCE_DESKTOP_VERSION))
+
+
+def prefetch(filepaths):
+    """Parse many glslparser files in parallel, before creating the tests."""
+    CACHE.prefetch(filepaths, _parse, context=_context())
+
+
+def group_by_binary(filepaths):
+    """Group glslparser test files by the glslparsertest binary that runs them.
+
+    Returns an OrderedDict mapping the name of each binary to a list of the
+    files it runs. Files without a config aren't tests, and are left out.
+    """
+    groups = collections.OrderedDict()
+    for each in filepaths:
+        parsed = CACHE.get(each, _parse, context=_context())
+        if parsed is not None:
+            groups.setdefault(parsed.command[0], []).append(each)
+    return groups
+
+
 class GLSLParserTest(FastSkipMixin, PiglitBaseTest):
     """A Test derived class specifically for glslparser.
 
@@ -273,7 +317,9 @@ class GLSLParserTest(FastSkipMixin, PiglitBaseTest):
     """
 
     def __init__(self, filepath):
-        parsed = Parser(filepath)
+        parsed = CACHE.get(filepath, _parse, context=_context())
+        if parsed is None:
+            raise GLSLParserNoConfigError("No [config] section found!")
         super(GLSLParserTest, self).__init__(
             parsed.command,
             run_concurrent=True,
@@ -287,3 +333,96 @@ class GLSLParserTest(FastSkipMixin, PiglitBaseTest):
                              'but only an OpenGL ES binary has been built')
 
         super(GLSLParserTest, self).is_skip()
+
+
+class MultiGLSLParserTest(ReducedProcessMixin, PiglitBaseTest):
+    """A GLSLParserTest class that can check more than one file at a time.
+
+    This class calls glslparsertest with the -report-subtests option and the
+    arguments of each file (separated by "--"), and interprets the result of
+    each file as a subtest named after the file, so that the results have the
+    same names as they would with one GLSLParserTest per file.
+
+    All of the files must use the same glslparsertest binary, files that
+    request different GLSL versions are sorted so that the binary has to
+    create as few contexts as possible.
+
+    Arguments:
+    filepaths -- a list of absolute paths to glslparser test files
+    """
+
+    def __init__(self, filepaths):
+        assert filepaths
+        prog = None
+        tests = []
+        skips = []
+
+        for each in filepaths:
+            parsed = CACHE.get(each, _parse, context=_context())
+            if parsed is None:
+                # Like GLSLParserTest, files without a config aren't tests
+                continue
+            subtest = os.path.basename(each).lower()
+
+            if prog is None:
+                prog = parsed.command[0]
+            elif parsed.command[0] != prog:
+                raise exceptions.PiglitInternalError(
+                    'glslparser tests for different binaries in the same '
+                    'command!\n{} and {}'.format(prog, parsed.command[0]))
+
+            try:
+                if prog == 'None':
+                    raise TestIsSkip('Test is for desktop OpenGL, but only '
+                                     'an OpenGL ES binary has been built')
+                FastSkip(gl_required=parsed.gl_required,
+                         glsl_version=parsed.glsl_version,
+                         glsl_es_version=parsed.glsl_es_version).test()
+            except TestIsSkip:
+                skips.append(subtest)
+                continue
+            tests.append((parsed.config['glsl_version'], subtest,
+                          parsed.command[1:]))
+
+        if prog is None:
+            raise GLSLParserNoConfigError("No [config] section found!")
+
+        tests.sort(key=lambda t: t[0])
+        self._arguments = [t[2] for t in tests]
+
+        super(MultiGLSLParserTest, self).__init__(
+            [prog] + self.__join(self._arguments),
+            subtests=[t[1] for t in tests],
+            run_concurrent=True)
+
+        for name in skips:
+            self.result.subtests[name] = status.SKIP
+
+    @staticmethod
+    def __join(arguments):
+        """Create the arguments to glslparsertest for some of the files."""
+        command = ['-report-subtests']
+        for i, each in enumerate(arguments):
+            if i:
+                command.append('--')
+            command.extend(each)
+        return command
+
+    def _is_subtest(self, line):
+        return line.startswith('PIGLIT TEST:')
+
+    def _resume(self, current):
+        return [self.command[0]] + self.__join(self._arguments[current:])
+
+    def _stop_status(self):
+        # glslparsertest only exits before reporting all of the subtests if it
+        # crashes, or if it can't run any of them and reports a skip.
+        if self.result.out.endswith('PIGLIT: {"result": "skip" }\n'):
+            return status.SKIP
+        if self.result.returncode > 0:
+            return status.FAIL
+        return status.CRASH
+
+    def _is_cherry(self):
+        return (self.result.returncode == 0 and not
+                self.result.out.endswith('PIGLIT: {"result": "skip" }\n'))
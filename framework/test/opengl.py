@@ -23,11 +23,21 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import collections
 import errno
+import glob
+import hashlib
+import multiprocessing.dummy
 import os
 import subprocess
+import tempfile
+import threading
 import warnings
 
+try:
+    import simplejson as json
+except ImportError:
+    import json
 import six
 
 from framework import exceptions, core
@@ -45,6 +55,94 @@ __all__ = [
 # stubbing it out
 _DISABLED = bool(os.environ.get('PIGLIT_NO_FAST_SKIP', False))
 
+# Bump this if the values stored in the wflinfo cache change
+WFLINFO_CACHE_VERSION = 1
+
+# The GL libraries whose modification times are part of the driver
+# fingerprint, relative to each library directory.
+_LIBRARIES = ['libGL.so*', 'libEGL.so*', 'libGLESv1_CM.so*', 'libGLESv2.so*',
+              'libgbm.so*', 'libwaffle-1.so*', '*_dri.so', 'dri/*_dri.so']
+
+# Environment variables that can change what the driver reports without
+# changing its vendor, renderer, or version strings (MESA_EXTENSION_OVERRIDE
+# for example), or which libraries are used. Every variable starting with one
+# of these is part of the driver fingerprint.
+_DRIVER_ENVIRONMENT = ('MESA_', 'LIBGL_', 'GALLIUM_', '__GLX_', '__EGL_',
+                       'EGL_', 'WAFFLE_', 'LD_LIBRARY_PATH', 'LD_PRELOAD')
+
+
+def _library_stats():
+    """Return the path, size and mtime of every GL library that exists."""
+    dirs = []
+    for var in ['LD_LIBRARY_PATH', 'LIBGL_DRIVERS_PATH']:
+        dirs.extend(d for d in os.environ.get(var, '').split(os.pathsep) if d)
+    dirs.extend(['/usr/local/lib64', '/usr/local/lib', '/usr/lib64',
+                 '/usr/lib'])
+    dirs.extend(sorted(glob.glob('/usr/lib/*-linux-gnu')))
+
+    stats = set()
+    for dir_ in dirs:
+        for pattern in _LIBRARIES:
+            for lib in glob.glob(os.path.join(dir_, pattern)):
+                try:
+                    stat = os.stat(lib)
+                except OSError:
+                    continue
+                stats.add((lib, stat.st_size, stat.st_mtime))
+    return sorted(stats)
+
+
+def _driver_environment():
+    """Return the environment variables that affect the driver, sorted."""
+    return sorted((k, v) for k, v in six.iteritems(os.environ)
+                  if k.startswith(_DRIVER_ENVIRONMENT))
+
+
+def _cache_entry(fingerprint):
+    """Return the path of the wflinfo cache entry for a fingerprint."""
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME',
+                       os.path.join(os.path.expanduser('~'), '.cache')),
+        'piglit', 'wflinfo',
+        hashlib.sha1(repr(fingerprint).encode('utf-8')).hexdigest() + '.json')
+
+
+def _cache_get(fingerprint):
+    """Return the cached WflInfo values for a fingerprint, or None."""
+    try:
+        with open(_cache_entry(fingerprint), 'r') as f:
+            values = json.load(f)
+        values['gl_extensions'] = set(values['gl_extensions'])
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+    return values
+
+
+def _cache_put(fingerprint, values):
+    """Write WflInfo values to the cache.
+
+    Failing to write the cache is not an error, wflinfo will just be run
+    again next time.
+
+    """
+    entry = _cache_entry(fingerprint)
+    try:
+        if not os.path.exists(os.path.dirname(entry)):
+            os.makedirs(os.path.dirname(entry))
+
+        # Write to a temporary file and then rename it, so that a concurrent
+        # reader never sees a partial entry.
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(values, f)
+            os.rename(temp, entry)
+        except Exception:
+            os.unlink(temp)
+            raise
+    except (IOError, OSError):
+        pass
+
 
 class StopWflinfo(exceptions.PiglitException):
     """Exception called when wlfinfo getter should stop."""
@@ -67,8 +165,32 @@ class WflInfo(object):
 
     This solves all of that, and is
 
+    Each property is calculated from the output of the same handful of wflinfo
+    invocations (one per api and profile), which are all run concurrently the
+    first time any of them is needed. The probe() method additionally caches
+    the calculated values on disk, see its docstring for details.
+
     """
     __shared_state = {}
+
+    # Protects probe(), which may be called from several test threads at once
+    _lock = threading.Lock()
+
+    # Protects start(), which must not wait for a running probe()
+    _start_lock = threading.Lock()
+
+    # Every wflinfo invocation needed to calculate the properties. The verbose
+    # output is a superset of the regular output, so one call per api/profile
+    # combination is enough.
+    _PROBES = collections.OrderedDict([
+        ('gl_core', ['--api', 'gl', '--profile', 'core']),
+        ('gl_compat', ['--api', 'gl', '--profile', 'compat']),
+        ('gl_none', ['--api', 'gl', '--profile', 'none']),
+        ('gles3', ['--api', 'gles3']),
+        ('gles2', ['--api', 'gles2']),
+        ('gles1', ['--api', 'gles1']),
+    ])
+
     def __new__(cls, *args, **kwargs):
         # Implement the borg pattern:
         # https://code.activestate.com/recipes/66531-singleton-we-dont-need-no-stinkin-singleton-the-bo/
@@ -115,6 +237,62 @@ class WflInfo(object):
                 return line
         raise Exception('Unreachable')
 
+    def __run(self, probe):
+        """Run a single probe and return it's output.
+
+        Returns None if the api or profile is unsupported, and raises
+        StopWflinfo('OSError') if wflinfo isn't installed.
+
+        """
+        try:
+            return self.__call_wflinfo(['--verbose'] + self._PROBES[probe])
+        except StopWflinfo as e:
+            if e.reason == 'Called':
+                return None
+            raise
+
+    @core.lazy_property
+    def _outputs(self):
+        """The output of each probe, keyed by the probe name.
+
+        Every probe that hasn't already been run is run concurrently, since
+        each is a separate process creating a context this takes about as long
+        as running just one of them. Unsupported probes have a value of None,
+        if wflinfo isn't installed this is an empty dictionary.
+
+        """
+        outputs = self.__dict__.setdefault('_seen', {})
+        probes = [p for p in self._PROBES if p not in outputs]
+        if probes:
+            pool = multiprocessing.dummy.Pool(len(probes))
+            try:
+                outputs.update(zip(probes, pool.map(self.__run, probes)))
+            except StopWflinfo as e:
+                if e.reason == 'OSError':
+                    return {}
+                raise
+            finally:
+                pool.close()
+                pool.join()
+        return outputs
+
+    def __first(self, probes, name, parse):
+        """Parse the named line of the first supported probe.
+
+        Returns None if none of the probes are supported or if the line cannot
+        be parsed (which is caused by wflinfo returning an error).
+
+        """
+        for probe in probes:
+            raw = self._outputs.get(probe)
+            if raw is None:
+                continue
+            try:
+                return parse(self.__getline(raw.split('\n'), name))
+            except (IndexError, ValueError):
+                return None
+        return None
+
     @core.lazy_property
     def gl_extensions(self):
         """Call wflinfo to get opengl extensions.
@@ -129,33 +307,12 @@ class WflInfo(object):
         _trim = len('OpenGL extensions: ')
         all_ = set()
 
-        def helper(const, vars_):
-            """Helper function to reduce code duplication."""
-            # This is a pretty fragile function but it really does help with
-            # duplication
-            for var in vars_:
-                try:
-                    ret = self.__call_wflinfo(const + [var])
-                except StopWflinfo as e:
-                    # This means tat the particular api or profile is
-                    # unsupported
-                    if e.reason == 'Called':
-                        continue
-                    else:
-                        raise
+        # If wflinfo isn't installed this returns an empty set. This will
+        # essentially make FastSkipMixin a no-op.
+        for raw in six.itervalues(self._outputs):
+            if raw is not None:
                 all_.update(set(self.__getline(
-                    ret.split('\n'), 'OpenGL extensions')[_trim:].split()))
-
-        try:
-            helper(['--verbose', '--api'], ['gles1', 'gles2', 'gles3'])
-            helper(['--verbose', '--api', 'gl', '--profile'],
-                   ['core', 'compat', 'none'])
-        except StopWflinfo as e:
-            # Handle wflinfo not being installed by returning an empty set. This
-            # will essentially make FastSkipMixin a no-op.
-            if e.reason == 'OSError':
-                return set()
-            raise
+                    raw.split('\n'), 'OpenGL extensions')[_trim:].split()))
 
         # Don't return a set with only WFLINFO_GL_ERROR.
         ret = {e.strip() for e in all_}
@@ -173,27 +330,10 @@ class WflInfo(object):
         terms of support.
 
         """
-        ret = None
-        for profile in ['core', 'compat', 'none']:
-            try:
-                raw = self.__call_wflinfo(['--api', 'gl', '--profile', profile])
-            except StopWflinfo as e:
-                if e.reason == 'Called':
-                    continue
-                elif e.reason == 'OSError':
-                    break
-                raise
-            else:
-                try:
-                    # Grab the GL version string, trim any release_number values
-                    ret = float(self.__getline(
-                        raw.split('\n'),
-                        'OpenGL version string').split()[3][:3])
-                except (IndexError, ValueError):
-                    # This is caused by wlfinfo returning an error
-                    pass
-                break
-        return ret
+        # Grab the GL version string, trim any release_number values
+        return self.__first(['gl_core', 'gl_compat', 'gl_none'],
+                            'OpenGL version string',
+                            lambda l: float(l.split()[3][:3]))
 
     @core.lazy_property
     def gles_version(self):
@@ -211,81 +351,123 @@ class WflInfo(object):
         than skip a few tests that should be run.
 
         """
-        ret = None
-        for api in ['gles3', 'gles2', 'gles1']:
-            try:
-                raw = self.__call_wflinfo(['--api', api])
-            except StopWflinfo as e:
-                if e.reason == 'Called':
-                    continue
-                elif e.reason == 'OSError':
-                    break
-                raise
-            else:
-                try:
-                    # Yes, search for "OpenGL version string" in GLES
-                    # GLES doesn't support patch versions.
-                    ret = float(self.__getline(
-                        raw.split('\n'),
-                        'OpenGL version string').split()[5])
-                except (IndexError, ValueError):
-                    # This is caused by wlfinfo returning an error
-                    pass
-                break
-        return ret
+        # Yes, search for "OpenGL version string" in GLES
+        # GLES doesn't support patch versions.
+        return self.__first(['gles3', 'gles2', 'gles1'],
+                            'OpenGL version string',
+                            lambda l: float(l.split()[5]))
 
     @core.lazy_property
     def glsl_version(self):
         """Calculate the maximum OpenGL Shader Language version."""
-        ret = None
-        for profile in ['core', 'compat', 'none']:
-            try:
-                raw = self.__call_wflinfo(
-                    ['--verbose', '--api', 'gl', '--profile', profile])
-            except StopWflinfo as e:
-                if e.reason == 'Called':
-                    continue
-                elif e.reason == 'OSError':
-                    break
-                raise
-            else:
-                try:
-                    # GLSL versions are M.mm formatted
-                    ret = float(self.__getline(
-                        raw.split('\n'),
-                        'OpenGL shading language').split()[-1][:4])
-                except (IndexError, ValueError):
-                    # This is caused by wflinfo returning an error
-                    pass
-                break
-        return ret
+        # GLSL versions are M.mm formatted
+        return self.__first(['gl_core', 'gl_compat', 'gl_none'],
+                            'OpenGL shading language',
+                            lambda l: float(l.split()[-1][:4]))
 
     @core.lazy_property
     def glsl_es_version(self):
         """Calculate the maximum OpenGL ES Shader Language version."""
-        ret = None
-        for api in ['gles3', 'gles2']:
+        # GLSL ES version numbering is insane.
+        # For version >= 3 the numbers are 3.00, 3.10, etc.
+        # For version 2, they are 1.0.xx
+        return self.__first(['gles3', 'gles2'],
+                            'OpenGL shading language',
+                            lambda l: float(l.split()[-1][:3]))
+
+    def __fingerprint(self):
+        """Return a value identifying the platform and driver, or None.
+
+        This runs a single probe to get the vendor, renderer, and version
+        strings, and combines them with the modification times of the GL
+        libraries and the environment variables that affect the driver, so
+        that updating, switching, or configuring drivers changes the
+        fingerprint. The output of the probe is kept for _outputs to use.
+
+        Returns None if wflinfo isn't installed, or no probe is supported.
+
+        """
+        seen = self.__dict__.setdefault('_seen', {})
+        for probe in ['gl_none', 'gles2']:
             try:
-                raw = self.__call_wflinfo(['--verbose', '--api', api])
-            except StopWflinfo as e:
-                if e.reason == 'Called':
-                    continue
-                elif e.reason == 'OSError':
-                    break
-                raise
-            else:
-                try:
-                    # GLSL ES version numbering is insane.
-                    # For version >= 3 the numbers are 3.00, 3.10, etc.
-                    # For version 2, they are 1.0.xx
-                    ret = float(self.__getline(
-                        raw.split('\n'),
-                        'OpenGL shading language').split()[-1][:3])
-                except (IndexError, ValueError):
-                    # Handle wflinfo internal errors
-                    pass
+                raw = seen[probe] = self.__run(probe)
+            except StopWflinfo:
+                self._outputs = {}
+                return None
+            if raw is not None:
                 break
-        return ret
+        else:
+            return None
+
+        strings = [l for l in raw.split('\n') if l.startswith(
+            ('OpenGL vendor string', 'OpenGL renderer string',
+             'OpenGL version string'))]
+        return (WFLINFO_CACHE_VERSION, OPTIONS.env['PIGLIT_PLATFORM'],
+                strings, _library_stats(), _driver_environment())
+
+    def probe(self):
+        """Calculate every value, using the on disk cache if possible.
+
+        The values are cached in $XDG_CACHE_HOME/piglit/wflinfo (or ~/.cache
+        if XDG_CACHE_HOME isn't set), keyed by the platform and a fingerprint
+        of the driver, so later runs on the same driver only need to run
+        wflinfo once. This is safe to call many times, and from many threads,
+        only the first call does any work.
+
+        """
+        # Once the values are calculated there's no need to wait for the lock,
+        # _probed is only set after every value is.
+        if self.__dict__.get('_probed'):
+            return
+
+        with self._lock:
+            if self.__dict__.get('_probed'):
+                return
+
+            fingerprint = self.__fingerprint()
+            cached = _cache_get(fingerprint) if fingerprint else None
+            if cached is not None:
+                for name, value in six.iteritems(cached):
+                    self.__dict__.setdefault(name, value)
+            else:
+                values = self.to_json()
+                if fingerprint:
+                    _cache_put(fingerprint, values)
+
+            self._probed = True
+
+    def start(self):
+        """Start probe() in a background thread.
+
+        Only the first call does anything, so this is cheap to call for every
+        test that needs the values.
+
+        """
+        if self.__dict__.get('_started'):
+            return
+
+        with self._start_lock:
+            if not self.__dict__.get('_started'):
+                thread = threading.Thread(target=self.probe)
+                thread.daemon = True
+                thread.start()
+                self._started = True
+
+    @property
+    def started(self):
+        """True if start() or probe() has been called."""
+        return bool(self.__dict__.get('_started') or
+                    self.__dict__.get('_probed'))
+
+    def to_json(self):
+        """Return the calculated values as a json compatible dictionary."""
+        return {
+            'gl_extensions': sorted(self.gl_extensions),
+            'gl_version': self.gl_version,
+            'gles_version': self.gles_version,
+            'glsl_version': self.glsl_version,
+            'glsl_es_version': self.glsl_es_version,
+        }
 
 
 class FastSkip(object):
@@ -318,6 +500,12 @@ class FastSkip(object):
 
     info = WflInfo()
 
+    # piglit run and resume set this, so that wflinfo is probed in the
+    # background as soon as the first test that needs it is created, while
+    # the rest of the profile loads. Profiles without such tests never run
+    # wflinfo.
+    start_early = False
+
     def __init__(self, gl_required=None, gl_version=None, gles_version=None,
                  glsl_version=None, glsl_es_version=None):
         self.gl_required = gl_required or set()
@@ -325,6 +513,8 @@ class FastSkip(object):
         self.gles_version = gles_version
         self.glsl_version = glsl_version
         self.glsl_es_version = glsl_es_version
+        if self.start_early:
+            self.info.start()
 
     def test(self):
         """Skip this test if any of it's feature requirements are unmet.
@@ -335,12 +525,14 @@ class FastSkip(object):
         Raises:
         TestIsSkip   -- if any of the conditions passed to self are false
         """
-        if self.info.gl_extensions:
-            for extension in self.gl_required:
-                if extension not in self.info.gl_extensions:
-                    raise TestIsSkip(
-                        'Test requires extension {} '
-                        'which is not available'.format(extension))
+        self.info.probe()
+
+        if (self.info.gl_extensions and
+                not self.info.gl_extensions.issuperset(self.gl_required)):
+            raise TestIsSkip(
+                'Test requires extension {} '
+                'which is not available'.format(
+                    min(set(self.gl_required) - self.info.gl_extensions)))
 
         # TODO: Be able to handle any operator
         if (self.info.gl_version is not None
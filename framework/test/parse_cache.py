@@ -0,0 +1,298 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""A persistent cache of parsed test files.
+
+Building the profile for tests/all.py means finding and parsing every
+shader_test and glslparser file, tens of thousands of them. Most of them
+don't change between runs, so the parsed values are pickled into a cache
+file, and are reused as long as the file hasn't changed.
+
+Entries are keyed by the path, size and modification time of each file, so
+changing one file only causes that file to be parsed again. Directory
+listings are cached too, keyed by the modification time of the directory
+(which changes when an entry is added or removed). The whole cache is thrown
+away when the parsers themselves change.
+
+The cache lives in $XDG_CACHE_HOME/piglit/profiles (or ~/.cache if
+XDG_CACHE_HOME isn't set). It is only used after load() is called, and is
+only written by save().
+
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from six.moves import cPickle as pickle
+
+__all__ = [
+    'CACHE',
+    'ParseCache',
+]
+
+# Bump this if the layout of the cache changes
+CACHE_VERSION = 1
+
+# Below this many files it's faster to parse them serially than to start a
+# pool of processes
+_MIN_PARALLEL = 1000
+
+# The modules whose parsers are cached, changing any of them invalidates the
+# whole cache
+_SOURCES = ['parse_cache', 'shader_test', 'glsl_parser_test']
+
+
+def get_path():
+    """Return the path of the cache file."""
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME',
+                       os.path.join(os.path.expanduser('~'), '.cache')),
+        'piglit', 'profiles', 'parsed.pickle')
+
+
+def _signature(path):
+    """Return the size and modification time of a path, or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
+
+def _version():
+    """Return a value that changes whenever the cached parsers change."""
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    return (CACHE_VERSION, sys.version_info[:2],
+            tuple(_signature(os.path.join(dirname, s + '.py'))
+                  for s in _SOURCES))
+
+
+class ParseCache(object):
+    """A cache of parsed files and directory listings.
+
+    Until load() is called this is a no-op, get() always parses and walk() is
+    os.walk().
+
+    """
+    def __init__(self):
+        self.__reset()
+
+    def __reset(self):
+        """Disable the cache and drop all of its entries."""
+        self.enabled = False
+        self._files = {}
+        self._dirs = {}
+        self._used = set()
+        self._walked = set()
+        self._dirty = False
+
+    def load(self):
+        """Enable the cache and read the entries of the last save()."""
+        self.enabled = True
+        try:
+            with open(get_path(), 'rb') as f:
+                version, files, dirs = pickle.load(f)
+        except Exception:  # pylint: disable=broad-except
+            # A missing, corrupt, or incompatible cache, start again
+            return
+        if version == _version():
+            self._files = files
+            self._dirs = dirs
+
+    def get(self, path, parse, context=None):
+        """Return parse(path), or the cached value if path hasn't changed.
+
+        Arguments:
+        path    -- the file to parse
+        parse   -- a callable that takes the path and returns a picklable
+                   value
+        context -- any other (hashable) value that the result of parse
+                   depends on, if it changes the file is parsed again
+
+        """
+        if not self.enabled:
+            return parse(path)
+
+        signature = _signature(path)
+        if signature is None:
+            # Let the parser deal with the missing file
+            return parse(path)
+
+        key = (path, parse.__module__, parse.__name__)
+        self._used.add(key)
+        entry = self._files.get(key)
+        if entry is not None and entry[0] == (signature, context):
+            return entry[1]
+
+        value = parse(path)
+        self._files[key] = ((signature, context), value)
+        self._dirty = True
+        return value
+
+    def prefetch(self, paths, parse, context=None):
+        """Parse every path that isn't cached, in parallel.
+
+        The files are parsed by a pool of processes, one per CPU, and the
+        results are stored so that get() returns them. This only pays off
+        for a large number of files, so for just a few nothing is done and
+        get() parses them as usual.
+
+        If any file fails to parse nothing is stored, get() will parse the
+        files again and raise the error as usual.
+
+        parse must be a module level function, so that it can be sent to the
+        worker processes.
+
+        """
+        if not self.enabled:
+            return
+
+        misses = []
+        for path in paths:
+            signature = _signature(path)
+            if signature is None:
+                continue
+            key = (path, parse.__module__, parse.__name__)
+            entry = self._files.get(key)
+            if entry is None or entry[0] != (signature, context):
+                misses.append((key, signature))
+
+        jobs = multiprocessing.cpu_count()
+        if jobs < 2 or len(misses) < _MIN_PARALLEL:
+            return
+
+        pool = multiprocessing.Pool(jobs)
+        try:
+            values = pool.map(parse, [k[0] for k, _ in misses],
+                              max(1, len(misses) // (jobs * 4)))
+        except Exception:  # pylint: disable=broad-except
+            pool.terminate()
+            return
+        finally:
+            pool.close()
+            pool.join()
+
+        for (key, signature), value in zip(misses, values):
+            self._files[key] = ((signature, context), value)
+        self._dirty = True
+
+    def walk(self, top):
+        """Like os.walk, but reuses the listing of unchanged directories.
+
+        Symlinks to directories are listed but not followed, like os.walk.
+
+        """
+        if not self.enabled:
+            for each in os.walk(top):
+                yield each
+            return
+
+        signature = _signature(top)
+        if signature is None:
+            return
+
+        self._walked.add(top)
+        entry = self._dirs.get(top)
+        if entry is not None and entry[0] == signature:
+            dirnames, filenames = entry[1]
+        else:
+            try:
+                names = sorted(os.listdir(top))
+            except OSError:
+                return
+            dirnames = [n for n in names
+                        if os.path.isdir(os.path.join(top, n))]
+            dirset = frozenset(dirnames)
+            filenames = [n for n in names if n not in dirset]
+            self._dirs[top] = (signature, (dirnames, filenames))
+            self._dirty = True
+
+        dirnames = list(dirnames)
+        yield top, dirnames, list(filenames)
+
+        for name in dirnames:
+            path = os.path.join(top, name)
+            if not os.path.islink(path):
+                for each in self.walk(path):
+                    yield each
+
+    def save(self):
+        """Write the cache, if anything changed since it was loaded.
+
+        Entries that weren't used are kept as long as their file still
+        exists, so loading a different profile doesn't throw them away.
+        Failing to write the cache is not an error, it will just be missed
+        the next time.
+
+        Once the profile is built the entries are of no further use, so they
+        are dropped after writing them and the cache is disabled until load()
+        is called again.
+
+        """
+        if not self.enabled:
+            return
+
+        try:
+            self.__save()
+        finally:
+            self.__reset()
+
+    def __save(self):
+        """Write the cache to disk."""
+        for cache, used, path in [(self._files, self._used, lambda k: k[0]),
+                                  (self._dirs, self._walked, lambda k: k)]:
+            for key in [k for k in cache if k not in used]:
+                if _signature(path(key)) is None:
+                    del cache[key]
+                    self._dirty = True
+        if not self._dirty:
+            return
+
+        path = get_path()
+        directory = os.path.dirname(path)
+        try:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+
+            # Write to a temporary file and then rename it, so that a
+            # concurrent reader never sees a partial cache.
+            fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump((_version(), self._files, self._dirs), f,
+                                pickle.HIGHEST_PROTOCOL)
+                os.rename(temp, path)
+            except Exception:
+                os.unlink(temp)
+                raise
+        except (IOError, OSError, pickle.PicklingError):
+            return
+        self._dirty = False
+
+
+# The cache shared by every parser
+CACHE = ParseCache()
@@ -54,6 +54,26 @@ else:
 CL_CONCURRENT = (not sys.platform.startswith('linux') or
                  glob.glob('/dev/dri/render*'))
 
+# The contents of TEST_BIN_DIR, see _get_bin_index()
+_BIN_INDEX = {}
+
+
+def _get_bin_index():
+    """Return a set of the files in TEST_BIN_DIR, or None.
+
+    The directory is only listed once, so that finding out if a test's
+    executable is missing doesn't require a stat (or a failed Popen) for each
+    test. If the directory cannot be listed this returns None, and the check
+    is left to Popen.
+
+    """
+    if TEST_BIN_DIR not in _BIN_INDEX:
+        try:
+            _BIN_INDEX[TEST_BIN_DIR] = frozenset(os.listdir(TEST_BIN_DIR))
+        except OSError:
+            _BIN_INDEX[TEST_BIN_DIR] = None
+    return _BIN_INDEX[TEST_BIN_DIR]
+
 
 class PiglitBaseTest(ValgrindMixin, Test):
     """
@@ -68,6 +88,21 @@ class PiglitBaseTest(ValgrindMixin, Test):
         # Prepend TEST_BIN_DIR to the path.
         self._command[0] = os.path.join(TEST_BIN_DIR, self._command[0])
 
+    def is_skip(self):
+        """Skip if the test executable isn't in TEST_BIN_DIR.
+
+        This is the same result that running a missing executable gives, but
+        it allows such tests to be skipped without running them.
+
+        """
+        dirname, executable = os.path.split(self._command[0])
+        if dirname == TEST_BIN_DIR:
+            index = _get_bin_index()
+            if (index is not None and executable not in index and
+                    executable + '.exe' not in index):
+                raise TestIsSkip('Test executable not found.\n')
+        super(PiglitBaseTest, self).is_skip()
+
     def interpret_result(self):
         out = []
 
@@ -30,16 +30,23 @@ import io
 import os
 import re
 
+from six.moves import range
+
 from framework import exceptions
 from framework import status
+from framework.core import PIGLIT_CONFIG
 from .base import ReducedProcessMixin, TestIsSkip
 from .opengl import FastSkipMixin, FastSkip
+from .parse_cache import CACHE
 from .piglit_test import PiglitBaseTest
 
 __all__ = [
     'ShaderTest',
 ]
 
+# The largest number of shader_test files that run in one MultiShaderTest
+DEFAULT_BATCH_SIZE = 100
+
 
 class Parser(object):
     """An object responsible for parsing a shader_test file."""
@@ -68,9 +75,10 @@ class Parser(object):
         # an exception. The second looks for the GL version or raises an
         # exception
         with io.open(self.filename, mode='r', encoding='utf-8') as shader_file:
-            # The mock in python 3.3 doesn't support readlines(), so use
-            # read().split() as a workaround
-            lines = (l for l in shader_file.read().split('\n'))
+            # Only the [require] block is needed, so read the file a line at a
+            # time and stop at the end of it, rather than reading the whole
+            # file.
+            lines = (l.rstrip('\n') for l in shader_file)
 
             # Find the config section
             for line in lines:
@@ -84,35 +92,35 @@ class Parser(object):
                 raise exceptions.PiglitFatalError(
                     "In file {}: Config block not found".format(self.filename))
 
-        for line in lines:
-            if line.startswith('GL_') and not line.startswith('GL_MAX'):
-                self.gl_required.add(line.strip())
-                continue
-
-            # Find any GLES requirements.
-            if not (self._gl_version or self._gles_version):
-                m = self._match_gl_version.match(line)
-                if m:
-                    self.__op = m.group('op')
-                    if m.group('es'):
-                        self._gles_version = float(m.group('ver'))
-                    else:
-                        self._gl_version = float(m.group('ver'))
-                    continue
-
-            if not (self._glsl_version or self._glsl_es_version):
-                # Find any GLSL requirements
-                m = self._match_glsl_version.match(line)
-                if m:
-                    self.__sl_op = m.group('op')
-                    if m.group('es'):
-                        self._glsl_es_version = float(m.group('ver'))
-                    else:
-                        self._glsl_version = float(m.group('ver'))
+            for line in lines:
+                if line.startswith('GL_') and not line.startswith('GL_MAX'):
+                    self.gl_required.add(line.strip())
                     continue
 
-            if line.startswith('['):
-                break
+                # Find any GLES requirements.
+                if not (self._gl_version or self._gles_version):
+                    m = self._match_gl_version.match(line)
+                    if m:
+                        self.__op = m.group('op')
+                        if m.group('es'):
+                            self._gles_version = float(m.group('ver'))
+                        else:
+                            self._gl_version = float(m.group('ver'))
+                        continue
+
+                if not (self._glsl_version or self._glsl_es_version):
+                    # Find any GLSL requirements
+                    m = self._match_glsl_version.match(line)
+                    if m:
+                        self.__sl_op = m.group('op')
+                        if m.group('es'):
+                            self._glsl_es_version = float(m.group('ver'))
+                        else:
+                            self._glsl_version = float(m.group('ver'))
+                        continue
+
+                if line.startswith('['):
+                    break
 
         # Select the correct binary to run the test, but be as conservative as
         # possible by always selecting the lowest version that meets the
@@ -146,6 +154,41 @@ class Parser(object):
         return self._glsl_es_version if self.__sl_op not in ['<', '<='] else None
 
 
+def _parse(filename):
+    """Parse a shader_test file, this is what the parse cache stores."""
+    parser = Parser(filename)
+    parser.parse()
+    return parser
+
+
+def prefetch(filenames):
+    """Parse many shader_test files in parallel, before creating the tests.
+    """
+    CACHE.prefetch(filenames, _parse)
+
+
+def get_batch_size():
+    """Return the largest number of files to run in one MultiShaderTest."""
+    size = (os.environ.get('PIGLIT_SHADER_BATCH_SIZE') or
+            PIGLIT_CONFIG.safe_get('core', 'shader_batch_size') or
+            DEFAULT_BATCH_SIZE)
+    return max(1, int(size))
+
+
+def split_batches(filenames, size):
+    """Split filenames into the fewest batches of no more than size files.
+
+    The batches are as close to the same size as possible, and the files are
+    sorted first, so that each file is in the same batch from run to run as
+    long as the number of files doesn't change.
+    """
+    filenames = sorted(filenames)
+    total = len(filenames)
+    count = -(-total // size)
+    return [filenames[i * total // count:(i + 1) * total // count]
+            for i in range(count)]
+
+
 class ShaderTest(FastSkipMixin, PiglitBaseTest):
     """ Parse a shader test file and return a PiglitTest instance
 
@@ -155,8 +198,7 @@ class ShaderTest(FastSkipMixin, PiglitBaseTest):
     """
 
     def __init__(self, filename):
-        parser = Parser(filename)
-        parser.parse()
+        parser = CACHE.get(filename, _parse)
 
         super(ShaderTest, self).__init__(
             [parser.prog, parser.filename],
@@ -199,8 +241,7 @@ class MultiShaderTest(ReducedProcessMixin, PiglitBaseTest):
         # determine it is skip, and set the result of that test in the subtests
         # dictionary to skip without adding it ot the liest of tests to run
         for each in filenames:
-            parser = Parser(each)
-            parser.parse()
+            parser = CACHE.get(each, _parse)
             subtest = os.path.basename(os.path.splitext(each)[0]).lower()
 
             if prog is not None:
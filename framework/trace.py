@@ -0,0 +1,183 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Record a trace of when each test ran, and on which worker.
+
+A Tracer records one event for each test (when it started and ended, the pool
+and worker that ran it, and its status), and one event for each phase of
+running it (spawning the process, waiting for it to exit, interpreting the
+output, and writing the result to the backend). The trace is written in the
+Chrome trace event format, which can be loaded by about:tracing and Perfetto,
+and analysed by `piglit summary timeline`.
+
+Phases are recorded with the phase() context manager, which does nothing
+unless the calling thread is running a test inside Tracer.test(), so the code
+that runs tests doesn't need to know whether it is being traced.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import contextlib
+import threading
+import time
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+__all__ = [
+    'POOLS',
+    'Tracer',
+    'phase',
+]
+
+# The process ids used for each pool in the trace
+POOLS = {
+    'concurrent': 1,
+    'serial': 2,
+}
+
+_LOCAL = threading.local()
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Record the time taken by the with block as a phase of the current test.
+
+    If the current thread isn't running a traced test this does nothing.
+
+    """
+    current = getattr(_LOCAL, 'current', None)
+    if current is None:
+        yield
+        return
+
+    tracer, pid, tid = current
+    start = tracer.now()
+    try:
+        yield
+    finally:
+        tracer.add({
+            'name': name,
+            'cat': 'phase',
+            'ph': 'X',
+            'ts': start,
+            'dur': tracer.now() - start,
+            'pid': pid,
+            'tid': tid,
+        })
+
+
+class Tracer(object):
+    """Collects trace events from the threads running tests.
+
+    Timestamps are in microseconds from when the Tracer was created, which is
+    what the trace event format expects.
+
+    """
+    def __init__(self):
+        self.__start = time.time()
+        self.__lock = threading.Lock()
+        self.__events = []
+        self.__workers = {}
+
+    def now(self):
+        """Return the current time as a trace timestamp."""
+        return (time.time() - self.__start) * 1000000
+
+    def add(self, event):
+        """Add an event to the trace."""
+        with self.__lock:
+            self.__events.append(event)
+
+    def _worker(self, pool):
+        """Return the worker id of the current thread in pool.
+
+        Workers are numbered from 1 in the order they first run a test.
+
+        """
+        key = (pool, threading.current_thread().ident)
+        with self.__lock:
+            if key not in self.__workers:
+                self.__workers[key] = sum(
+                    1 for p, _ in self.__workers if p == pool) + 1
+            return self.__workers[key]
+
+    @contextlib.contextmanager
+    def test(self, name, pool):
+        """Record running a test inside the with block.
+
+        This yields a dict of arguments to store with the event, the caller
+        should add the status of the test to it.
+
+        Arguments:
+        name -- the name of the test
+        pool -- the name of the pool running the test, a key of POOLS
+
+        """
+        pid = POOLS[pool]
+        tid = self._worker(pool)
+        args = {}
+        _LOCAL.current = (self, pid, tid)
+        start = self.now()
+        try:
+            yield args
+        finally:
+            _LOCAL.current = None
+            self.add({
+                'name': name,
+                'cat': 'test',
+                'ph': 'X',
+                'ts': start,
+                'dur': self.now() - start,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+
+    def to_json(self):
+        """Return the trace as a trace event format object."""
+        with self.__lock:
+            events = list(self.__events)
+            workers = list(self.__workers)
+
+        meta = []
+        for pool, pid in sorted(POOLS.items(), key=lambda x: x[1]):
+            meta.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                         'tid': 0, 'args': {'name': pool}})
+        for pool, ident in workers:
+            tid = self.__workers[(pool, ident)]
+            meta.append({'name': 'thread_name', 'ph': 'M',
+                         'pid': POOLS[pool], 'tid': tid,
+                         'args': {'name': 'worker {}'.format(tid)}})
+
+        return {
+            'traceEvents': meta + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'start': self.__start},
+        }
+
+    def write(self, path):
+        """Write the trace to path."""
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f)
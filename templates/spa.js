@@ -0,0 +1,237 @@
+/*
+ * Client side renderer for the single page html summary.
+ *
+ * The summary is split into gzip compressed json files in data/:
+ *   index.json.gz  - information about each run and each shard
+ *   <n>.json.gz    - the statuses and comparison pages for each test in
+ *                    shard n
+ *   <n>-<r>.json.gz - the details of each test in shard n for run r
+ *
+ * Only the index is fetched when the page is loaded, shards are fetched when
+ * their group is opened.
+ */
+
+"use strict";
+
+var PAGES = ["changes", "problems", "skips", "fixes", "regressions",
+             "enabled", "disabled"];
+
+var index = null;
+var page = "all";
+var cache = {};
+
+function fetchData(name) {
+    if (!(name in cache)) {
+        cache[name] = fetch("data/" + name + ".json.gz").then(function(resp) {
+            var stream = resp.body.pipeThrough(
+                new DecompressionStream("gzip"));
+            return new Response(stream).json();
+        });
+    }
+    return cache[name];
+}
+
+function element(tag, text, cls) {
+    var elem = document.createElement(tag);
+    if (text !== undefined && text !== null) {
+        elem.textContent = text;
+    }
+    if (cls) {
+        elem.className = cls;
+    }
+    return elem;
+}
+
+function worst(totals) {
+    var order = ["notrun", "pass", "dmesg-warn", "warn", "dmesg-fail",
+                 "fail", "skip", "timeout", "crash", "incomplete"];
+    var result = "notrun";
+    order.forEach(function(s) {
+        if (totals[s] > 0) {
+            result = s;
+        }
+    });
+    return result;
+}
+
+function renderPages() {
+    var node = document.getElementById("pages");
+    ["all"].concat(PAGES).forEach(function(p) {
+        var count = p === "all" ? index.all : index.pages[p];
+        var link = element("a", p + " (" + count + ")");
+        link.href = "#" + p;
+        link.onclick = function() {
+            page = p;
+            renderSummary();
+        };
+        node.appendChild(document.createTextNode(" | "));
+        node.appendChild(link);
+    });
+}
+
+function renderSummary() {
+    document.getElementById("page").textContent = page;
+    document.getElementById("details").textContent = "";
+
+    var table = document.getElementById("summary");
+    table.textContent = "";
+
+    var head = element("tr");
+    head.appendChild(element("th"));
+    index.runs.forEach(function(run, i) {
+        var th = element("th", run.name, "head");
+        var link = element("a", " (info)");
+        link.href = "#info";
+        link.onclick = function() {
+            renderInfo(i);
+        };
+        th.appendChild(link);
+        head.appendChild(th);
+    });
+    table.appendChild(head);
+
+    var total = element("tr");
+    total.appendChild(element("td", "all", "head"));
+    index.runs.forEach(function(run) {
+        var status = worst(run.totals);
+        total.appendChild(element("td", status, status));
+    });
+    table.appendChild(total);
+
+    index.shards.forEach(function(shard) {
+        var count = page === "all" ? shard.all : shard.pages[page];
+        if (count === 0) {
+            return;
+        }
+        var row = element("tr");
+        var cell = element("td");
+        var div = element("div", shard.group + " (" + count + ")", "head");
+        div.style.cursor = "pointer";
+        div.onclick = function() {
+            toggleShard(shard, row);
+        };
+        cell.appendChild(div);
+        row.appendChild(cell);
+        index.runs.forEach(function() {
+            row.appendChild(element("td"));
+        });
+        table.appendChild(row);
+    });
+}
+
+function toggleShard(shard, row) {
+    if (row.expanded) {
+        row.expanded.forEach(function(r) {
+            r.parentNode.removeChild(r);
+        });
+        row.expanded = null;
+        return;
+    }
+    fetchData(shard.file).then(function(tests) {
+        var after = row.nextSibling;
+        row.expanded = [];
+        tests.forEach(function(test) {
+            if (page !== "all" && test.pages.indexOf(page) === -1) {
+                return;
+            }
+            var tr = element("tr");
+            var name = element("td");
+            var div = element("div", test.name, "group");
+            div.style.marginLeft = "1.75em";
+            name.appendChild(div);
+            tr.appendChild(name);
+            test.status.forEach(function(status, i) {
+                var td = element("td", null, status);
+                if (status !== "notrun") {
+                    var link = element("a", status);
+                    link.href = "#details";
+                    link.onclick = function() {
+                        renderDetails(shard, i, test.owner);
+                    };
+                    td.appendChild(link);
+                } else {
+                    td.textContent = status;
+                }
+                tr.appendChild(td);
+            });
+            row.parentNode.insertBefore(tr, after);
+            row.expanded.push(tr);
+        });
+    });
+}
+
+function detailsTable(rows) {
+    var table = element("table");
+    var head = element("tr");
+    head.appendChild(element("th", "Detail"));
+    head.appendChild(element("th", "Value"));
+    table.appendChild(head);
+    rows.forEach(function(pair) {
+        var tr = element("tr");
+        tr.appendChild(element("td", pair[0]));
+        var td = element("td");
+        td.appendChild(element("pre", pair[1]));
+        tr.appendChild(td);
+        table.appendChild(tr);
+    });
+    return table;
+}
+
+function renderDetails(shard, run, name) {
+    fetchData(shard.file + "-" + run).then(function(tests) {
+        var node = document.getElementById("details");
+        node.textContent = "";
+        node.appendChild(element("h2", "Results for " + name + " (" +
+                                 index.runs[run].name + ")"));
+        var value = tests[name];
+        if (value === undefined) {
+            node.appendChild(element("p", "Details were excluded."));
+            return;
+        }
+        var subtests = Object.keys(value.subtests).filter(function(k) {
+            return k !== "__type__";
+        }).map(function(k) {
+            return k + ": " + value.subtests[k];
+        }).join("\n");
+        node.appendChild(detailsTable([
+            ["Result", value.result],
+            ["Subtests", subtests],
+            ["Returncode", String(value.returncode)],
+            ["Time", String(value.time.end - value.time.start)],
+            ["Stdout", value.out],
+            ["Stderr", value.err],
+            ["Environment", value.environment],
+            ["Command", value.command],
+            ["Exception", value.exception],
+            ["Traceback", value.traceback],
+            ["dmesg", value.dmesg],
+        ]));
+        node.scrollIntoView();
+    });
+}
+
+function renderInfo(run) {
+    var info = index.runs[run];
+    var node = document.getElementById("details");
+    node.textContent = "";
+    node.appendChild(element("h2", info.name));
+    node.appendChild(detailsTable([
+        ["time_elapsed", info.time],
+        ["name", info.name],
+        ["options", JSON.stringify(info.options, null, 2)],
+        ["uname", info.uname],
+        ["glxinfo", info.glxinfo],
+        ["clinfo", info.clinfo],
+        ["lspci", info.lspci],
+        ["totals", JSON.stringify(info.totals, null, 2)],
+    ]));
+    node.scrollIntoView();
+}
+
+window.onload = function() {
+    fetchData("index").then(function(data) {
+        index = data;
+        renderPages();
+        renderSummary();
+    });
+};
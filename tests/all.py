@@ -14,10 +14,13 @@ from six.moves import range
 
 from framework import grouptools
 from framework import options
-from framework.profile import TestProfile
+from framework.profile import TestProfile, load_filters
 from framework.driver_classifier import DriverClassifier
 from framework.test import (PiglitGLTest, GleanTest, PiglitBaseTest,
                             GLSLParserTest, GLSLParserNoConfigError)
+from framework.test import glsl_parser_test, shader_test
+from framework.test.glsl_parser_test import MultiGLSLParserTest
+from framework.test.parse_cache import CACHE
 from framework.test.shader_test import ShaderTest, MultiShaderTest
 from .py_modules.constants import TESTS_DIR, GENERATED_TESTS_DIR
 
@@ -209,55 +212,118 @@ def power_set(s):
 profile = TestProfile()  # pylint: disable=invalid-name
 
 shader_tests = collections.defaultdict(list)
+glslparser_tests = collections.defaultdict(list)
 
-# Find and add all shader tests.
+# When only some tests will be run (with -t, -x or --test-list) the tests found
+# by walking the source tree are only created if the filters would keep them,
+# which saves parsing every shader_test and glslparser file for a few tests.
+_filters = load_filters(__name__)
+
+
+def _wanted(name):
+    """Return True if the filters the profile is loaded with keep name."""
+    return all(f(name, None) for f in _filters)
+
+
+# Parsing every shader_test and glslparser file is slow, so reuse the parsed
+# values of files that haven't changed since the last time.
+CACHE.load()
+
+_GLSL_EXTS = frozenset(['.vert', '.tesc', '.tese', '.geom', '.frag', '.comp'])
+
+# Find all shader tests, as (name, class, argument) tuples.
+_found = []
 for basedir in [TESTS_DIR, GENERATED_TESTS_DIR]:
-    for dirpath, _, filenames in os.walk(basedir):
+    for dirpath, _, filenames in CACHE.walk(basedir):
+        groupname = grouptools.from_path(os.path.relpath(dirpath, basedir))
         for filename in filenames:
             testname, ext = os.path.splitext(filename)
-            groupname = grouptools.from_path(os.path.relpath(dirpath, basedir))
+            path = os.path.join(dirpath, filename)
             if ext == '.shader_test':
                 if PROCESS_ISOLATION:
-                    test = ShaderTest(os.path.join(dirpath, filename))
+                    _found.append((grouptools.join(groupname, testname),
+                                   ShaderTest, path))
                 else:
-                    shader_tests[groupname].append(os.path.join(dirpath, filename))
-                    continue
-            elif ext in ['.vert', '.tesc', '.tese', '.geom', '.frag', '.comp']:
-                try:
-                    test = GLSLParserTest(os.path.join(dirpath, filename))
-                except GLSLParserNoConfigError:
-                    # In the event that there is no config assume that it is a
-                    # legacy test, and continue
-                    continue
-
+                    shader_tests[groupname].append(path)
+            elif ext in _GLSL_EXTS:
                 # For glslparser tests you can have multiple tests with the
                 # same name, but a different stage, so keep the extension.
-                testname = filename
-            else:
-                continue
-
-            group = grouptools.join(groupname, testname)
-            assert group not in profile.test_list, group
-
-            profile.test_list[group] = test
+                if PROCESS_ISOLATION:
+                    _found.append((grouptools.join(groupname, filename),
+                                   GLSLParserTest, path))
+                else:
+                    glslparser_tests[groupname].append(path)
 
 # Because we need to handle duplicate group names in TESTS and GENERATED_TESTS
 # this dictionary is constructed, then added to the actual test dictionary.
+_batch_size = shader_test.get_batch_size()
+_batch_of = {}
 for group, files in six.iteritems(shader_tests):
-    assert group not in profile.test_list, 'duplicate group: {}'.format(group)
     # If there is only one file in the directory use a normal shader_test.
-    # Otherwise use a MultiShaderTest
+    # Otherwise use a MultiShaderTest, unless there are so many files that
+    # they would take much longer to run than any other test, then split them
+    # into batches so that they can be run in parallel. The batches are
+    # written as one result, see framework.profile.run.
     if len(files) == 1:
         group = grouptools.join(
             group, os.path.basename(os.path.splitext(files[0])[0]))
-        profile.test_list[group] = ShaderTest(files[0])
+        _found.append((group, ShaderTest, files[0]))
+    elif len(files) <= _batch_size:
+        _found.append((group, MultiShaderTest, files))
     else:
-        profile.test_list[group] = MultiShaderTest(files)
+        for i, batch in enumerate(
+                shader_test.split_batches(files, _batch_size)):
+            _found.append((grouptools.join(group, 'batch{}'.format(i)),
+                           MultiShaderTest, batch))
+            _batch_of[_found[-1][0]] = group
+
+_taken = set(f[0] for f in _found) | set(six.itervalues(_batch_of))
+_found = [f for f in _found if _wanted(f[0])]
+
+# Without process isolation the glslparser tests in each directory are run by a
+# MultiGLSLParserTest for each glslparsertest binary they use. It's named after
+# the directory, so that the subtests have the same names that the tests have
+# with process isolation, unless the directory needs more than one or there's
+# already a MultiShaderTest with that name. Which binary a file uses depends on
+# its config, so the directories that might be wanted are parsed first.
+_BINARIES = ['glslparsertest', 'glslparsertest_gles2']
+_glslparser = [
+    (group, files) for group, files in six.iteritems(glslparser_tests)
+    if any(_wanted(n) for n in
+           [group] + [grouptools.join(group, b) for b in _BINARIES])]
+glsl_parser_test.prefetch([f for _, files in _glslparser for f in files])
+for group, files in _glslparser:
+    binaries = glsl_parser_test.group_by_binary(files)
+    for binary, batch in six.iteritems(binaries):
+        name = group
+        if len(binaries) > 1 or group in _taken:
+            name = grouptools.join(group, binary)
+        if _wanted(name):
+            _found.append((name, MultiGLSLParserTest, batch))
+
+# Parse any new or changed files in parallel up front, creating the tests
+# below then only hits the cache.
+shader_test.prefetch(
+    [a for _, c, a in _found if c is ShaderTest] +
+    [a for _, c, files in _found if c is MultiShaderTest for a in files])
+glsl_parser_test.prefetch([a for _, c, a in _found if c is GLSLParserTest])
+
+# Add all shader tests.
+for group, class_, arg in _found:
+    assert group not in profile.test_list, 'duplicate group: {}'.format(group)
+    try:
+        profile.test_list[group] = class_(arg)
+    except GLSLParserNoConfigError:
+        # In the event that there is no config assume that it is a legacy
+        # test, and continue
+        continue
+    if group in _batch_of:
+        profile.test_list[group].batch_of = _batch_of[group]
 
 # Collect and add all asmparsertests
 for basedir in [TESTS_DIR, GENERATED_TESTS_DIR]:
     _basedir = os.path.join(basedir, 'asmparsertest', 'shaders')
-    for dirpath, _, filenames in os.walk(_basedir):
+    for dirpath, _, filenames in CACHE.walk(_basedir):
         base_group = grouptools.from_path(os.path.join(
             'asmparsertest', os.path.relpath(dirpath, _basedir)))
         type_ = os.path.basename(dirpath)
@@ -267,13 +333,15 @@ for basedir in [TESTS_DIR, GENERATED_TESTS_DIR]:
                 continue
 
             group = grouptools.join(base_group, filename)
-            profile.test_list[group] = PiglitGLTest(
-                ['asmparsertest', type_, os.path.join(dirpath, filename)])
+            if _wanted(group):
+                profile.test_list[group] = PiglitGLTest(
+                    ['asmparsertest', type_, os.path.join(dirpath, filename)])
 
-# Find and add all apitrace tests.
-classifier = DriverClassifier()
+# Find and add all apitrace tests. The classifier runs glxinfo, so only create
+# it if there are traces.
+classifier = None
 for basedir in [os.path.join(TESTS_DIR, 'apitrace', 'traces')]:
-    for dirpath, _, filenames in os.walk(basedir):
+    for dirpath, _, filenames in CACHE.walk(basedir):
         base_group = grouptools.from_path(os.path.join(
             'apitrace', os.path.relpath(dirpath, basedir)))
 
@@ -281,13 +349,19 @@ for basedir in [os.path.join(TESTS_DIR, 'apitrace', 'traces')]:
             if not os.path.splitext(filename)[1] == '.trace':
                 continue
             group = grouptools.join(base_group, filename)
+            if not _wanted(group):
+                continue
 
+            if classifier is None:
+                classifier = DriverClassifier()
             profile.test_list[group] = PiglitBaseTest(
                 [os.path.join(TESTS_DIR, 'apitrace', 'test-trace.py'),
                  os.path.join(dirpath, filename),
                  ','.join(classifier.categories)],
                 run_concurrent=True)
 
+CACHE.save()
+
 # List of all of the MSAA sample counts we wish to test
 MSAA_SAMPLE_COUNTS = ['2', '4', '6', '8', '16', '32']
 
@@ -13,8 +13,14 @@ hardware.
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
-from tests.quick import profile as _profile
 from framework.test import GLSLParserTest
+from framework.test.glsl_parser_test import MultiGLSLParserTest
+from framework.profile import share_filters
+
+# cpu keeps the names of quick's tests, so quick only needs to create the
+# tests that cpu is going to run.
+share_filters(__name__, 'tests.quick')
+from tests.quick import profile as _profile
 
 __all__ = ['profile']
 
@@ -23,7 +29,8 @@ profile = _profile.copy()  # pylint: disable=invalid-name
 
 def filter_gpu(name, test):
     """Remove all tests that are run on the GPU."""
-    if isinstance(test, GLSLParserTest) or name.startswith('asmparsertest'):
+    if (isinstance(test, (GLSLParserTest, MultiGLSLParserTest)) or
+            name.startswith('asmparsertest')):
         return True
     return False
 
@@ -1,14 +1,21 @@
-"""A profile that runs only GLSLParserTest instances."""
+"""A profile that runs only GLSLParserTest instances (and their batches)."""
 
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 
 from framework.test import GLSLParserTest
+from framework.test.glsl_parser_test import MultiGLSLParserTest
+from framework.profile import share_filters
+
+# glslparser keeps the names of all's tests, so all only needs to create the
+# tests that glslparser is going to run.
+share_filters(__name__, 'tests.all')
 from tests.all import profile as _profile
 
 __all__ = ['profile']
 
 profile = _profile.copy()  # pylint: disable=invalid-name
 
-profile.filters.append(lambda _, t: isinstance(t, GLSLParserTest))
+profile.filters.append(lambda _, t: isinstance(
+    t, (GLSLParserTest, MultiGLSLParserTest)))
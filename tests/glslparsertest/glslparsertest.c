@@ -34,6 +34,7 @@
 #include <errno.h>
 
 #include "piglit-util-gl.h"
+#include "piglit-framework-gl/piglit_gl_framework.h"
 
 static unsigned parse_glsl_version_number(const char *str);
 static int process_options(int argc, char **argv);
@@ -95,6 +96,7 @@ static int gl_version_times_10 = 0;
 static int check_link = 0;
 static unsigned requested_version = 110;
 static bool test_requires_geometry_shader4 = false;
+static bool report_subtests = false;
 
 static GLint
 get_shader_compile_status(GLuint shader)
@@ -233,7 +235,7 @@ attach_complementary_shader(GLuint shader_prog, GLenum type)
 		attach_dummy_shader(shader_prog, GL_FRAGMENT_SHADER);
 }
 
-static void
+static enum piglit_result
 require_feature(int gl_ver, const char *gl_ext, int es_ver, const char *es_ext)
 {
 	const int required_ver = piglit_is_gles() ? es_ver : gl_ver;
@@ -243,11 +245,26 @@ require_feature(int gl_ver, const char *gl_ext, int es_ver, const char *es_ext)
 	    !piglit_is_extension_supported(required_ext)) {
 		printf("Test requires version %g or %s\n",
 		       required_ver / 10.0, required_ext);
-		piglit_report_result(PIGLIT_SKIP);
+		return PIGLIT_SKIP;
 	}
+	return PIGLIT_PASS;
 }
 
-static void
+/**
+ * Like piglit_require_extension(), but returns PIGLIT_SKIP instead of
+ * exiting, so that the next test can be run when reporting subtests.
+ */
+static enum piglit_result
+require_extension(const char *name)
+{
+	if (!piglit_is_extension_supported(name)) {
+		printf("Test requires %s\n", name);
+		return PIGLIT_SKIP;
+	}
+	return PIGLIT_PASS;
+}
+
+static enum piglit_result
 test(void)
 {
 	GLint prog;
@@ -259,6 +276,7 @@ test(void)
 	GLint size;
 	GLenum type;
 	char *failing_stage = NULL;
+	enum piglit_result result = PIGLIT_PASS;
 
 	if (strcmp(filename + strlen(filename) - 4, "frag") == 0)
 		type = GL_FRAGMENT_SHADER;
@@ -276,26 +294,26 @@ test(void)
 		type = GL_NONE;
 		fprintf(stderr, "Couldn't determine type of program %s\n",
 			filename);
-		piglit_report_result(PIGLIT_FAIL);
+		return PIGLIT_FAIL;
 	}
 
-	piglit_require_vertex_shader();
-	piglit_require_fragment_shader();
-
 	if (type == GL_TESS_CONTROL_SHADER || type == GL_TESS_EVALUATION_SHADER) {
-		require_feature(40, "GL_ARB_tessellation_shader",
-				32, "GL_OES_tessellation_shader");
+		result = require_feature(40, "GL_ARB_tessellation_shader",
+					 32, "GL_OES_tessellation_shader");
 	}
 
 	if (type == GL_COMPUTE_SHADER) {
-		require_feature(43, "GL_ARB_compute_shader", 31, NULL);
+		result = require_feature(43, "GL_ARB_compute_shader", 31, NULL);
 	}
 
+	if (result != PIGLIT_PASS)
+		return result;
+
 	prog_string = piglit_load_text_file(filename, NULL);
 	if (prog_string == NULL) {
 		fprintf(stderr, "Couldn't open program %s: %s\n",
 			filename, strerror(errno));
-		exit(1);
+		return PIGLIT_FAIL;
 	}
 
 	prog = glCreateShader(type);
@@ -383,15 +401,20 @@ test(void)
 		free(info);
 	free(prog_string);
 	glDeleteShader(prog);
-	piglit_report_result (pass ? PIGLIT_PASS : PIGLIT_FAIL);
+	return pass ? PIGLIT_PASS : PIGLIT_FAIL;
 }
 
 static void usage(char *name)
 {
 	printf("%s {options} <filename.frag|filename.vert> <pass|fail> "
 	       "{requested GLSL version} {list of required GL extensions}\n", name);
+	printf("%s -report-subtests <test> {-- <test>}\n", name);
 	printf("\nSupported options:\n");
 	printf("  --check-link: also detect link failures\n");
+	printf("  -report-subtests: run several tests, each given as\n"
+	       "    <filename> <pass|fail> <requested GLSL version>\n"
+	       "    {--check-link} {list of required GL extensions},\n"
+	       "    and report the result of each as a subtest.\n");
 	exit(1);
 }
 
@@ -405,9 +428,14 @@ process_options(int argc, char **argv)
 	int i = 1;
 	int new_argc = 1;
 	while (i < argc) {
-		if (argv[i][0] == '-') {
+		/* When reporting subtests the options are given per test,
+		 * and are handled by parse_test().
+		 */
+		if (argv[i][0] == '-' && !report_subtests) {
 			if (strcmp(argv[i], "--check-link") == 0)
 				check_link = 1;
+			else if (strcmp(argv[i], "-report-subtests") == 0)
+				report_subtests = true;
 			else
 				usage(argv[0]);
 			/* do not retain the option; we've processed it */
@@ -461,23 +489,18 @@ parse_glsl_version_string(const char *str)
 }
 
 
-static void
+static enum piglit_result
 check_version(unsigned glsl_version)
 {
 	if (!piglit_is_gles()) {
-		if (requested_version == 100) {
-			piglit_require_extension("GL_ARB_ES2_compatibility");
-			return;
-		} else if (requested_version == 300) {
-			piglit_require_extension("GL_ARB_ES3_compatibility");
-			return;
-		} else if (requested_version == 310) {
-			piglit_require_extension("GL_ARB_ES3_1_compatibility");
-			return;
-		} else if (requested_version == 320) {
-			piglit_require_extension("GL_ARB_ES3_2_compatibility");
-			return;
-		}
+		if (requested_version == 100)
+			return require_extension("GL_ARB_ES2_compatibility");
+		else if (requested_version == 300)
+			return require_extension("GL_ARB_ES3_compatibility");
+		else if (requested_version == 310)
+			return require_extension("GL_ARB_ES3_1_compatibility");
+		else if (requested_version == 320)
+			return require_extension("GL_ARB_ES3_2_compatibility");
 	}
 
 	if (glsl_version < requested_version) {
@@ -485,34 +508,114 @@ check_version(unsigned glsl_version)
 			"GLSL version is %u.%u, but requested version %u.%u is required\n",
 			glsl_version / 100, glsl_version % 100,
 			requested_version / 100, requested_version % 100);
-		piglit_report_result(PIGLIT_SKIP);
+		return PIGLIT_SKIP;
 	}
+	return PIGLIT_PASS;
 }
 
+/**
+ * Return the name of the test, which is the file name without the
+ * directories.
+ */
+static const char *
+test_name(const char *path)
+{
+	const char *hit = strrchr(path, PIGLIT_PATH_SEP);
 
-void
-piglit_init(int argc, char**argv)
+	return hit ? hit + 1 : path;
+}
+
+/**
+ * Set up the globals for one test, given as
+ * <filename> <pass|fail> {requested GLSL version} {list of required GL
+ * extensions}, and check that its requirements are met.
+ *
+ * When reporting subtests --check-link may also be given after the
+ * version, since it applies to each test.
+ */
+static enum piglit_result
+parse_test(int argc, char **argv, char *name, unsigned glsl_version)
 {
-	const char *glsl_version_string;
-	unsigned glsl_version = 0;
+	enum piglit_result result;
 	int i;
 
-	if (argc < 3)
-		usage(argv[0]);
+	if (argc < 2)
+		usage(name);
 
-	if (strlen(argv[1]) < 5)
-		usage(argv[0]);
-	filename = argv[1];
+	if (strlen(argv[0]) < 5)
+		usage(name);
+	filename = argv[0];
 
-	if (strcmp(argv[2], "pass") == 0)
+	if (strcmp(argv[1], "pass") == 0)
 		expected_pass = 1;
-	else if (strcmp(argv[2], "fail") == 0)
+	else if (strcmp(argv[1], "fail") == 0)
 		expected_pass = 0;
 	else
-		usage(argv[0]);
+		usage(name);
+
+	if (argc > 2)
+		requested_version = parse_glsl_version_number(argv[2]);
 
-	if (argc > 3)
-		requested_version = parse_glsl_version_number(argv[3]);
+	if (report_subtests)
+		check_link = 0;
+	test_requires_geometry_shader4 = false;
+
+	result = check_version(glsl_version);
+
+	for (i = 3; i < argc && result == PIGLIT_PASS; i++) {
+		if (report_subtests && strcmp(argv[i], "--check-link") == 0) {
+			check_link = 1;
+		} else if (argv[i][0] == '!') {
+			if (piglit_is_extension_supported(argv[i] + 1))
+				result = PIGLIT_SKIP;
+		} else {
+			result = require_extension(argv[i]);
+			if (strstr(argv[i], "geometry_shader4") != NULL)
+				test_requires_geometry_shader4 = true;
+		}
+	}
+
+	return result;
+}
+
+/**
+ * Run the remaining tests in a new process image, with a context for the
+ * GLSL version the next test requests.
+ */
+static void
+recreate_gl_context(char *exec_arg, int param_argc, char **param_argv)
+{
+	int argc = param_argc + 2;
+	char **argv = malloc(sizeof(char*) * (argc + 1));
+
+	if (!argv) {
+		fprintf(stderr, "%s: malloc failed.\n", __func__);
+		piglit_report_result(PIGLIT_FAIL);
+	}
+
+	argv[0] = exec_arg;
+	argv[1] = "-report-subtests";
+	memcpy(&argv[2], param_argv, param_argc * sizeof(char*));
+	argv[argc] = NULL;
+
+	if (gl_fw->destroy)
+		gl_fw->destroy(gl_fw);
+	gl_fw = NULL;
+	report_subtests = false;
+
+	exit(main(argc, argv));
+}
+
+void
+piglit_init(int argc, char**argv)
+{
+	const char *glsl_version_string;
+	unsigned glsl_version = 0;
+	enum piglit_result result;
+	int i, end;
+
+	if (argc < 3)
+		usage(argv[0]);
 
 	gl_version_times_10 = piglit_get_gl_version();
 
@@ -528,19 +631,46 @@ piglit_init(int argc, char**argv)
 	if (glsl_version_string != NULL)
 		glsl_version = parse_glsl_version_string(glsl_version_string);
 
-	check_version(glsl_version);
+	piglit_require_vertex_shader();
+	piglit_require_fragment_shader();
 
-	for (i = 4; i < argc; i++) {
-		if (argv[i][0] == '!') {
-			piglit_require_not_extension(argv[i] + 1);
-		} else {
-			piglit_require_extension(argv[i]);
-			if (strstr(argv[i], "geometry_shader4") != NULL)
-				test_requires_geometry_shader4 = true;
-		}
+	if (!report_subtests) {
+		result = parse_test(argc - 1, argv + 1, argv[0], glsl_version);
+		if (result == PIGLIT_PASS)
+			result = test();
+		piglit_report_result(result);
 	}
 
-	test();
+	/* Run each test in turn, they are separated by "--". */
+	for (i = 1; i < argc; i = end + 1) {
+		for (end = i; end < argc && strcmp(argv[end], "--") != 0; end++)
+			;
+
+		if (end - i < 3)
+			usage(argv[0]);
+
+		/* The context was created for the version the first test
+		 * requests (see PIGLIT_GL_TEST_CONFIG_BEGIN).
+		 */
+		if (parse_glsl_version_number(argv[i + 2]) !=
+		    parse_glsl_version_number(argv[3]))
+			recreate_gl_context(argv[0], argc - i, argv + i);
+
+		/* Print the name before we start the test, that way if the
+		 * test crashes we can still resume and know which test
+		 * crashed.
+		 */
+		printf("PIGLIT TEST: %s\n", test_name(argv[i]));
+		fprintf(stderr, "PIGLIT TEST: %s\n", test_name(argv[i]));
+		fflush(stdout);
+
+		result = parse_test(end - i, argv + i, argv[0], glsl_version);
+		if (result == PIGLIT_PASS)
+			result = test();
+		piglit_report_subtest_result(result, "%s",
+					     test_name(filename));
+	}
+	exit(0);
 }
 
 enum piglit_result
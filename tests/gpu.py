@@ -6,13 +6,20 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 
-from tests.quick import profile as _profile
 from framework.test import GLSLParserTest
+from framework.test.glsl_parser_test import MultiGLSLParserTest
+from framework.profile import share_filters
+
+# gpu keeps the names of quick's tests, so quick only needs to create the
+# tests that gpu is going to run.
+share_filters(__name__, 'tests.quick')
+from tests.quick import profile as _profile
 
 __all__ = ['profile']
 
 profile = _profile.copy()  # pylint: disable=invalid-name
 
 # Remove all parser tests, as they are compiler test
-profile.filters.append(lambda p, t: not isinstance(t, GLSLParserTest))
+profile.filters.append(
+    lambda p, t: not isinstance(t, (GLSLParserTest, MultiGLSLParserTest)))
 profile.filters.append(lambda n, _: not n.startswith('asmparsertest'))
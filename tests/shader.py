@@ -5,6 +5,11 @@ from __future__ import (
 )
 
 from framework.test.shader_test import ShaderTest, MultiShaderTest
+from framework.profile import share_filters
+
+# shader keeps the names of all's tests, so all only needs to create the
+# tests that shader is going to run.
+share_filters(__name__, 'tests.all')
 from tests.all import profile as _profile
 
 __all__ = ['profile']
@@ -0,0 +1,53 @@
+# Copyright (c) 2026 Intel Corporation
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Setup shared by all of the unit tests."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import os
+import shutil
+import tempfile
+
+_CACHE_HOME = None
+_OLD_CACHE_HOME = None
+
+
+def pytest_configure(config):  # pylint: disable=unused-argument
+    """Keep the caches piglit writes (of loaded results, parsed test files,
+    and wflinfo values) out of the cache directory of the user running the
+    tests.
+
+    This is done before any test or fixture runs, since module and class
+    scoped fixtures load results too.
+    """
+    global _CACHE_HOME, _OLD_CACHE_HOME  # pylint: disable=global-statement
+    _OLD_CACHE_HOME = os.environ.get('XDG_CACHE_HOME')
+    _CACHE_HOME = tempfile.mkdtemp()
+    os.environ['XDG_CACHE_HOME'] = _CACHE_HOME
+
+
+def pytest_unconfigure(config):  # pylint: disable=unused-argument
+    if _OLD_CACHE_HOME is None:
+        del os.environ['XDG_CACHE_HOME']
+    else:
+        os.environ['XDG_CACHE_HOME'] = _OLD_CACHE_HOME
+    shutil.rmtree(_CACHE_HOME, ignore_errors=True)
@@ -0,0 +1,140 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the on disk cache of loaded results."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import os
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+import six
+
+from framework import results
+from framework.backends import cache
+
+# pylint: disable=no-self-use,redefined-outer-name
+
+
+@pytest.yield_fixture
+def cache_dir(tmpdir):
+    """Point the cache at a temporary directory."""
+    with mock.patch.dict('os.environ',
+                         {'XDG_CACHE_HOME': six.text_type(tmpdir.join('c')),
+                          'PIGLIT_RESULTS_CACHE_SIZE': '1'}):
+        yield tmpdir.join('c', 'piglit', 'results')
+
+
+@pytest.fixture
+def result_file(tmpdir):
+    """A results file and the TestrunResult it contains."""
+    p = tmpdir.join('results.json')
+    p.write('foo')
+    run = results.TestrunResult()
+    run.name = 'foo'
+    run.tests['a@b'] = results.TestResult('pass')
+    return six.text_type(p), run
+
+
+class TestGetPut(object):
+    """Tests for cache.get and cache.put."""
+
+    def test_roundtrip(self, cache_dir, result_file):  # pylint: disable=unused-argument
+        """backends.cache: a result that was put can be gotten."""
+        path, run = result_file
+        cache.put(path, run)
+        test = cache.get(path)
+        assert test.name == 'foo'
+        assert test.tests['a@b'].result == 'pass'
+
+    def test_miss(self, cache_dir, result_file):  # pylint: disable=unused-argument
+        """backends.cache: None is returned for an uncached file."""
+        assert cache.get(result_file[0]) is None
+
+    def test_changed(self, cache_dir, result_file):  # pylint: disable=unused-argument
+        """backends.cache: a changed file is not returned from the cache."""
+        path, run = result_file
+        cache.put(path, run)
+        with open(path, 'w') as f:
+            f.write('foobar')
+        assert cache.get(path) is None
+
+    def test_partial(self, cache_dir, tmpdir):
+        """backends.cache: partial results are not cached."""
+        tmpdir.mkdir('tests')
+        tmpdir.join('metadata.json').write('foo')
+        cache.put(six.text_type(tmpdir), results.TestrunResult())
+        assert not cache_dir.check()
+
+    def test_disabled(self, cache_dir, result_file):
+        """backends.cache: nothing is written with a size of 0."""
+        with mock.patch.dict('os.environ', {'PIGLIT_RESULTS_CACHE_SIZE': '0'}):
+            cache.put(*result_file)
+        assert not cache_dir.check()
+
+    def test_corrupt(self, cache_dir, result_file):
+        """backends.cache: a corrupt entry is treated as a miss."""
+        path, run = result_file
+        cache.put(path, run)
+        entry = cache_dir.listdir()[0]
+        entry.write('not a pickle')
+        assert cache.get(path) is None
+        assert not entry.check()
+
+
+class TestGetSize(object):
+    """Tests for the get_size function."""
+
+    def test_env(self):
+        """backends.cache.get_size: the environment variable is in MiB."""
+        with mock.patch.dict('os.environ', {'PIGLIT_RESULTS_CACHE_SIZE': '2'}):
+            assert cache.get_size() == 2 * 1024 * 1024
+
+    def test_invalid(self):
+        """backends.cache.get_size: an invalid value warns and uses the
+        default.
+        """
+        with mock.patch.dict('os.environ',
+                             {'PIGLIT_RESULTS_CACHE_SIZE': 'lots'}):
+            with pytest.warns(UserWarning):
+                size = cache.get_size()
+        assert size == cache.DEFAULT_SIZE * 1024 * 1024
+
+
+class TestEvict(object):
+    """Tests for the LRU eviction."""
+
+    def test_oldest_removed(self, tmpdir):
+        """backends.cache._evict: the least recently used entry is removed."""
+        for i, name in enumerate(['a', 'b', 'c']):
+            p = tmpdir.join(name + '.pickle')
+            p.write('x' * 10)
+            os.utime(six.text_type(p), (i, i))
+
+        cache._evict(six.text_type(tmpdir), 20)
+        assert sorted(p.basename for p in tmpdir.listdir()) == \
+            ['b.pickle', 'c.pickle']
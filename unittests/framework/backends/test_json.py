@@ -100,6 +100,40 @@ class TestJSONBackend(object):
             with tmpdir.join('tests/0.json').open('r') as f:
                 json.load(f)
 
+    class TestWriteTests(object):
+        """Tests for the write_tests method."""
+
+        def test_single_file(self, tmpdir):
+            """All of the tests are written into one file."""
+            p = six.text_type(tmpdir)
+            test = backends.json.JSONBackend(p)
+            test.initialize(shared.INITIAL_METADATA)
+
+            test.write_tests([('foo', results.TestResult('skip')),
+                              ('bar', results.TestResult('skip'))])
+
+            assert tmpdir.join('tests').listdir() == \
+                [tmpdir.join('tests/0.json')]
+            with tmpdir.join('tests/0.json').open('r') as f:
+                assert sorted(json.load(f)) == ['bar', 'foo']
+
+        def test_finalize(self, tmpdir):
+            """The batched tests are combined with the other tests."""
+            p = six.text_type(tmpdir)
+            test = backends.json.JSONBackend(p)
+            test.initialize(shared.INITIAL_METADATA)
+
+            test.write_tests([('foo', results.TestResult('skip')),
+                              ('bar', results.TestResult('skip'))])
+            with test.write_test('baz') as t:
+                t(results.TestResult('pass'))
+            test.finalize(
+                {'time_elapsed':
+                    results.TimeAttribute(start=0.0, end=1.0).to_json()})
+
+            with tmpdir.join('results.json').open('r') as f:
+                assert sorted(json.load(f)['tests']) == ['bar', 'baz', 'foo']
+
     class TestFinalize(object):
         """Tests for the finalize method."""
 
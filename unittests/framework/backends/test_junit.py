@@ -37,7 +37,7 @@ except ImportError:
 import pytest
 import six
 
-from framework import backends
+from framework.backends import junit
 from framework import grouptools
 from framework import results
 from framework import status
@@ -76,31 +76,31 @@ class TestProtectedLoad(object):
     """Tests for the _load method."""
 
     def test_default_name(self, tmpdir):
-        """backends.junit._load: uses 'junit result' for name as fallback."""
+        """junit._load: uses 'junit result' for name as fallback."""
         tmpdir.chdir()
         with open('results.xml', 'w') as f:
             f.write(_XML)
-        test = backends.junit.REGISTRY.load('results.xml', 'none')
+        test = junit.REGISTRY.load('results.xml', 'none')
 
         assert test.name == 'junit result'
 
     def test_file_name(self, tmpdir):
-        """backends.junit._load: uses the filename for name if filename !=
+        """junit._load: uses the filename for name if filename !=
         'results'
         """
         p = tmpdir.join('foobar.xml')
         p.write(_XML)
-        test = backends.junit.REGISTRY.load(six.text_type(p), 'none')
+        test = junit.REGISTRY.load(six.text_type(p), 'none')
         assert test.name == 'foobar'
 
     def test_folder_name(self, tmpdir):
-        """backends.junit._load: uses the folder name if the result is
+        """junit._load: uses the folder name if the result is
         'results.'
         """
         tmpdir.mkdir('foo')
         p = tmpdir.join('foo', 'results.xml')
         p.write(_XML)
-        test = backends.junit.REGISTRY.load(six.text_type(p), 'none')
+        test = junit.REGISTRY.load(six.text_type(p), 'none')
 
         assert test.name == 'foo'
 
@@ -113,23 +113,23 @@ class TestProtectedLoad(object):
         def result(self, tmpdir):
             p = tmpdir.join('test.xml')
             p.write(_XML)
-            return backends.junit._load(six.text_type(p))
+            return junit._load(six.text_type(p))
 
         def test_testrunresult(self, result):
-            """backends.junit._load: returns a TestrunResult instance."""
+            """junit._load: returns a TestrunResult instance."""
             assert isinstance(result, results.TestrunResult)
 
         def test_replace_sep(self, result):
-            """backends.junit._load: replaces '.' with grouptools.SEPARATOR."""
+            """junit._load: replaces '.' with grouptools.SEPARATOR."""
             assert self.testname in result.tests
 
         def test_testresult_instance(self, result):
-            """backends.junit._load: replaces result with TestResult instance.
+            """junit._load: replaces result with TestResult instance.
             """
             assert isinstance(result.tests[self.testname], results.TestResult)
 
         def test_status_instance(self, result):
-            """backends.junit._load: a status is found and loaded."""
+            """junit._load: a status is found and loaded."""
             assert isinstance(result.tests[self.testname].result,
                               status.Status)
 
@@ -140,15 +140,15 @@ class TestProtectedLoad(object):
             assert time.end == 4.5
 
         def test_command(self, result):
-            """backends.junit._load: command is loaded correctly."""
+            """junit._load: command is loaded correctly."""
             assert result.tests[self.testname].command == 'this/is/a/command'
 
         def test_out(self, result):
-            """backends.junit._load: stdout is loaded correctly."""
+            """junit._load: stdout is loaded correctly."""
             assert result.tests[self.testname].out == 'This is stdout'
 
         def test_err(self, result):
-            """backends.junit._load: stderr is loaded correctly."""
+            """junit._load: stderr is loaded correctly."""
             expected = textwrap.dedent("""\
                 this is stderr
 
@@ -158,11 +158,11 @@ class TestProtectedLoad(object):
             assert result.tests[self.testname].err.strip() == expected
 
         def test_totals(self, result):
-            """backends.junit._load: Totals are calculated."""
+            """junit._load: Totals are calculated."""
             assert bool(result)
 
         def test_pid(self, result):
-            """backends.junit._load: pid is loaded correctly."""
+            """junit._load: pid is loaded correctly."""
             assert result.tests[self.testname].pid == [1934]
 
 
@@ -173,7 +173,7 @@ class TestJUnitBackend(object):
         """Tests for the finalize method."""
 
         def test_skips_illformed_tests(self, tmpdir):
-            """backends.junit.JUnitBackend: skips illformed tests"""
+            """junit.JUnitBackend: skips illformed tests"""
             result = results.TestResult()
             result.time.end = 1.2345
             result.result = 'pass'
@@ -181,7 +181,7 @@ class TestJUnitBackend(object):
             result.err = 'this is stderr'
             result.command = 'foo'
 
-            test = backends.junit.JUnitBackend(six.text_type(tmpdir))
+            test = junit.JUnitBackend(six.text_type(tmpdir))
             test.initialize(shared.INITIAL_METADATA)
             with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
                 t(result)
@@ -194,7 +194,7 @@ class TestJUnitWriter(object):
     """Tests for the JUnitWriter class."""
 
     def test_junit_replace(self, tmpdir):
-        """backends.junit.JUnitBackend.write_test: grouptools.SEPARATOR is
+        """junit.JUnitBackend.write_test: grouptools.SEPARATOR is
         replaced with '.'.
         """
         result = results.TestResult()
@@ -204,7 +204,7 @@ class TestJUnitWriter(object):
         result.err = 'this is stderr'
         result.command = 'foo'
 
-        test = backends.junit.JUnitBackend(six.text_type(tmpdir))
+        test = junit.JUnitBackend(six.text_type(tmpdir))
         test.initialize(shared.INITIAL_METADATA)
         with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
             t(result)
@@ -230,7 +230,7 @@ class TestJUnitWriter(object):
             result.command = 'foo'
             result.pid = 1034
 
-            test = backends.junit.JUnitBackend(six.text_type(p))
+            test = junit.JUnitBackend(six.text_type(p))
             test.initialize(shared.INITIAL_METADATA)
             with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
                 t(result)
@@ -243,13 +243,13 @@ class TestJUnitWriter(object):
             return six.text_type(p.join('results.xml'))
 
         def test_xml_well_formed(self, test_file):
-            """backends.junit.JUnitBackend.write_test: produces well formed xml."""
+            """junit.JUnitBackend.write_test: produces well formed xml."""
             etree.parse(test_file)
 
         @pytest.mark.skipif(etree.__name__ != 'lxml.etree',
                             reason="This test requires lxml")
         def test_xml_valid(self, test_file):
-            """backends.junit.JUnitBackend.write_test: produces valid JUnit xml."""
+            """junit.JUnitBackend.write_test: produces valid JUnit xml."""
             # This XMLSchema class is unique to lxml
             schema = etree.XMLSchema(file=JUNIT_SCHEMA)  # pylint: disable=no-member
             with open(test_file, 'r') as f:
@@ -260,7 +260,7 @@ class TestJUnitSubtestWriter(object):
     """Tests for the JUnitWriter class."""
 
     def test_junit_replace(self, tmpdir):
-        """backends.junit.JUnitBackend.write_test: grouptools.SEPARATOR is
+        """junit.JUnitBackend.write_test: grouptools.SEPARATOR is
         replaced with '.'.
         """
         result = results.TestResult()
@@ -271,7 +271,7 @@ class TestJUnitSubtestWriter(object):
         result.subtests['foo'] = 'pass'
         result.subtests['bar'] = 'fail'
 
-        test = backends.junit.JUnitBackend(six.text_type(tmpdir),
+        test = junit.JUnitBackend(six.text_type(tmpdir),
                                            junit_subtests=True)
         test.initialize(shared.INITIAL_METADATA)
         with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
@@ -285,7 +285,7 @@ class TestJUnitSubtestWriter(object):
             'piglit.a.group.test1'
 
     def test_junit_replace_suffix(self, tmpdir):
-        """backends.junit.JUnitBackend.write_test: grouptools.SEPARATOR is
+        """junit.JUnitBackend.write_test: grouptools.SEPARATOR is
         replaced with '.'.
         """
         result = results.TestResult()
@@ -296,7 +296,7 @@ class TestJUnitSubtestWriter(object):
         result.subtests['foo'] = 'pass'
         result.subtests['bar'] = 'fail'
 
-        test = backends.junit.JUnitBackend(six.text_type(tmpdir),
+        test = junit.JUnitBackend(six.text_type(tmpdir),
                                            junit_subtests=True,
                                            junit_suffix='.foo')
         test.initialize(shared.INITIAL_METADATA)
@@ -320,7 +320,7 @@ class TestJUnitSubtestWriter(object):
         result.subtests['foo'] = 'pass'
         result.subtests['bar'] = 'skip'
 
-        test = backends.junit.JUnitBackend(six.text_type(tmpdir),
+        test = junit.JUnitBackend(six.text_type(tmpdir),
                                            junit_subtests=True)
         test.initialize(shared.INITIAL_METADATA)
         with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
@@ -343,7 +343,7 @@ class TestJUnitSubtestWriter(object):
         result.command = 'foo'
         result.result = 'skip'
 
-        test = backends.junit.JUnitBackend(six.text_type(tmpdir),
+        test = junit.JUnitBackend(six.text_type(tmpdir),
                                            junit_subtests=True)
         test.initialize(shared.INITIAL_METADATA)
         with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
@@ -365,7 +365,7 @@ class TestJUnitSubtestWriter(object):
         result.subtests['foo'] = 'pass'
         result.subtests['bar'] = 'skip'
 
-        test = backends.junit.JUnitBackend(six.text_type(tmpdir),
+        test = junit.JUnitBackend(six.text_type(tmpdir),
                                            junit_subtests=True)
         test.initialize(shared.INITIAL_METADATA)
         with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
@@ -394,7 +394,7 @@ class TestJUnitSubtestWriter(object):
             result.subtests['foo'] = 'pass'
             result.subtests['bar'] = 'fail'
 
-            test = backends.junit.JUnitBackend(six.text_type(p),
+            test = junit.JUnitBackend(six.text_type(p),
                                                junit_subtests=True)
             test.initialize(shared.INITIAL_METADATA)
             with test.write_test(grouptools.join('a', 'group', 'test1')) as t:
@@ -408,13 +408,13 @@ class TestJUnitSubtestWriter(object):
             return six.text_type(p.join('results.xml'))
 
         def test_xml_well_formed(self, test_file):
-            """backends.junit.JUnitBackend.write_test: produces well formed xml."""
+            """junit.JUnitBackend.write_test: produces well formed xml."""
             etree.parse(test_file)
 
         @pytest.mark.skipif(etree.__name__ != 'lxml.etree',
                             reason="This test requires lxml")
         def test_xml_valid(self, test_file):
-            """backends.junit.JUnitBackend.write_test: produces valid JUnit xml."""
+            """junit.JUnitBackend.write_test: produces valid JUnit xml."""
             # This XMLSchema class is unique to lxml
             schema = etree.XMLSchema(file=JUNIT_SCHEMA)  # pylint: disable=no-member
             with open(test_file, 'r') as f:
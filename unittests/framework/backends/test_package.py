@@ -23,11 +23,14 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import importlib
+import os
 
 import pytest
 import six
 
 from framework import backends
+from framework.backends import junit
 
 # pylint: disable=no-self-use
 
@@ -58,7 +61,7 @@ class TestGetBackend(object):
 
     @pytest.mark.parametrize("name,expected", [
         ('json', backends.json.JSONBackend),
-        ('junit', backends.junit.JUnitBackend),
+        ('junit', junit.JUnitBackend),
     ])
     def test_basic(self, name, expected):
         """Test that ensures the expected input and output."""
@@ -201,3 +204,31 @@ class TestSetMeta(object):
         """
         with pytest.raises(backends.BackendNotImplementedError):
             backends.set_meta('test_backend', {})
+
+
+class TestBackends(object):
+    """Tests for the BACKENDS mapping."""
+
+    def test_lazy(self, mocker):
+        """The modules aren't imported to list them or their extensions."""
+        import_module = mocker.patch(
+            'framework.backends.importlib.import_module')
+        test = backends._Backends({'json': ['.json']})
+
+        assert list(test) == ['json']
+        assert test.extensions('json') == ['.json']
+        assert not import_module.called
+
+    def test_modules_listed(self):
+        """Every backend module is listed, with the right extensions."""
+        found = {}
+        for module in os.listdir(os.path.dirname(backends.__file__)):
+            module, extension = os.path.splitext(module)
+            if extension == '.py':
+                mod = importlib.import_module(
+                    'framework.backends.{}'.format(module))
+                if isinstance(getattr(mod, 'REGISTRY', None),
+                              backends.register.Registry):
+                    found[module] = mod.REGISTRY.extensions
+
+        assert found == dict(backends._BACKEND_MODULES)
@@ -43,6 +43,8 @@ from framework.summary import feature
 
 from .. import utils
 
+# pylint: disable=protected-access
+
 DATA = {
     'spec@gl-1.0': {
         'include_tests': 'gl-1.0',
@@ -113,3 +115,57 @@ class TestFeatResult(object):
         """feat_status is populated."""
         assert feature.feat_status == \
             {'foo': {'spec@gl-1.0': 'pass', 'spec@gl-2.0': 'fail'}}
+
+    def test_no_profile(self, tmpdir):
+        """The profile is not loaded by default."""
+        p = tmpdir.join('p')
+        p.write(json.dumps(DATA))
+
+        result = results.TestrunResult()
+        result.tests['spec@gl-1.0@a'] = results.TestResult('pass')
+        result.name = 'foo'
+
+        with mock.patch('framework.summary.feature.profile.load_test_profile',
+                        mock.Mock(side_effect=AssertionError)):
+            feat = feature.FeatResults([result], six.text_type(p))
+        assert feat.feat_fractions['foo']['spec@gl-1.0'] == (1, 1)
+
+    def test_use_profile(self, tmpdir):
+        """Tests not in the profile are ignored with use_profile."""
+        p = tmpdir.join('p')
+        p.write(json.dumps(DATA))
+
+        result = results.TestrunResult()
+        result.tests['spec@gl-1.0@a'] = results.TestResult('pass')
+        result.tests['spec@gl-1.0@not_in_profile'] = results.TestResult('pass')
+        result.options['profile'] = [None]
+        result.name = 'foo'
+
+        with mock.patch('framework.summary.feature.profile.load_test_profile',
+                        mock.Mock(return_value=PROFILE)):
+            feat = feature.FeatResults([result], six.text_type(p),
+                                       use_profile=True)
+        assert feat.feat_fractions['foo']['spec@gl-1.0'] == (1, 1)
+
+
+class TestFindMembers(object):
+    """Tests for the _find_members helper."""
+
+    def test_exclude(self):
+        """feature._find_members: excluded tests are removed."""
+        features = {'a': (feature._compile('foo'), feature._compile('bar'))}
+        assert feature._find_members(['foo', 'foobar', 'baz'], features) == \
+            {'a': {'foo'}}
+
+    def test_overlapping(self):
+        """feature._find_members: a test can be in more than one feature."""
+        features = {'a': (feature._compile('foo'), None),
+                    'b': (feature._compile('oo'), None)}
+        assert feature._find_members(['foo'], features) == \
+            {'a': {'foo'}, 'b': {'foo'}}
+
+    def test_empty_include(self):
+        """feature._find_members: an empty include matches everything."""
+        features = {'a': (None, None), 'b': (feature._compile('x'), None)}
+        assert feature._find_members(['foo'], features) == \
+            {'a': {'foo'}, 'b': set()}
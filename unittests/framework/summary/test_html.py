@@ -25,10 +25,14 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import json
 import os
 
+import pytest
 import six
 
+from framework import results
+from framework.backends import compression
 from framework.summary import html_
 
 
@@ -38,3 +42,77 @@ def test_copy_static(tmpdir):
     html_._copy_static_files(six.text_type(tmpdir))
     assert os.path.exists('index.css'), 'index.css not created correctly'
     assert os.path.exists('result.css'), 'result.css not created correctly'
+
+
+class TestSpa(object):
+    """Tests for the single page html summary."""
+
+    @pytest.fixture
+    def summary(self, tmpdir, mocker):
+        """Generate a single page summary of two runs."""
+        runs = []
+        for name, stat in [('first', 'pass'), ('second', 'fail')]:
+            run = results.TestrunResult()
+            run.name = name
+            for test in ['a@b@c', 'a@b@d', 'x@y']:
+                run.tests[test] = results.TestResult(stat)
+            run.tests['a@b@d'].result = 'pass'
+            run.calculate_group_totals()
+            runs.append(run)
+
+        # Each run is loaded twice, once for the statuses and once for the
+        # details
+        mocker.patch('framework.summary.html_.backends.load',
+                     side_effect=lambda p: runs[['first', 'second'].index(p)])
+        html_.spa(['first', 'second'], six.text_type(tmpdir), [])
+        return tmpdir
+
+    @staticmethod
+    def _read(tmpdir, name):
+        with compression.DECOMPRESSORS['gz'](
+                six.text_type(tmpdir.join('data', name))) as f:
+            return json.load(f)
+
+    def test_static_files(self, summary):
+        """summary.html_.spa: writes the page and the script"""
+        assert summary.join('index.html').check()
+        assert summary.join('index.js').check()
+
+    def test_shards(self, summary):
+        """summary.html_.spa: tests are split into shards by group"""
+        index = self._read(summary, 'index.json.gz')
+        assert [s['group'] for s in index['shards']] == ['a@b', 'x@y']
+
+    def test_regressions(self, summary):
+        """summary.html_.spa: regressions are counted per shard"""
+        index = self._read(summary, 'index.json.gz')
+        assert [s['pages']['regressions'] for s in index['shards']] == [1, 1]
+
+    def test_statuses(self, summary):
+        """summary.html_.spa: each test has the status of every run"""
+        shard = self._read(summary, '0.json.gz')
+        assert shard[0]['name'] == 'a@b@c'
+        assert shard[0]['status'] == ['pass', 'fail']
+
+    def test_details(self, summary):
+        """summary.html_.spa: details are written per run"""
+        details = self._read(summary, '0-1.json.gz')
+        assert sorted(details) == ['a@b@c', 'a@b@d']
+        assert details['a@b@c']['result'] == 'fail'
+
+    def test_statuses_only(self):
+        """summary.html_._spa_statuses: keeps the statuses and subtests, but
+        not the details.
+        """
+        run = results.TestrunResult()
+        run.name = 'run'
+        run.tests['a'] = results.TestResult('crash')
+        run.tests['a'].out = 'lots of output'
+        run.tests['b'] = results.TestResult()
+        run.tests['b'].subtests['c'] = 'fail'
+
+        slim = html_._spa_statuses(run)
+        assert slim.name == 'run'
+        assert slim.tests['a'].result == 'crash'
+        assert slim.tests['a'].out == ''
+        assert slim.get_result('b@c') == 'fail'
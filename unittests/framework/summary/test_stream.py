@@ -0,0 +1,188 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the streaming summary comparisons."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+import six
+
+from framework import results, status
+from framework.backends.json import CURRENT_JSON_VERSION, piglit_encoder
+from framework.summary import common, stream
+
+# pylint: disable=no-self-use,protected-access,redefined-outer-name
+
+
+def _make_run(name, tests):
+    run = results.TestrunResult()
+    run.name = name
+    for test, stat in tests:
+        if isinstance(stat, dict):
+            run.tests[test] = results.TestResult()
+            run.tests[test].subtests.update(stat)
+        else:
+            run.tests[test] = results.TestResult(stat)
+    run.calculate_group_totals()
+    return run
+
+
+@pytest.fixture
+def runs(tmpdir):
+    """Two runs, written to json files, as (paths, TestrunResults)."""
+    runs = [
+        _make_run('first', [
+            ('z@test', 'pass'),
+            ('a@test', 'fail'),
+            ('b@test', 'skip'),
+            ('sub', {'one': 'pass', 'two': 'pass'}),
+            ('removed', 'pass'),
+        ]),
+        _make_run('second', [
+            ('a@test', 'pass'),
+            ('z@test', 'crash'),
+            ('sub', {'one': 'pass', 'two': 'fail'}),
+            ('added', 'fail'),
+        ]),
+    ]
+    paths = []
+    for run in runs:
+        p = tmpdir.join(run.name + '.json')
+        data = run.to_json()
+        data['results_version'] = CURRENT_JSON_VERSION
+        p.write(json.dumps(data, default=piglit_encoder, indent=4))
+        paths.append(six.text_type(p))
+    return paths, runs
+
+
+class TestJSONReader(object):
+    """Tests for the incremental json reader."""
+
+    @pytest.mark.parametrize('size', [1, 7, 1024])
+    def test_tests(self, runs, size):
+        """summary.stream._JSONReader: yields every test, whatever the
+        buffer size.
+        """
+        with mock.patch('framework.summary.stream._READ_SIZE', size):
+            with open(runs[0][0]) as f:
+                reader = stream._JSONReader(f)
+                names = [n for n, _ in reader]
+        assert names == list(runs[1][0].tests)
+        assert reader.metadata['name'] == 'first'
+
+
+class TestResultStream(object):
+    """Tests for the ResultStream class."""
+
+    def test_sorted(self, runs):
+        """summary.stream.ResultStream: yields tests in sorted order."""
+        names = [n for n, _ in stream.ResultStream(runs[0][0])]
+        assert names == sorted(names)
+
+    def test_subtests(self, runs):
+        """summary.stream.ResultStream: subtests are yielded individually."""
+        test = dict(stream.ResultStream(runs[0][1]))
+        assert test['sub@two'] is status.FAIL
+
+    def test_spill(self, runs):
+        """summary.stream.ResultStream: chunks spilled to disk are merged."""
+        with mock.patch('framework.summary.stream.CHUNK_SIZE', 2):
+            names = [n for n, _ in stream.ResultStream(runs[0][0])]
+        assert names == sorted(common.Results([runs[1][0]]).names.all)
+
+    def test_totals(self, runs):
+        """summary.stream.ResultStream: root totals match TestrunResult."""
+        res = stream.ResultStream(runs[0][0])
+        list(res)
+        assert res.totals['root'] == runs[1][0].totals['root']
+
+    def test_backend(self, runs, tmpdir):
+        """summary.stream.ResultStream: runs that aren't final json files are
+        loaded through the backends, keeping their name.
+        """
+        path = six.text_type(tmpdir.join('results.xml'))
+        with mock.patch('framework.summary.stream.backends.load',
+                        return_value=runs[1][0]):
+            res = stream.ResultStream(path)
+            names = [n for n, _ in res]
+        assert names == sorted(common.Results([runs[1][0]]).names.all)
+        assert res.name == 'first'
+
+    def test_no_name(self, runs, tmpdir):
+        """summary.stream.ResultStream: a json file without a name is named
+        after the file.
+        """
+        data = json.loads(tmpdir.join('first.json').read())
+        del data['name']
+        p = tmpdir.join('noname.json')
+        p.write(json.dumps(data))
+        res = stream.ResultStream(six.text_type(p))
+        assert len(list(res)) == 6
+        assert res.name == 'noname.json'
+
+    def test_outdated(self, runs, tmpdir):
+        """summary.stream.ResultStream: json files from an older version are
+        loaded through the backends, so that they're updated.
+        """
+        data = json.loads(tmpdir.join('first.json').read())
+        data['results_version'] = CURRENT_JSON_VERSION - 1
+        p = tmpdir.join('old.json')
+        p.write(json.dumps(data))
+        with mock.patch('framework.summary.stream.backends.load',
+                        return_value=runs[1][1]) as load:
+            res = stream.ResultStream(six.text_type(p))
+            names = [n for n, _ in res]
+        load.assert_called_once_with(six.text_type(p))
+        assert names == sorted(common.Results([runs[1][1]]).names.all)
+        assert res.totals['root'] == runs[1][1].totals['root']
+
+
+class TestStreamResults(object):
+    """Tests for the StreamResults class."""
+
+    def test_changes(self, runs):
+        """summary.stream.StreamResults: finds the same changes as
+        common.Results.
+        """
+        expected = common.Results(runs[1])
+        test = stream.StreamResults(runs[0])
+        assert set(n for n, _ in test.diff()) == expected.names.all_changes
+
+    @pytest.mark.parametrize('attr', ['changes', 'regressions', 'fixes'])
+    def test_counts(self, runs, attr):
+        """summary.stream.StreamResults: counts match common.Results."""
+        expected = common.Results(runs[1])
+        test = stream.StreamResults(runs[0])
+        list(test.diff())
+        assert getattr(test.counts, attr) == getattr(expected.counts, attr)
@@ -0,0 +1,116 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Tests for the timeline summary."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import pytest
+
+from framework import exceptions
+from framework.summary import timeline_
+
+# pylint: disable=no-self-use,redefined-outer-name
+
+
+def _test(name, pool, worker, start, end, status='pass'):
+    return {'name': name, 'cat': 'test', 'ph': 'X', 'pid': pool,
+            'tid': worker, 'ts': start * 1000000,
+            'dur': (end - start) * 1000000, 'args': {'status': status}}
+
+
+@pytest.fixture
+def line():
+    """A run with two concurrent workers and a serial tail.
+
+    concurrent 1: a 0-2, b 2-3
+    concurrent 2: c 0-1, (idle 1-4), d 4-5
+    serial 1:     e 3-3.5, f 5-8
+
+    """
+    return timeline_.Timeline([
+        {'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0,
+         'args': {'name': 'concurrent'}},
+        _test('a', 1, 1, 0, 2),
+        _test('b', 1, 1, 2, 3),
+        _test('c', 1, 2, 0, 1),
+        _test('d', 1, 2, 4, 5),
+        _test('e', 2, 1, 3, 3.5),
+        _test('f', 2, 1, 5, 8, 'fail'),
+        {'name': 'spawn', 'cat': 'phase', 'ph': 'X', 'pid': 1, 'tid': 1,
+         'ts': 0, 'dur': 500000},
+    ])
+
+
+class TestTimeline(object):
+    """Tests for the Timeline class."""
+
+    def test_wall(self, line):
+        assert line.wall == 8
+
+    def test_busy(self, line):
+        assert line.busy == 8.5
+
+    def test_phases(self, line):
+        assert line.phases == {'spawn': 0.5}
+
+    def test_idle_gaps(self, line):
+        assert line.idle_gaps() == [(3.5, 4)]
+
+    def test_idle_gaps_minimum(self, line):
+        assert line.idle_gaps(1) == []
+
+    def test_serial_only(self, line):
+        """Time when only the serial pool is running."""
+        assert line.serial_only() == 3.5
+
+    def test_pools(self, line):
+        pools = line.pools()
+        assert pools['concurrent'] == (2, 5, 5, 0.5)
+        assert pools['serial'][:3] == (1, 5, 3.5)
+
+    def test_critical_path(self, line):
+        assert [t.name for t in line.critical_path()] == ['e', 'f']
+
+    def test_no_tests(self):
+        with pytest.raises(exceptions.PiglitFatalError):
+            timeline_.Timeline([])
+
+
+def test_timeline_output(tmpdir, capsys, line):
+    """summary.timeline_.timeline: prints the analysis."""
+    p = tmpdir.join('trace.json')
+    p.write(json.dumps({'traceEvents': [
+        _test(t.name, 1 if t.pool == 'concurrent' else 2, t.worker,
+              t.start, t.end, t.status) for t in line.tests]}))
+
+    timeline_.timeline(str(p), gap=0.1, top=1)
+    out = capsys.readouterr()[0]
+
+    assert 'wall time: 8.000s' in out
+    assert '0.500s at 3.500s' in out
+    assert '3.000s f (fail)' in out
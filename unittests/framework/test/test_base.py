@@ -24,6 +24,7 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import os
+import sys
 import textwrap
 try:
     import subprocess32 as subprocess
@@ -69,6 +70,44 @@ class TestTest(object):
 
             t.run()
 
+    class TestResolveSkip(object):
+        """Tests for Test.resolve_skip."""
+
+        def test_skip(self, mocker):
+            """sets a skip result without running the test."""
+            t = _Test(['foo'])
+            mocker.patch.object(t, 'is_skip',
+                                side_effect=base.TestIsSkip('reason'))
+            run = mocker.patch.object(t, '_run_command')
+
+            assert t.resolve_skip()
+            assert t.result.result is status.SKIP
+            assert t.result.out == 'reason'
+            assert t.result.command == 'foo'
+            run.assert_not_called()
+
+        def test_subtests(self, mocker):
+            """sets the subtests to skip."""
+            t = _Test(['foo'])
+            t.result.subtests['a'] = status.NOTRUN
+            mocker.patch.object(t, 'is_skip',
+                                side_effect=base.TestIsSkip('reason'))
+
+            t.resolve_skip()
+            assert t.result.subtests['a'] is status.SKIP
+
+        def test_no_skip(self):
+            """returns False and leaves the result alone."""
+            t = _Test(['foo'])
+            assert not t.resolve_skip()
+            assert t.result.result is status.NOTRUN
+
+        def test_error(self, mocker):
+            """leaves other errors to be reported when the test is run."""
+            t = _Test(['foo'])
+            mocker.patch.object(t, 'is_skip', side_effect=Exception('foo'))
+            assert not t.resolve_skip()
+
     @pytest.mark.skipif(six.PY2 and subprocess.__name__ != 'subprocess32',
                         reason='Python 2.7 requires subprocess32 to run this test')
     @skip.posix
@@ -108,12 +147,6 @@ class TestTest(object):
 
                 def __call__(self, *args, **kwargs):
                     self.popen = subprocess.Popen(*args, **kwargs)
-
-                    # if communicate is called successfully then the proc will
-                    # be reset to None, which will make the test fail.
-                    self.popen.communicate = mocker.Mock(
-                        return_value=('out', 'err'))
-
                     return self.popen
 
             # localpath doesn't have a seek option
@@ -143,20 +176,39 @@ class TestTest(object):
                 # store it so we can access it later
                 proxy = PopenProxy()
 
-                test = _Test(['python' + ('2' if six.PY2 else '3'),
-                              six.text_type(f)])
+                test = _Test([sys.executable, f.name])
                 test.timeout = 1
 
                 # mock out subprocess.Popen with our proxy object
                 mock_subp = mocker.patch('framework.test.base.subprocess')
                 mock_subp.Popen = proxy
                 mock_subp.TimeoutExpired = subprocess.TimeoutExpired
+                mock_subp.PIPE = subprocess.PIPE
                 test.run()
 
-                # Check to see if the Popen has children, even after it should
-                # have received a TimeoutExpired.
-                proc = psutil.Process(os.getsid(proxy.popen.pid))
-                children = proc.children(recursive=True)
+                # Check to see if any process is left in the session of the
+                # test, even after it should have received a TimeoutExpired.
+                # The test itself has been reaped, so look for processes by
+                # their session id, which is the pid of the test.
+                session = []
+                for proc in psutil.process_iter():
+                    try:
+                        if os.getsid(proc.pid) == proxy.popen.pid:
+                            session.append(proc)
+                    except (OSError, psutil.Error):
+                        pass
+
+                # Killed processes can take a moment to exit, wait for them
+                # (but not for as long as they would run if they weren't
+                # killed), and ignore any that are dead but not yet reaped.
+                _, alive = psutil.wait_procs(session, timeout=3)
+                children = []
+                for proc in alive:
+                    try:
+                        if proc.status() != psutil.STATUS_ZOMBIE:
+                            children.append(proc)
+                    except psutil.Error:
+                        pass
 
             if children:
                 # If there are still running children attempt to clean them up,
@@ -195,6 +247,45 @@ class TestTest(object):
             test.run()
             assert test.result.result is status.TIMEOUT
 
+        @pytest.mark.timeout(6)
+        def test_timeout_closed_output(self):
+            """test.base.Test: A test that closes its output and hangs still
+            times out.
+            """
+            test = _Test(['sh', '-c', 'exec >&- 2>&-; sleep 60'])
+            test.timeout = 1
+            test.run()
+            assert test.result.result is status.TIMEOUT
+
+        def test_output_limit(self, mocker, tmpdir):
+            """test.base.Test: output over the limit is written to a file."""
+            opts = mocker.patch('framework.test.base.OPTIONS',
+                                new_callable=Options)
+            opts.output_dir = six.text_type(tmpdir)
+            mocker.patch.dict(os.environ, {'PIGLIT_OUTPUT_LIMIT': '0.001'})
+
+            test = _Test([sys.executable, '-c', textwrap.dedent("""\
+                for i in range(1000):
+                    print('line {}'.format(i))
+                print('PIGLIT: {"result": "pass"}')
+                for i in range(1000):
+                    print('line {}'.format(i))
+            """)])
+            test._run_command()
+
+            out = test.result.out
+            assert out.startswith('line 0\n')
+            assert out.endswith('line 999\n')
+            assert 'PIGLIT: {"result": "pass"}\n' in out
+            assert len(out) < 2048
+            assert len(tmpdir.listdir()) == 1
+
+            assert len(test.result.truncated) == 1
+            truncated = test.result.truncated[0]
+            assert truncated['stream'] == 'out'
+            assert truncated['file'] == six.text_type(tmpdir.listdir()[0])
+            assert truncated['total'] - truncated['dropped'] < 2048
+
     class TestExecuteTraceback(object):
         """Test.execute tests for Traceback handling."""
 
@@ -237,6 +328,20 @@ class TestTest(object):
             assert shared_test.exception != ''
             assert isinstance(shared_test.exception, six.string_types)
 
+        def test_dmesg_window_closed(self, mocker):
+            """Test.execute (exception): Closes the dmesg window."""
+            test = _Test(['foo'])
+            test.run = mocker.Mock(side_effect=self.Sentinal)
+            dmesg_ = mocker.Mock(spec=dmesg.BaseDmesg)
+
+            test.execute(mocker.Mock(spec=six.text_type),
+                         mocker.Mock(spec=log.BaseLog),
+                         {'dmesg': dmesg_,
+                          'monitor': mocker.Mock(spec=monitoring.Monitoring)})
+
+            dmesg_.end.assert_called_once_with(dmesg_.begin.return_value,
+                                               test.result)
+
     class TestCommand(object):
         """Tests for Test.command."""
 
@@ -270,6 +375,24 @@ class TestTest(object):
 
             assert args == ['a', 'b']
 
+    class TestResult(object):
+        """Tests for Test.result."""
+
+        def test_lazy(self):
+            """The TestResult isn't created until it's used."""
+            test = _Test(['foo'])
+            assert test._result is None
+            assert test.result.result is status.NOTRUN
+
+        def test_release(self):
+            """release() drops the result, a new one is made if needed."""
+            test = _Test(['foo'])
+            test.result.result = status.PASS
+            test.release()
+
+            assert test._result is None
+            assert test.result.result is status.NOTRUN
+
     class TestInterpretResult(object):
         """Tests for Test.interpret_result."""
 
@@ -284,6 +407,57 @@ class TestTest(object):
             assert test.result.result is status.FAIL
 
 
+class TestOutput(object):
+    """Tests for the _Output class."""
+
+    def test_under_limit(self):
+        """Output under the limit is kept as is."""
+        output = base._Output(100)
+        output.write(b'a\r\n')
+        output.write(b'b\n')
+        assert output.getvalue() == b'a\nb\n'
+        assert output.dropped == 0
+
+    def test_head_and_tail(self):
+        """The start and end of the output are kept."""
+        output = base._Output(8)
+        for i in range(10):
+            output.write('{}\n'.format(i).encode('utf-8'))
+        value = output.getvalue()
+
+        assert value.startswith(b'0\n1\n')
+        assert value.endswith(b'\n8\n9\n')
+        assert b'12 of 20 bytes left out]' in value
+        assert output.total == 20
+
+    def test_keep_piglit(self):
+        """Lines with results are kept even if they are left out."""
+        output = base._Output(24)
+        for line in [b'a\n'] * 6 + [b'PIGLIT: x\n'] + [b'b\n'] * 6:
+            output.write(line)
+        assert b']\nPIGLIT: x\nb\n' in output.getvalue()
+
+    def test_keep_piglit_limit(self):
+        """Lines with results that are left out use bounded memory."""
+        output = base._Output(16)
+        for _ in range(10):
+            output.write(b'PIGLIT\n')
+        # Two lines in the head, one in the tail, and one kept
+        assert output.getvalue().count(b'PIGLIT\n') == 4
+
+    def test_spill(self, tmpdir):
+        """The left out output is written to a file in the directory."""
+        output = base._Output(4, six.text_type(tmpdir.join('out')), 'test-')
+        for line in [b'a\n', b'b\n', b'c\n', b'd\n']:
+            output.write(line)
+        value = output.getvalue()
+
+        assert output.filename.startswith(six.text_type(tmpdir.join('out')))
+        assert output.filename.encode('utf-8') in value
+        with open(output.filename, 'rb') as f:
+            assert f.read() == b'b\nc\n'
+
+
 class TestWindowResizeMixin(object):
     """Tests for the WindowResizeMixin class."""
 
@@ -445,6 +619,8 @@ class TestReducedProcessMixin(object):
                     self.result.returncode = next(self.gen_rcode)
                     self.result.out = next(self.gen_out)
                     self.result.err = next(self.gen_err)
+                    for line in self.result.out.split('\n'):
+                        self._stdout_line(line)
 
             class Test(base.ReducedProcessMixin, _Shim, _Test):
                 """The actual Class returned by the fixture.
@@ -541,3 +717,57 @@ class TestReducedProcessMixin(object):
             assert test.result.subtests['a'] == status.PASS
             assert test.result.subtests['b'] == status.PASS
             assert test.result.subtests['c'] == status.CRASH
+
+    class TestStreaming(object):
+        """Tests for following the output of a running process."""
+
+        class _Script(base.ReducedProcessMixin, _Test):
+            """Runs a python script that prints each subtest name, and exits
+            with 1 after printing 'crash', or sleeps after printing 'hang'.
+            """
+
+            script = textwrap.dedent("""\
+                import sys, time
+                for name in sys.argv[1:]:
+                    print('TEST: ' + name)
+                    sys.stdout.flush()
+                    if name == 'crash':
+                        sys.exit(1)
+                    elif name == 'hang':
+                        time.sleep(60)
+            """)
+
+            def __init__(self, subtests):
+                super(TestReducedProcessMixin.TestStreaming._Script, self).__init__(
+                    [sys.executable, '-c', self.script] + subtests,
+                    subtests=subtests)
+
+            def _resume(self, current):
+                return self.command[:3] + self._expected[current:]
+
+            def _is_subtest(self, line):
+                return line.startswith('TEST: ')
+
+        def test_resume(self):
+            """The run is resumed after the subtest that crashed."""
+            test = self._Script(['a', 'crash', 'c'])
+            test._run_command()
+
+            assert test.result.subtests['crash'] is status.CRASH
+            assert test.result.subtests['c'] is status.NOTRUN
+            assert test.result.out == (
+                'TEST: a\nTEST: crash\n\n\n====RESUME====\n\nTEST: c\n')
+            assert test.result.returncode == 1
+
+        @pytest.mark.slow
+        @pytest.mark.timeout(6)
+        @pytest.mark.skipif(os.name != 'posix',
+                            reason='Timeouts are only supported on posix')
+        def test_timeout(self):
+            """A hung test is killed, keeping the output printed so far."""
+            test = self._Script(['a', 'hang'])
+            test.timeout = 1
+            with pytest.raises(base.TestRunError):
+                test._run_command()
+
+            assert test.result.out == 'TEST: a\nTEST: hang\n'
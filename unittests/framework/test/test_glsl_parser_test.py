@@ -167,6 +167,22 @@ def test_c_comments(tmpdir):
                             six.text_type(p), 'pass', '1.10']
 
 
+def test_only_config_read(tmpdir):
+    """test.glsl_parser_test.GLSLParserTest: nothing after the config is read.
+    """
+    p = tmpdir.join('test.frag')
+    p.write_binary(textwrap.dedent("""\
+        // [config]
+        // expect_result: pass
+        // glsl_version: 1.10
+        // [end config]
+        """).encode('utf-8') + b'x\n' * 65536 + b'\xff\xfe not utf-8\n')
+    test = glsl.GLSLParserTest(six.text_type(p))
+
+    assert test.command == [os.path.join(_TEST_BIN_DIR, 'glslparsertest'),
+                            six.text_type(p), 'pass', '1.10']
+
+
 def test_blank_in_config_cpp(tmpdir):
     """test.glsl_parser_test.GLSLParserTest: C++ style comments can have
     uncommented newlines."""
@@ -481,3 +497,106 @@ def test_add_compatibility_requirement_binary(version, extension, tmpdir,
     # The compat extension was added to the slow skipping (C level)
     # requirements
     assert extension in test.command
+
+
+class TestMultiGLSLParserTest(object):
+    """Tests for the MultiGLSLParserTest class."""
+
+    @staticmethod
+    def write_config(filename, version='1.10', extra=''):
+        filename.write(textwrap.dedent("""\
+            // [config]
+            // expect_result: pass
+            // glsl_version: {}
+            // {}
+            // [end config]""".format(version, extra)))
+        return six.text_type(filename)
+
+    @pytest.fixture
+    def inst(self, tmpdir):
+        one = self.write_config(tmpdir.join('one.vert'), version='1.30',
+                                extra='check_link: true')
+        two = self.write_config(tmpdir.join('Two.frag'),
+                                extra='require_extensions: GL_ARB_foo')
+        return glsl.MultiGLSLParserTest([one, two])
+
+    def test_command(self, inst):
+        """Each file's arguments are passed, sorted by GLSL version."""
+        assert os.path.basename(inst.command[0]) == 'glslparsertest'
+        assert [os.path.basename(a) for a in inst.command[1:]] == [
+            '-report-subtests',
+            'Two.frag', 'pass', '1.10', 'GL_ARB_foo', '--',
+            'one.vert', 'pass', '1.30', '--check-link']
+
+    def test_subtests(self, inst):
+        """The subtests are named after the files."""
+        assert set(inst.result.subtests) == {'one.vert', 'two.frag'}
+
+    def test_resume(self, inst):
+        actual = inst._resume(1)  # pylint: disable=protected-access
+        assert os.path.basename(actual[0]) == 'glslparsertest'
+        assert [os.path.basename(a) for a in actual[1:]] == [
+            '-report-subtests', 'one.vert', 'pass', '1.30', '--check-link']
+
+    def test_interpret_result(self, inst):
+        inst.result.returncode = 0
+        inst.result.out = (
+            'PIGLIT TEST: Two.frag\n'
+            'PIGLIT: {"subtest": {"Two.frag" : "pass"}}\n'
+            'PIGLIT TEST: one.vert\n'
+            'PIGLIT: {"subtest": {"one.vert" : "fail"}}\n')
+        inst.interpret_result()
+        assert inst.result.subtests['two.frag'] == 'pass'
+        assert inst.result.subtests['one.vert'] == 'fail'
+
+    def test_no_config(self, tmpdir):
+        """Files without a config are left out."""
+        one = self.write_config(tmpdir.join('one.vert'))
+        two = tmpdir.join('two.vert')
+        two.write('void main() {}')
+        test = glsl.MultiGLSLParserTest([one, six.text_type(two)])
+        assert set(test.result.subtests) == {'one.vert'}
+
+    def test_all_no_config(self, tmpdir):
+        """If none of the files have a config an exception is raised."""
+        one = tmpdir.join('one.vert')
+        one.write('void main() {}')
+        with pytest.raises(glsl.GLSLParserNoConfigError):
+            glsl.MultiGLSLParserTest([six.text_type(one)])
+
+    def test_different_binaries(self, tmpdir):
+        """Files for different binaries can't be run together."""
+        one = self.write_config(tmpdir.join('one.vert'))
+        two = self.write_config(tmpdir.join('two.vert'), version='3.00')
+        with pytest.raises(exceptions.PiglitInternalError):
+            glsl.MultiGLSLParserTest([one, two])
+
+    def test_skip_desktop_without_binary(self, tmpdir, mocker):
+        """Without a binary for the files all of the subtests are skip."""
+        mocker.patch('framework.test.glsl_parser_test._HAS_GL_BIN', False)
+        one = self.write_config(tmpdir.join('one.vert'))
+        test = glsl.MultiGLSLParserTest([one])
+        assert test.result.subtests['one.vert'] == 'skip'
+        with pytest.raises(_TestIsSkip):
+            test.is_skip()
+
+
+def test_group_by_binary(tmpdir):
+    """Files are grouped by binary, and files without a config left out."""
+    config = textwrap.dedent("""\
+        // [config]
+        // expect_result: pass
+        // glsl_version: {}
+        // [end config]""")
+    gl = tmpdir.join('gl.vert')
+    gl.write(config.format('1.10'))
+    gles = tmpdir.join('gles.vert')
+    gles.write(config.format('3.00'))
+    none = tmpdir.join('none.vert')
+    none.write('void main() {}')
+    files = [six.text_type(p) for p in [gl, gles, none]]
+
+    assert glsl.group_by_binary(files) == {
+        'glslparsertest': [files[0]],
+        'glslparsertest_gles2': [files[1]],
+    }
@@ -31,6 +31,7 @@ except ImportError:
     import mock
 
 import pytest
+import six
 
 from framework.test import opengl
 from framework.test.base import TestIsSkip as _TestIsSkip
@@ -392,6 +393,153 @@ class TestWflInfo(object):
             inst.glsl_es_version
 
 
+class TestWflInfoProbe(object):
+    """Tests for WflInfo.probe and the wflinfo cache.
+
+    These don't need wflinfo, since it's output is mocked.
+    """
+
+    OUTPUT = textwrap.dedent("""\
+        Waffle platform: gbm
+        Waffle api: gl
+        OpenGL vendor string: Intel Open Source Technology Center
+        OpenGL renderer string: Mesa DRI Intel(R) Haswell Mobile
+        OpenGL version string: 4.5 (Core Profile) Mesa 11.0.4
+        OpenGL context flags: 0x0
+        OpenGL shading language version string: 4.50
+        OpenGL extensions: GL_ARB_foo GL_ARB_bar
+    """).encode('utf-8')
+
+    @pytest.yield_fixture(autouse=True)
+    def patch(self, tmpdir):
+        with mock.patch.dict('framework.test.opengl.OPTIONS.env',
+                             {'PIGLIT_PLATFORM': 'foo'}), \
+                mock.patch.dict('os.environ',
+                                {'XDG_CACHE_HOME': six.text_type(tmpdir)}), \
+                mock.patch(
+                    'framework.test.opengl.WflInfo._WflInfo__shared_state',
+                    {}):
+            yield
+
+    @staticmethod
+    def _reset():
+        """Clear the shared state, as if this was a new piglit run."""
+        opengl.WflInfo._WflInfo__shared_state.clear()
+
+    def _probe(self, output=None):
+        """Probe with wflinfo mocked, return the check_output mock."""
+        check_output = mock.Mock(return_value=output or self.OUTPUT)
+        with mock.patch('framework.test.opengl.subprocess.check_output',
+                        check_output):
+            opengl.WflInfo().probe()
+        return check_output
+
+    def test_values(self):
+        """test.opengl.WflInfo.probe: calculates every value."""
+        self._probe()
+        inst = opengl.WflInfo()
+        assert inst.gl_extensions == {'GL_ARB_foo', 'GL_ARB_bar'}
+        assert inst.gl_version == 4.5
+        assert inst.glsl_version == 4.5
+
+    def test_runs_each_probe_once(self):
+        """test.opengl.WflInfo.probe: runs each api/profile only once."""
+        check_output = self._probe()
+        assert check_output.call_count == len(opengl.WflInfo._PROBES)
+
+    def test_only_once(self):
+        """test.opengl.WflInfo.probe: does nothing after the first call."""
+        self._probe()
+        assert self._probe().call_count == 0
+
+    def test_no_lock_after_probe(self):
+        """test.opengl.WflInfo.probe: doesn't take the lock once the values
+        are calculated.
+        """
+        self._probe()
+        with mock.patch('framework.test.opengl.WflInfo._lock') as lock:
+            self._probe()
+        assert not lock.__enter__.called
+
+    def test_start(self):
+        """test.opengl.WflInfo.start: probes in a background thread, once."""
+        with mock.patch('framework.test.opengl.threading.Thread') as thread:
+            inst = opengl.WflInfo()
+            assert not inst.started
+            inst.start()
+            inst.start()
+        thread.assert_called_once_with(target=inst.probe)
+        assert inst.started
+
+    def test_start_early(self):
+        """test.opengl.FastSkip: starts probing when created, if
+        start_early is set.
+        """
+        with mock.patch('framework.test.opengl.WflInfo.start') as start:
+            opengl.FastSkip()
+            assert not start.called
+            with mock.patch('framework.test.opengl.FastSkip.start_early',
+                            True):
+                opengl.FastSkip()
+        start.assert_called_once_with()
+
+    def test_cached(self):
+        """test.opengl.WflInfo.probe: later runs read the cache."""
+        self._probe()
+        expected = opengl.WflInfo().to_json()
+        self._reset()
+
+        assert self._probe().call_count == 1
+        assert opengl.WflInfo().to_json() == expected
+
+    def test_cache_driver_changed(self):
+        """test.opengl.WflInfo.probe: a different renderer misses the
+        cache.
+        """
+        self._probe()
+        self._reset()
+
+        output = self.OUTPUT.replace(b'Haswell', b'Skylake')
+        assert self._probe(output).call_count == len(opengl.WflInfo._PROBES)
+
+    def test_cache_library_changed(self):
+        """test.opengl.WflInfo.probe: a changed library misses the cache."""
+        self._probe()
+        self._reset()
+
+        with mock.patch('framework.test.opengl._library_stats',
+                        mock.Mock(return_value=[('libGL.so.1', 1, 1.0)])):
+            check_output = self._probe()
+        assert check_output.call_count == len(opengl.WflInfo._PROBES)
+
+    def test_cache_environment_changed(self):
+        """test.opengl.WflInfo.probe: a driver environment variable misses
+        the cache.
+        """
+        self._probe()
+        self._reset()
+
+        with mock.patch.dict('os.environ',
+                             {'MESA_EXTENSION_OVERRIDE': '-GL_ARB_foo'}):
+            check_output = self._probe()
+        assert check_output.call_count == len(opengl.WflInfo._PROBES)
+
+    def test_no_wflinfo(self, tmpdir):
+        """test.opengl.WflInfo.probe: handles wflinfo not being installed."""
+        with mock.patch('framework.test.opengl.subprocess.check_output',
+                        mock.Mock(side_effect=OSError(2, 'foo'))):
+            opengl.WflInfo().probe()
+
+        assert opengl.WflInfo().to_json() == {
+            'gl_extensions': [],
+            'gl_version': None,
+            'gles_version': None,
+            'glsl_version': None,
+            'glsl_es_version': None,
+        }
+        assert not tmpdir.listdir()
+
+
 class TestFastSkipMixin(object):  # pylint: disable=too-many-public-methods
     """Tests for the FastSkipMixin class."""
 
@@ -0,0 +1,253 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the cache of parsed test files."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import os
+import textwrap
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+import six
+
+from framework.test import glsl_parser_test
+from framework.test import parse_cache
+
+# pylint: disable=no-self-use,redefined-outer-name
+
+
+@pytest.yield_fixture(autouse=True)
+def cache_dir(tmpdir):
+    """Point the cache at a temporary directory."""
+    with mock.patch.dict('os.environ',
+                         {'XDG_CACHE_HOME': six.text_type(tmpdir.join('c'))}):
+        yield tmpdir.join('c', 'piglit', 'profiles')
+
+
+def _parse(path):
+    """A parser that counts how many times it's called."""
+    _parse.calls += 1
+    with open(path, 'r') as f:
+        return f.read()
+
+
+@pytest.fixture
+def files(tmpdir):
+    """Create a directory with a few files, and reset the parse counter."""
+    _parse.calls = 0
+    tmpdir.join('t', 'a').write('a', ensure=True)
+    tmpdir.join('t', 'b').write('b', ensure=True)
+    return tmpdir.join('t')
+
+
+def _reload():
+    """Return a freshly loaded cache, as a new piglit run would."""
+    cache = parse_cache.ParseCache()
+    cache.load()
+    return cache
+
+
+def _touch(path, content):
+    """Change a file and make sure that its mtime changes."""
+    stat = os.stat(six.text_type(path))
+    path.write(content)
+    os.utime(six.text_type(path), (stat.st_atime, stat.st_mtime + 10))
+
+
+class TestGet(object):
+    """Tests for ParseCache.get."""
+
+    def test_disabled(self, files):
+        """Parses every time until load() is called."""
+        cache = parse_cache.ParseCache()
+        cache.get(six.text_type(files.join('a')), _parse)
+        cache.get(six.text_type(files.join('a')), _parse)
+        assert _parse.calls == 2
+
+    def test_cached(self, files):
+        """Values are reused by the next run."""
+        cache = _reload()
+        assert cache.get(six.text_type(files.join('a')), _parse) == 'a'
+        cache.save()
+
+        assert _reload().get(six.text_type(files.join('a')), _parse) == 'a'
+        assert _parse.calls == 1
+
+    def test_changed_file(self, files):
+        """Only the changed file is parsed again."""
+        cache = _reload()
+        for name in ['a', 'b']:
+            cache.get(six.text_type(files.join(name)), _parse)
+        cache.save()
+
+        _touch(files.join('a'), 'changed')
+        cache = _reload()
+        assert cache.get(six.text_type(files.join('a')), _parse) == 'changed'
+        assert cache.get(six.text_type(files.join('b')), _parse) == 'b'
+        assert _parse.calls == 3
+
+    def test_context(self, files):
+        """A different context parses the file again."""
+        cache = _reload()
+        cache.get(six.text_type(files.join('a')), _parse, context=1)
+        cache.save()
+
+        _reload().get(six.text_type(files.join('a')), _parse, context=2)
+        assert _parse.calls == 2
+
+    def test_version(self, files, mocker):
+        """Changing the parsers throws away the whole cache."""
+        cache = _reload()
+        cache.get(six.text_type(files.join('a')), _parse)
+        cache.save()
+
+        mocker.patch('framework.test.parse_cache.CACHE_VERSION', -1)
+        _reload().get(six.text_type(files.join('a')), _parse)
+        assert _parse.calls == 2
+
+    def test_corrupt(self, files, cache_dir):
+        """A corrupt cache is ignored."""
+        cache_dir.join('parsed.pickle').write('not a pickle', ensure=True)
+        assert _reload().get(six.text_type(files.join('a')), _parse) == 'a'
+
+
+class TestPrefetch(object):
+    """Tests for ParseCache.prefetch."""
+
+    @pytest.fixture(autouse=True)
+    def parallel(self, mocker):
+        """Pretend that there are enough CPUs and files to use a pool."""
+        mocker.patch('framework.test.parse_cache.multiprocessing.cpu_count',
+                     return_value=2)
+        mocker.patch('framework.test.parse_cache._MIN_PARALLEL', 0)
+
+    def test_prefetched(self, files):
+        """get() returns the values parsed by the pool."""
+        cache = _reload()
+        cache.prefetch([six.text_type(files.join(n)) for n in 'ab'], _parse)
+        assert cache.get(six.text_type(files.join('a')), _parse) == 'a'
+        assert cache.get(six.text_type(files.join('b')), _parse) == 'b'
+        assert _parse.calls == 0
+
+    def test_error(self, files):
+        """Nothing is stored if a file fails to parse."""
+        files.join('d').ensure(dir=True)
+        cache = _reload()
+        cache.prefetch([six.text_type(files.join(n)) for n in 'ad'], _parse)
+        assert not cache._files
+
+    def test_single_cpu(self, files, mocker):
+        """Nothing is done with only one CPU."""
+        mocker.patch('framework.test.parse_cache.multiprocessing.cpu_count',
+                     return_value=1)
+        cache = _reload()
+        cache.prefetch([six.text_type(files.join('a'))], _parse)
+        assert not cache._files
+
+
+class TestWalk(object):
+    """Tests for ParseCache.walk."""
+
+    def test_same_as_walk(self, files):
+        """Gives the same results as os.walk."""
+        files.join('d', 'c').write('c', ensure=True)
+        expected = sorted((d, sorted(n), sorted(f))
+                          for d, n, f in os.walk(six.text_type(files)))
+
+        cache = _reload()
+        assert sorted((d, sorted(n), sorted(f))
+                      for d, n, f in cache.walk(six.text_type(files))) == \
+            expected
+        cache.save()
+
+        assert sorted((d, sorted(n), sorted(f))
+                      for d, n, f in _reload().walk(six.text_type(files))) == \
+            expected
+
+    def test_new_file(self, files):
+        """A file added to a directory is found."""
+        cache = _reload()
+        list(cache.walk(six.text_type(files)))
+        cache.save()
+
+        stat = os.stat(six.text_type(files))
+        files.join('new').write('')
+        os.utime(six.text_type(files), (stat.st_atime, stat.st_mtime + 10))
+
+        walked = list(_reload().walk(six.text_type(files)))
+        assert 'new' in walked[0][2]
+
+
+class TestSave(object):
+    """Tests for ParseCache.save."""
+
+    def test_removed_files_dropped(self, files):
+        """Entries for files that no longer exist are removed."""
+        cache = _reload()
+        cache.get(six.text_type(files.join('a')), _parse)
+        cache.save()
+
+        files.join('a').remove()
+        cache = _reload()
+        cache.save()
+        assert not _reload()._files
+
+    def test_released(self, files):
+        """The entries are dropped and the cache disabled once written."""
+        cache = _reload()
+        cache.get(six.text_type(files.join('a')), _parse)
+        cache.save()
+
+        assert not cache.enabled
+        assert not cache._files
+
+    def test_unchanged_not_written(self, files, cache_dir):
+        """The cache isn't rewritten when nothing changed."""
+        cache = _reload()
+        cache.get(six.text_type(files.join('a')), _parse)
+        cache.save()
+        os.utime(six.text_type(cache_dir.join('parsed.pickle')), (0, 0))
+
+        cache = _reload()
+        cache.get(six.text_type(files.join('a')), _parse)
+        cache.save()
+        assert cache_dir.join('parsed.pickle').mtime() == 0
+
+
+def test_glslparser_no_config(tmpdir, mocker):
+    """A cached file without a config block still raises."""
+    mocker.patch('framework.test.glsl_parser_test.CACHE', _reload())
+    p = tmpdir.join('test.frag')
+    p.write(textwrap.dedent("""\
+        #version 130
+        void main() {}
+    """))
+
+    for _ in range(2):
+        with pytest.raises(glsl_parser_test.GLSLParserNoConfigError):
+            glsl_parser_test.GLSLParserTest(six.text_type(p))
@@ -30,7 +30,7 @@ except ImportError:
     import mock
 
 import pytest
-
+import six
 
 from framework import status
 from framework.options import _Options as Options
@@ -103,6 +103,37 @@ class TestPiglitBaseTest(object):
                 {'test1': 'pass', 'test2': 'pass'}
 
 
+    class TestIsSkip(object):
+        """Tests for PiglitBaseTest.is_skip."""
+
+        @pytest.fixture(autouse=True)
+        def bin_dir(self, tmpdir, mocker):
+            mocker.patch('framework.test.piglit_test.TEST_BIN_DIR',
+                         six.text_type(tmpdir))
+            mocker.patch('framework.test.piglit_test._BIN_INDEX', {})
+            tmpdir.join('exists').write('')
+
+        def test_missing_executable(self):
+            """skips if the executable isn't in TEST_BIN_DIR."""
+            with pytest.raises(_TestIsSkip):
+                PiglitBaseTest(['missing']).is_skip()
+
+        def test_executable(self):
+            """doesn't skip if the executable is in TEST_BIN_DIR."""
+            PiglitBaseTest(['exists']).is_skip()
+
+        def test_windows_executable(self, tmpdir):
+            """doesn't skip if there is a .exe of the executable."""
+            tmpdir.join('windows.exe').write('')
+            PiglitBaseTest(['windows']).is_skip()
+
+        def test_unreadable_bin_dir(self, mocker):
+            """doesn't skip if TEST_BIN_DIR can't be listed."""
+            mocker.patch('framework.test.piglit_test.TEST_BIN_DIR',
+                         '/does/not/exist')
+            PiglitBaseTest(['missing']).is_skip()
+
+
 class TestPiglitGLTest(object):
     """tests for the PiglitGLTest class."""
 
@@ -191,6 +191,21 @@ class TestConfigParsing(object):
         assert test.glsl_version == 1.50
         assert test.gl_required == {'GL_ARB_foobar'}
 
+    def test_only_header_read(self, tmpdir):
+        """Nothing after the [require] block is read."""
+        p = tmpdir.join('test.shader_test')
+        p.write_binary(textwrap.dedent("""\
+            [require]
+            GL >= 3.3
+            GL_ARB_foobar
+
+            [vertex shader]
+            """).encode('utf-8') + b'x\n' * 65536 + b'\xff\xfe not utf-8\n')
+        test = shader_test.ShaderTest(six.text_type(p))
+
+        assert test.gl_version == 3.3
+        assert test.gl_required == {'GL_ARB_foobar'}
+
 
 class TestCommand(object):
     """Tests for the command property."""
@@ -279,3 +294,37 @@ class TestMultiShaderTest(object):
         assert os.path.basename(actual[0]) == 'shader_runner'
         assert os.path.basename(actual[1]) == 'bar.shader_test'
         assert os.path.basename(actual[2]) == '-auto'
+
+
+class TestSplitBatches(object):
+    """Tests for the split_batches function."""
+
+    def test_sizes(self):
+        """Batches are no larger than size, and differ in size by at most 1.
+        """
+        actual = shader_test.split_batches([str(i) for i in range(10)], 4)
+        assert [len(b) for b in actual] == [3, 3, 4]
+
+    def test_all_files(self):
+        """Each file is in exactly one batch, in sorted order."""
+        files = ['c', 'a', 'd', 'b', 'e']
+        actual = shader_test.split_batches(files, 2)
+        assert [f for b in actual for f in b] == sorted(files)
+
+    def test_fits(self):
+        """If all of the files fit there is one batch."""
+        assert shader_test.split_batches(['b', 'a'], 2) == [['a', 'b']]
+
+
+class TestGetBatchSize(object):
+    """Tests for the get_batch_size function."""
+
+    def test_default(self, mocker):
+        mocker.patch.dict('os.environ', clear=True)
+        mocker.patch('framework.test.shader_test.PIGLIT_CONFIG.safe_get',
+                     return_value=None)
+        assert shader_test.get_batch_size() == shader_test.DEFAULT_BATCH_SIZE
+
+    def test_env(self, mocker):
+        mocker.patch.dict('os.environ', {'PIGLIT_SHADER_BATCH_SIZE': '7'})
+        assert shader_test.get_batch_size() == 7
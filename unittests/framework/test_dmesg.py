@@ -29,6 +29,7 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
 import collections
+import errno
 import re
 try:
     import mock
@@ -45,7 +46,7 @@ from framework import exceptions
 
 from . import skip
 
-# pylint: disable=invalid-name,no-self-use
+# pylint: disable=invalid-name,no-self-use,redefined-outer-name
 
 
 class _DmesgTester(dmesg.BaseDmesg):
@@ -311,6 +312,156 @@ class TestLinuxDmesg(object):
             assert repr(dmesg.LinuxDmesg()) == 'LinuxDmesg()'
 
 
+@pytest.fixture
+def kmsg(mocker):
+    """Make /dev/kmsg return the records in the returned list, then EAGAIN."""
+    records = []
+
+    def read(*_):
+        if records:
+            record = records.pop(0)
+            if isinstance(record, Exception):
+                raise record
+            return record
+        raise OSError(errno.EAGAIN, 'Resource temporarily unavailable')
+
+    mocker.patch('framework.dmesg.os.open', return_value=3)
+    mocker.patch('framework.dmesg.os.lseek')
+    mocker.patch('framework.dmesg.os.read', side_effect=read)
+    return records
+
+
+class TestLinuxKmsgDmesg(object):
+    """Tests for LinuxKmsgDmesg methods."""
+
+    def test_update_result(self, kmsg):
+        """dmesg.LinuxKmsgDmesg.update_result: records new messages."""
+        test = dmesg.LinuxKmsgDmesg()
+        kmsg.extend([b'3,10,2500000,-;drm: error\n SUBSYSTEM=drm\n',
+                     b'4,11,2600000,-;warning\n'])
+        result = results.TestResult(status.PASS)
+        test.update_result(result)
+
+        assert result.result is status.DMESG_WARN
+        assert result.dmesg == \
+            '[    2.500000] drm: error\n[    2.600000] warning'
+
+    def test_level(self, kmsg):
+        """dmesg.LinuxKmsgDmesg.update_dmesg: ignores info and debug."""
+        test = dmesg.LinuxKmsgDmesg()
+        kmsg.extend([b'6,10,1,-;info\n', b'15,11,1,-;user debug\n'])
+        test.update_dmesg()
+
+        assert test._new_messages == []
+
+    def test_wrap(self, kmsg):
+        """dmesg.LinuxKmsgDmesg.update_dmesg: continues after lost records."""
+        test = dmesg.LinuxKmsgDmesg()
+        kmsg.extend([OSError(errno.EPIPE, 'Broken pipe'),
+                     b'3,20,1000000,-;after wrap\n'])
+        test.update_dmesg()
+
+        assert test._new_messages == ['[    1.000000] after wrap']
+
+    def test_no_change(self, kmsg):  # pylint: disable=unused-argument
+        """dmesg.LinuxKmsgDmesg.update_result: no new records, no change."""
+        result = results.TestResult('pass')
+        result.dmesg = mock.sentinel.dmesg
+        dmesg.LinuxKmsgDmesg().update_result(result)
+
+        assert result.dmesg is mock.sentinel.dmesg
+
+    def test_repr(self, kmsg):  # pylint: disable=unused-argument
+        assert repr(dmesg.LinuxKmsgDmesg()) == 'LinuxKmsgDmesg()'
+
+    class TestConcurrent(object):
+        """Tests for attributing records to tests running at the same time."""
+
+        def test_single(self, kmsg):
+            """dmesg.LinuxKmsgDmesg.end: only records in the window."""
+            test = dmesg.LinuxKmsgDmesg()
+            kmsg.append(b'3,1,1000000,-;before\n')
+            result = results.TestResult(status.PASS)
+            window = test.begin(result)
+            kmsg.append(b'3,2,2000000,-;during\n')
+            test.end(window, result)
+
+            assert result.result is status.DMESG_WARN
+            assert result.dmesg == '[    2.000000] during'
+
+        def test_overlap(self, kmsg):
+            """dmesg.LinuxKmsgDmesg.end: overlapping records are ambiguous."""
+            test = dmesg.LinuxKmsgDmesg()
+            first = results.TestResult(status.PASS)
+            second = results.TestResult(status.PASS)
+
+            w1 = test.begin(first)
+            kmsg.append(b'3,1,1000000,-;only first\n')
+            w2 = test.begin(second)
+            kmsg.append(b'3,2,2000000,-;both\n')
+            test.end(w1, first)
+            kmsg.append(b'3,3,3000000,-;only second\n')
+            test.end(w2, second)
+
+            assert first.dmesg.splitlines() == [
+                '[    1.000000] only first',
+                '[    2.000000] both (ambiguous: 2 tests were running)']
+            assert second.dmesg.splitlines() == [
+                '[    2.000000] both (ambiguous: 2 tests were running)',
+                '[    3.000000] only second']
+
+        def test_caller(self, kmsg):
+            """dmesg.LinuxKmsgDmesg.end: the caller pid picks the test."""
+            test = dmesg.LinuxKmsgDmesg()
+            first = results.TestResult(status.PASS)
+            second = results.TestResult(status.PASS)
+            second.pid.append(1234)
+
+            w1 = test.begin(first)
+            w2 = test.begin(second)
+            kmsg.append(b'3,1,1000000,-,caller=T1234;oops\n')
+            test.end(w1, first)
+            test.end(w2, second)
+
+            assert first.result is status.PASS
+            assert second.dmesg == '[    1.000000] oops'
+
+        def test_comm(self, kmsg):
+            """dmesg.LinuxKmsgDmesg.end: a comm in the message picks the test.
+            """
+            test = dmesg.LinuxKmsgDmesg()
+            first = results.TestResult(status.PASS)
+            first.command = '/usr/bin/foo -auto'
+            second = results.TestResult(status.PASS)
+            second.command = '/usr/bin/bar -auto'
+
+            w1 = test.begin(first)
+            w2 = test.begin(second)
+            kmsg.append(b'3,1,1000000,-;GPU HANG: in bar [99]\n')
+            test.end(w1, first)
+            test.end(w2, second)
+
+            assert first.result is status.PASS
+            assert second.result is status.DMESG_WARN
+
+        def test_prune(self, kmsg):
+            """dmesg.LinuxKmsgDmesg.end: forgets records once all tests end.
+            """
+            test = dmesg.LinuxKmsgDmesg()
+            first = results.TestResult(status.PASS)
+            second = results.TestResult(status.PASS)
+
+            w1 = test.begin(first)
+            w2 = test.begin(second)
+            kmsg.append(b'3,1,1000000,-;both\n')
+            test.end(w2, second)
+            assert test._records
+            test.end(w1, first)
+
+            assert test._records == []
+            assert test._windows == {}
+
+
 class TestDummyDmesg(object):
     """Tests for the DummyDmesg class."""
     _Namespace = collections.namedtuple('_Namespace', ['dmesg', 'result'])
@@ -364,6 +515,8 @@ class TestGetDmesg(object):
         platforms with various configurations.
         """
         mocker.patch('framework.dmesg.sys.platform', platform)
+        mocker.patch('framework.dmesg.LinuxKmsgDmesg.__init__',
+                     side_effect=OSError(errno.EACCES, 'Permission denied'))
 
         with mock.patch('framework.dmesg.subprocess.check_output',
                         mock.Mock(return_value=b'[1.0]foo')):
@@ -372,3 +525,14 @@ class TestGetDmesg(object):
         # We don't want a subclass, we want the *exact* class. This is a
         # unittest after all
         assert type(actual) == expected  # pylint: disable=unidiomatic-typecheck
+
+    @skip.linux
+    def test_get_dmesg_kmsg(self, mocker):
+        """dmesg.get_dmesg: uses /dev/kmsg when it can be read."""
+        mocker.patch('framework.dmesg.sys.platform', 'linux')
+        mocker.patch('framework.dmesg.os.open', return_value=3)
+        mocker.patch('framework.dmesg.os.lseek')
+        mocker.patch('framework.dmesg.os.read',
+                     side_effect=OSError(errno.EAGAIN, 'again'))
+
+        assert type(dmesg.get_dmesg()) == dmesg.LinuxKmsgDmesg  # pylint: disable=unidiomatic-typecheck
@@ -0,0 +1,191 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for the history database."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+
+import pytest
+import six
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from framework import history, results
+
+# pylint: disable=no-self-use,redefined-outer-name
+
+
+def _make_run(name, start, tests):
+    run = results.TestrunResult()
+    run.name = name
+    run.time_elapsed.start = start
+    for test, stat in six.iteritems(tests):
+        run.tests[test] = results.TestResult(stat)
+        run.tests[test].time.end = 2.0
+    return run
+
+
+@pytest.fixture
+def db():
+    """A History with a handful of runs ingested."""
+    inst = history.History()
+    inst.ingest(_make_run('1', 1, {'a@b': 'pass', 'a@c': 'pass'}))
+    inst.ingest(_make_run('2', 2, {'a@b': 'fail', 'a@c': 'pass'}))
+    inst.ingest(_make_run('3', 3, {'a@b': 'fail'}))
+    inst.ingest(_make_run('4', 4, {'a@b': 'fail', 'a@d': 'pass'}))
+    return inst
+
+
+class TestTimeline(object):
+    """Tests for the Timeline class."""
+
+    def test_run_length_encoded(self):
+        """history.Timeline.append: repeated statuses are encoded once."""
+        timeline = history.Timeline()
+        for stat in ['pass', 'pass', 'fail', 'pass', 'pass', 'pass']:
+            timeline.append(stat)
+        assert timeline.statuses == [['pass', 2], ['fail', 1], ['pass', 3]]
+
+    def test_first_bad(self):
+        """history.Timeline.first_bad: start of the current failure streak."""
+        timeline = history.Timeline(3)
+        for stat in ['fail', 'pass', 'fail', 'skip', 'notrun', 'crash']:
+            timeline.append(stat)
+        assert timeline.first_bad == 5
+
+    def test_first_bad_passing(self):
+        """history.Timeline.first_bad: None when the test passes."""
+        timeline = history.Timeline()
+        for stat in ['fail', 'pass']:
+            timeline.append(stat)
+        assert timeline.first_bad is None
+
+    def test_flips(self):
+        """history.Timeline.flips: skip and notrun are ignored."""
+        timeline = history.Timeline()
+        for stat in ['pass', 'skip', 'fail', 'notrun', 'fail', 'pass']:
+            timeline.append(stat)
+        assert timeline.flips == (2, 3)
+
+
+class TestHistory(object):
+    """Tests for the History class."""
+
+    def test_missing_notrun(self, db):
+        """history.History.ingest: missing tests are recorded as notrun."""
+        assert db.tests['a@c'].statuses == [['pass', 2], ['notrun', 2]]
+
+    def test_new_test_start(self, db):
+        """history.History.ingest: new tests start at the current run."""
+        assert db.tests['a@d'].start == 3
+
+    def test_contains(self, db):
+        """history.History: already ingested runs are detected."""
+        assert _make_run('2', 2, {}) in db
+
+    def test_query(self, db):
+        """history.History.query: returns a row per test in a group."""
+        rows = db.query(['a'])
+        assert [r.name for r in rows] == ['a@b', 'a@c', 'a@d']
+        assert rows[0].first_bad == '2'
+        assert rows[0].average_time == 2.0
+
+    def test_query_group(self, db):
+        """history.History.query: group rows aggregate the tests."""
+        row = db.query(['a'], group=True)[0]
+        assert row.tests == 3
+        assert row.flip_rate == 0.25
+
+    @pytest.mark.parametrize('mode', ['none', 'gz'])
+    def test_roundtrip(self, tmpdir, mocker, mode):
+        """history.History: runs ingested on disk are loaded back."""
+        mocker.patch('framework.history.compression.get_mode',
+                     return_value=mode)
+        mocker.patch('framework.history.COMPACT_AFTER', 2)
+        path = six.text_type(tmpdir.join('x'))
+        db = history.History.load(path)
+        db.ingest(_make_run('1', 1, {'a@b': 'pass', 'a@c': 'pass'}))
+        db.ingest(_make_run('2', 2, {'a@b': 'fail'}))
+        db.ingest(_make_run('3', 3, {'a@b': 'fail', 'a@d': 'pass'}))
+
+        test = history.History.load(path)
+        assert test.runs == db.runs
+        assert test.tests['a@b'].statuses == [['pass', 1], ['fail', 2]]
+        assert test.tests['a@c'].statuses == [['pass', 1], ['notrun', 2]]
+        assert test.tests['a@d'].start == 2
+
+    def test_load_index_only(self, tmpdir, mocker):
+        """history.History.load: only the index is read."""
+        mocker.patch('framework.history.COMPACT_AFTER', 1)
+        path = six.text_type(tmpdir)
+        history.History.load(path).ingest(_make_run('1', 1, {'a': 'pass'}))
+        # Reading the checkpoint would raise a KeyError
+        mocker.patch.dict('framework.history.compression.DECOMPRESSORS',
+                          clear=True)
+
+        db = history.History.load(path)
+        assert _make_run('1', 1, {}) in db
+
+    def test_segments_changes_only(self, tmpdir):
+        """history.History.ingest: segments only have the changed statuses."""
+        path = tmpdir.join('db')
+        db = history.History.load(six.text_type(path))
+        db.ingest(_make_run('1', 1, {'a': 'pass', 'b': 'pass'}))
+        db.ingest(_make_run('2', 2, {'a': 'pass', 'b': 'fail'}))
+        db.ingest(_make_run('3', 3, {'a': 'pass'}))
+
+        segments = [json.loads(l) for l in
+                    path.join('segments.jsonl').readlines()]
+        assert [s['statuses'] for s in segments] == [
+            {'a': 'pass', 'b': 'pass'}, {'b': 'fail'}, {'b': 'notrun'}]
+        assert segments[2]['time'] == {'a': 2.0}
+
+    def test_compact(self, tmpdir, mocker):
+        """history.History: timelines survive being checkpointed."""
+        mocker.patch('framework.history.COMPACT_AFTER', 2)
+        path = tmpdir.join('db')
+        db = history.History.load(six.text_type(path))
+        for i, stat in enumerate(['pass', 'fail', 'fail']):
+            db.ingest(_make_run(str(i), i, {'a': stat}))
+
+        assert len(path.join('segments.jsonl').readlines()) == 1
+        test = history.History.load(six.text_type(path))
+        assert test.tests['a'].statuses == [['pass', 1], ['fail', 2]]
+        assert test.tests['a'].timed == 3
+
+    def test_ingest_append_only(self, tmpdir):
+        """history.History.ingest: earlier lines are not rewritten."""
+        path = tmpdir.join('db')
+        history.History.load(six.text_type(path)).ingest(
+            _make_run('1', 1, {'a': 'pass'}))
+        before = dict((n, path.join(n).read_binary())
+                      for n in ['index.jsonl', 'segments.jsonl'])
+
+        db = history.History.load(six.text_type(path))
+        db.ingest(_make_run('2', 2, {'a': 'fail'}))
+        for name, contents in six.iteritems(before):
+            assert path.join(name).read_binary().startswith(contents)
+        assert len(path.join('index.jsonl').readlines()) == 3
@@ -26,6 +26,10 @@ from __future__ import (
 import collections
 import sys
 import threading
+try:
+    import simplejson as json
+except ImportError:
+    import json
 
 import pytest
 import six
@@ -52,6 +56,7 @@ class TestLogFactory(object):
             """Returns a BaseLog derived instance."""
             logger = log.LogManager('quiet', 100)
             log_inst = logger.get()
+            logger.close()
             assert isinstance(log_inst, log.BaseLog)
 
     def test_log_state_update(self):
@@ -60,6 +65,7 @@ class TestLogFactory(object):
         log_inst = logger.get()
         log_inst.start(None)
         log_inst.log('pass')
+        logger.close()
 
         assert logger._state['total'] == 100
         assert logger._state['summary'] == {'pass': 1}
@@ -197,3 +203,182 @@ class TestDummyLog(object):
 
             actual = sys.stdout.read()
             assert actual == b''
+
+
+class TestRenderer(object):
+    """Tests for the _Renderer class."""
+
+    @pytest.fixture(autouse=True, scope='function')
+    def mock_stdout(self, mocker):
+        mocker.patch.object(sys, 'stdout', six.StringIO())
+
+    @pytest.fixture
+    def renderer(self, log_state):  # pylint: disable=redefined-outer-name
+        """Add a renderer that never wakes up on its own to the state."""
+        lock = threading.Lock()
+        log_state['renderer'] = log._Renderer(lock, rate=0.001)
+        log_state['renderer'].start()
+        return log_state, lock
+
+    def test_log_no_output(self, renderer):  # pylint: disable=redefined-outer-name
+        """log.QuietLog.log: doesn't print when there is a renderer."""
+        quiet = log.QuietLog(*renderer)
+        quiet.start(None)
+        quiet.log('pass')
+        sys.stdout.seek(0)
+
+        assert sys.stdout.read() == ''
+        assert renderer[0]['complete'] == 1
+
+    def test_summary_flushes(self, renderer):  # pylint: disable=redefined-outer-name
+        """log.QuietLog.summary: prints the pending status and the summary."""
+        quiet = log.QuietLog(*renderer)
+        quiet.start(None)
+        quiet.log('pass')
+        quiet.summary()
+        sys.stdout.seek(0)
+
+        assert '[1/1] pass: 1 ' in sys.stdout.read()
+        assert not renderer[0]['renderer'].is_alive()
+
+    def test_verbose_order(self, renderer):  # pylint: disable=redefined-outer-name
+        """log.VerboseLog: queued lines are printed in order."""
+        state, lock = renderer
+        state['total'] = 2
+        for name in ['foo', 'bar']:
+            verbose = log.VerboseLog(state, lock)
+            verbose.start(name)
+            verbose.log('pass')
+        state['renderer'].stop()
+        sys.stdout.seek(0)
+
+        lines = [l.strip() for l in sys.stdout.read().split('\n') if l]
+        assert lines[:4] == ['running: foo', 'pass: foo', 'running: bar',
+                             'pass: bar']
+
+    def test_rate_limited(self, renderer):  # pylint: disable=redefined-outer-name
+        """log._Renderer: only draws the status line once per frame."""
+        state, lock = renderer
+        state['total'] = 50
+        for _ in range(50):
+            quiet = log.QuietLog(state, lock)
+            quiet.start(None)
+            quiet.log('pass')
+        state['renderer'].stop()
+        sys.stdout.seek(0)
+
+        assert sys.stdout.read().count('[') == 1
+
+
+def test_log_manager_record():
+    """log.LogManager.record: counts tests without a log instance."""
+    logger = log.LogManager('dummy', 10)
+    logger.record('skip', 4)
+
+    assert logger._state['complete'] == 4
+    assert logger._state['summary'] == {'skip': 4}
+
+
+class TestHTTPLog(object):
+    """Tests for the HTTPLog class and its server."""
+
+    @pytest.fixture
+    def manager(self, mocker):
+        """Create a LogManager with an http server on a free port."""
+        mocker.patch('framework.log.PIGLIT_CONFIG.safe_get', return_value=0)
+        logger = log.LogManager('http', 2)
+        yield logger
+        logger.log_server.stop()
+
+    @staticmethod
+    def get(manager, path, headers=None):  # pylint: disable=redefined-outer-name
+        req = six.moves.urllib.request.Request(
+            'http://localhost:{}{}'.format(manager.log_server.port, path),
+            headers=headers or {})
+        return six.moves.urllib.request.urlopen(req, timeout=10).read().decode(
+            'utf-8')
+
+    def test_summary(self, manager):  # pylint: disable=redefined-outer-name
+        """log.HTTPLogServer: /summary has the counts."""
+        inst = manager.get()
+        inst.start('foo')
+        inst.log('pass')
+
+        actual = json.loads(self.get(manager, '/summary'))
+        assert actual == {'complete': 1, 'running': [], 'total': 2,
+                          'results': {'pass': 1}}
+
+    def test_running(self, manager):  # pylint: disable=redefined-outer-name
+        """log.HTTPLogServer: /running lists the running tests."""
+        manager.get().start('foo')
+
+        actual = json.loads(self.get(manager, '/running'))
+        assert [r['name'] for r in actual] == ['foo']
+        assert actual[0]['elapsed'] >= 0
+
+    def test_metrics(self, manager):  # pylint: disable=redefined-outer-name
+        """log.HTTPLogServer: /metrics has the counters and durations."""
+        inst = manager.get()
+        inst.start('foo')
+        inst.log('fail')
+        manager.get().start('bar')
+
+        actual = self.get(manager, '/metrics').splitlines()
+        assert 'piglit_tests_total 2' in actual
+        assert 'piglit_tests_complete 1' in actual
+        assert 'piglit_tests_running 1' in actual
+        assert 'piglit_test_results{status="fail"} 1' in actual
+        assert 'piglit_test_duration_seconds_count 1' in actual
+        assert 'piglit_test_duration_seconds_bucket{le="+Inf"} 1' in actual
+
+    def test_events(self, manager):  # pylint: disable=redefined-outer-name
+        """log.HTTPLogServer: /events streams every start and result."""
+        first = manager.get()
+        first.start('foo')
+        first.log('pass')
+
+        # Resume after the first event, and let the run finish
+        second = manager.get()
+        second.start('bar')
+        second.log('skip')
+        actual = self.get(manager, '/events', {'Last-Event-ID': '0'})
+
+        events = [json.loads(l[len('data: '):]) for l in actual.splitlines()
+                  if l.startswith('data: ')]
+        assert [e['name'] for e in events] == ['foo', 'bar', 'bar']
+        assert events[-1]['status'] == 'skip'
+        assert 'event: result' in actual
+
+    def test_stops_after_final_summary(self, manager):  # pylint: disable=redefined-outer-name
+        """log.HTTPLogServer: stops once the final summary is served."""
+        for name in ['foo', 'bar']:
+            inst = manager.get()
+            inst.start(name)
+            inst.log('pass')
+        self.get(manager, '/summary')
+
+        manager.log_server.join(10)
+        assert not manager.log_server.is_alive()
+
+    def test_close_unfinished(self, manager):  # pylint: disable=redefined-outer-name
+        """log.LogManager.close: stops the server if the run didn't finish."""
+        inst = manager.get()
+        inst.start('foo')
+        inst.log('pass')
+        manager.close()
+
+        assert not manager.log_server.is_alive()
+
+
+def test_histogram():
+    """log._Histogram: buckets are cumulative, and include their bound."""
+    hist = log._Histogram()
+    for value in [0.005, 0.01, 0.2, 1000]:
+        hist.observe(value)
+    buckets = dict(hist.buckets())
+
+    assert buckets[0.01] == 2
+    assert buckets[0.25] == 3
+    assert buckets[300.0] == 3
+    assert buckets[float('inf')] == 4
+    assert hist.sum == 1000.215
@@ -0,0 +1,114 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for merging results."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+import six
+
+from framework import merge, results, status
+
+# pylint: disable=no-self-use
+
+
+def _make_run(name, start, end, tests):
+    run = results.TestrunResult()
+    run.name = name
+    run.time_elapsed.start = start
+    run.time_elapsed.end = end
+    run.uname = name
+    for test, (stat, finished) in six.iteritems(tests):
+        run.tests[test] = results.TestResult(stat)
+        run.tests[test].time.end = finished
+    run.calculate_group_totals()
+    return run
+
+
+def _merge(policy):
+    merger = merge.Merger(policy)
+    merger.add(_make_run('a', 5, 10, {'g@a': ('pass', 1), 'g@b': ('fail', 2),
+                                      'g@c': ('skip', 3)}))
+    merger.add(_make_run('b', 2, 8, {'g@b': ('pass', 1), 'g@c': ('fail', 2),
+                                     'g@d': ('crash', 3)}))
+    return merger
+
+
+class TestMerger(object):
+    """Tests for the Merger class."""
+
+    @pytest.mark.parametrize('policy,expected', [
+        ('worst', {'g@b': 'fail', 'g@c': 'fail'}),
+        ('best', {'g@b': 'pass', 'g@c': 'fail'}),
+        ('latest', {'g@b': 'fail', 'g@c': 'skip'}),
+    ])
+    def test_policy(self, policy, expected):
+        """merge.Merger: duplicate tests are resolved by the policy."""
+        result = _merge(policy).finalize()
+        for name, stat in six.iteritems(expected):
+            assert result.tests[name].result == stat
+
+    def test_conflicts(self):
+        """merge.Merger: duplicate tests are counted."""
+        assert _merge('worst').conflicts == 2
+
+    def test_tests(self):
+        """merge.Merger: tests from every result are included."""
+        assert sorted(_merge('worst').finalize().tests) == \
+            ['g@a', 'g@b', 'g@c', 'g@d']
+
+    def test_time_elapsed(self):
+        """merge.Merger: time_elapsed covers all of the results."""
+        result = _merge('worst').finalize()
+        assert (result.time_elapsed.start, result.time_elapsed.end) == (2, 10)
+
+    def test_totals(self):
+        """merge.Merger: totals are recomputed."""
+        totals = _merge('worst').finalize().totals['root']
+        assert totals['pass'] == 1
+        assert totals['fail'] == 2
+        assert totals['crash'] == 1
+
+    def test_metadata(self):
+        """merge.Merger: metadata is taken from the first result."""
+        result = _merge('worst').finalize('name')
+        assert result.uname == 'a'
+        assert result.name == 'name'
+
+
+def test_merge_order():
+    """merge.merge: results are merged in the order given."""
+    runs = {
+        'a': _make_run('a', 0, 1, {'t': ('pass', 1)}),
+        'b': _make_run('b', 0, 1, {'t': ('fail', 1)}),
+        'c': _make_run('c', 0, 1, {'t': ('warn', 1)}),
+    }
+    with mock.patch('framework.merge.backends.load', runs.get):
+        result = merge.merge(['a', 'b', 'c'], 'latest', jobs=2).finalize()
+    assert result.tests['t'].result is status.WARN
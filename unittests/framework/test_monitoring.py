@@ -26,6 +26,7 @@ This provides tests for the framework.monitoring modules.
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import os
 
 import pytest
 import six
@@ -34,7 +35,7 @@ from framework import exceptions
 from framework import monitoring
 from . import skip
 
-# pylint: disable=no-self-use,attribute-defined-outside-init
+# pylint: disable=no-self-use,attribute-defined-outside-init,protected-access
 
 
 class TestMonitoring(object):
@@ -176,3 +177,133 @@ class TestMonitoring(object):
         self.monitoring.check_monitoring()
 
         assert self.monitoring.abort_needed is False
+
+
+@skip.posix
+class TestFileSource(object):
+    """Tests for the _FileSource class."""
+
+    @pytest.fixture
+    def source(self, tmpdir):
+        p = tmpdir.join('log')
+        p.write('old\n')
+        source = monitoring._FileSource(six.text_type(p))
+        source.add_pattern('.*')
+        source.update()
+        return p, source
+
+    def test_first_read(self, source):
+        """monitoring._FileSource.update: the first read has every line."""
+        assert source[1].lines == ['old']
+
+    def test_append(self, source):
+        """monitoring._FileSource.update: only reads appended lines."""
+        p, source = source
+        p.write('new\n', mode='a')
+        source.update()
+        assert source.lines == ['new']
+
+        source.update()
+        assert source.lines == []
+
+    def test_truncate(self, source):
+        """monitoring._FileSource.update: rereads a truncated file."""
+        p, source = source
+        p.write('n\n')
+        source.update()
+        assert source.lines == ['n']
+
+    def test_rewrite(self, source):
+        """monitoring._FileSource.update: rereads a rewritten file."""
+        p, source = source
+        p.write('new\n')
+        source.update()
+        assert source.lines == ['new']
+
+    def test_rotate(self, source):
+        """monitoring._FileSource.update: finishes the old file on rotation.
+        """
+        p, source = source
+        p.write('last\n', mode='a')
+        p.rename(p.dirpath().join('log.1'))
+        p.write('first\n')
+        source.update()
+        assert source.lines == ['last', 'first']
+
+    def test_partial(self, source):
+        """monitoring._FileSource.update: reports partial lines once."""
+        p, source = source
+        p.write('par', mode='a')
+        source.update()
+        assert source.lines == ['par']
+
+        source.update()
+        assert source.lines == []
+
+        p.write('tial\n', mode='a')
+        source.update()
+        assert source.lines == ['partial']
+
+    def test_missing(self, tmpdir):
+        """monitoring._FileSource.update: reads a file once it exists."""
+        p = tmpdir.join('log')
+        source = monitoring._FileSource(six.text_type(p))
+        source.update()
+        assert source.lines == []
+
+        p.write('new\n')
+        source.update()
+        assert source.lines == ['new']
+
+    def test_matching(self, tmpdir):
+        """monitoring._FileSource.update: matching has lines any rule wants.
+        """
+        p = tmpdir.join('log')
+        p.write('')
+        source = monitoring._FileSource(six.text_type(p))
+        source.add_pattern('foo')
+        source.add_pattern('bar')
+        source.update()
+
+        p.write('foo\nbaz\nbar\n')
+        source.update()
+        assert source.matching == ['foo', 'bar']
+
+
+@skip.posix
+def test_monitoring_shared_source(tmpdir):
+    """monitoring.Monitoring: rules for one file share one reader."""
+    p = tmpdir.join('log')
+    p.write('')
+    monitor = monitoring.Monitoring(False)
+    monitor.add_rule('foo', 'file', six.text_type(p), 'foo')
+    monitor.add_rule('bar', 'file', six.text_type(p), 'bar')
+    monitor.update_monitoring()
+
+    p.write('bar\n', mode='a')
+    monitor.check_monitoring()
+
+    assert monitor.error_message == 'From the rule bar:\nbar'
+    assert len(monitor._sources) == 1
+
+    monitor.delete_rule('foo')
+    monitor.delete_rule('bar')
+    assert monitor._sources == {}
+
+
+@skip.linux
+def test_monitoring_close(tmpdir):
+    """monitoring.Monitoring.close: closes the files and inotify descriptors
+    of the rules.
+    """
+    p = tmpdir.join('log')
+    p.write('foo\n')
+    before = set(os.listdir('/proc/self/fd'))
+    monitor = monitoring.Monitoring(False)
+    monitor.add_rule('foo', 'file', six.text_type(p), 'bar')
+    # This opens the file, and watches it with inotify
+    monitor.update_monitoring()
+    assert set(os.listdir('/proc/self/fd')) > before
+
+    monitor.close()
+    assert set(os.listdir('/proc/self/fd')) <= before
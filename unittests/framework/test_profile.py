@@ -23,6 +23,15 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals
 )
+import contextlib
+import functools
+import re
+import sys
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 import pytest
 import six
@@ -30,6 +39,7 @@ import six
 from framework import exceptions
 from framework import grouptools
 from framework import profile
+from framework.test.base import TestIsSkip
 from framework.test.gleantest import GleanTest
 from . import utils
 
@@ -67,6 +77,70 @@ class TestLoadTestProfile(object):
         assert isinstance(profile.load_test_profile('sanity'),
                           profile.TestProfile)
 
+    def test_load_filters(self, mocker):
+        """The filters are only given to the module being loaded."""
+        seen = {}
+
+        def import_module(name):
+            seen['loaded'] = profile.load_filters(name)
+            seen['other'] = profile.load_filters('tests.other')
+            return mocker.Mock()
+
+        mocker.patch('framework.profile.importlib.import_module',
+                     import_module)
+        filters = [lambda n, _: True]
+        profile.load_test_profile('foo', filters)
+
+        assert seen == {'loaded': filters, 'other': []}
+        assert profile.load_filters('tests.foo') == []
+
+    def test_share_filters(self, mocker):
+        """A module can pass its filters on to the module it imports."""
+        seen = {}
+
+        def import_module(name):
+            profile.share_filters(name, 'tests.bar')
+            seen['bar'] = profile.load_filters('tests.bar')
+            sys.modules['tests.bar'] = mocker.Mock()
+            return mocker.Mock()
+
+        mocker.patch('framework.profile.importlib.import_module',
+                     import_module)
+        mocker.patch.dict(sys.modules)
+        sys.modules.pop('tests.bar', None)
+        filters = [lambda n, _: True]
+        profile.load_test_profile('foo', filters)
+
+        assert seen == {'bar': filters}
+        assert profile.load_filters('tests.bar') == []
+        assert 'tests.bar' not in sys.modules
+
+    def test_share_filters_imported(self, mocker):
+        """Filters aren't shared with a module that is already imported."""
+        seen = {}
+
+        def import_module(name):
+            profile.share_filters(name, 'tests.bar')
+            seen['bar'] = profile.load_filters('tests.bar')
+            return mocker.Mock()
+
+        mocker.patch('framework.profile.importlib.import_module',
+                     import_module)
+        mocker.patch.dict(sys.modules, {'tests.bar': mocker.Mock()})
+        profile.load_test_profile('foo', [lambda n, _: True])
+
+        assert seen == {'bar': []}
+        assert 'tests.bar' in sys.modules
+
+    def test_filtered_not_reused(self):
+        """A module loaded with filters isn't kept for the next import."""
+        sys.modules.pop('tests.sanity', None)
+        profile.load_test_profile('sanity', [lambda n, _: True])
+        assert 'tests.sanity' not in sys.modules
+
+        profile.load_test_profile('sanity')
+        assert 'tests.sanity' in sys.modules
+
 
 class TestTestProfile(object):
     """Tests for profile.TestProfile."""
@@ -266,6 +340,91 @@ class TestTestDict(object):
 
             assert grouptools.join('foo', 'abc') in inst
 
+    class TestOverlay(object):
+        """Tests for a TestDict created with a base."""
+
+        @pytest.fixture
+        def base(self):
+            base = profile.TestDict()
+            for name in ['a', 'b', 'c']:
+                base[name] = utils.Test([name])
+            return base
+
+        @pytest.fixture
+        def inst(self, base):
+            return profile.TestDict(base=base)
+
+        def test_unchanged(self, inst):
+            """With no changes the overlay has the same contents as base."""
+            assert list(inst) == ['a', 'b', 'c']
+            assert len(inst) == 3
+            assert inst['B'].command == ['b']
+
+        def test_add(self, base, inst):
+            """New tests are added after the base, base is not modified."""
+            inst['d'] = utils.Test(['d'])
+            assert list(inst) == ['a', 'b', 'c', 'd']
+            assert len(inst) == 4
+            assert 'd' not in base
+
+        def test_delete(self, base, inst):
+            """Deleting a test hides it without removing it from base."""
+            del inst['b']
+            assert list(inst) == ['a', 'c']
+            assert len(inst) == 2
+            assert 'b' not in inst
+            assert 'b' in base
+
+        def test_delete_missing(self, inst):
+            """Deleting a test twice raises a KeyError."""
+            del inst['b']
+            with pytest.raises(KeyError):
+                del inst['b']
+
+        def test_reassignment(self, base, inst):
+            """Reassigning a test keeps its place and doesn't change base."""
+            with inst.allow_reassignment:
+                inst['b'] = utils.Test(['x'])
+            assert list(inst) == ['a', 'b', 'c']
+            assert inst['b'].command == ['x']
+            assert base['b'].command == ['b']
+
+        def test_reassignment_not_allowed(self, inst):
+            """Tests in base can't be reassigned without allow_reassignment."""
+            with pytest.raises(exceptions.PiglitFatalError):
+                inst['b'] = utils.Test(['x'])
+
+        def test_delete_from_base(self, base, inst):
+            """len() agrees with iterating when base drops a deleted test."""
+            del inst['b']
+            del base['b']
+            assert list(inst) == ['a', 'c']
+            assert len(inst) == 2
+
+        def test_readd(self, inst):
+            """A deleted test that is added again goes to the end."""
+            del inst['a']
+            inst['a'] = utils.Test(['x'])
+            assert list(inst) == ['b', 'c', 'a']
+            assert len(inst) == 3
+
+        def test_items(self, inst):
+            """items() agrees with iterating and looking up each test."""
+            del inst['a']
+            inst['d'] = utils.Test(['d'])
+            with inst.allow_reassignment:
+                inst['c'] = utils.Test(['x'])
+            assert list(six.iteritems(inst)) == [(k, inst[k]) for k in inst]
+
+        def test_stacked(self, base, inst):
+            """An overlay can be used as the base of another overlay."""
+            del inst['a']
+            new = profile.TestDict(base=inst)
+            new['d'] = utils.Test(['d'])
+            assert list(new) == ['b', 'c', 'd']
+            assert list(inst) == ['b', 'c']
+            assert list(base) == ['a', 'b', 'c']
+
 
 class TestRegexFilter(object):
     """Tests for the RegexFilter class."""
@@ -305,3 +464,124 @@ class TestRegexFilter(object):
             """Returns False when the test matches any regex."""
             test = profile.RegexFilter([r'fob', r'bar'], inverse=True)
             assert test('foobob', None)
+
+
+    class TestCombined(object):
+        """The combined regexes match the same names as the separate ones."""
+
+        _NAMES = ['spec@arb_foo@bar', 'spec@arb_foobar', 'spec@glsl-1.10@x',
+                  'spec@glsl-1x10@x', 'spec@ARB_baz', 'aab', 'shaders@ab',
+                  'glean@fbo']
+
+        @pytest.mark.parametrize('filters', [
+            ['spec@arb_foo', 'spec@arb_foobar', 'glean'],
+            ['spec@glsl-1.10', 'spec@arb_(foo|baz)'],
+            ['SPEC@arb_baz', 'a*b', 'sp?ec@arb_foo@'],
+            [r'(a)\1', 'shaders@a{1}b', '^glean'],
+            ['(?i)fbo', 'spec@glsl-1[.]10'],
+            ['', 'foo'],
+        ])
+        def test_same(self, filters):
+            """Matches the names each regex matches on its own."""
+            expected = [n for n in self._NAMES
+                        if any(re.search(f, n, flags=re.IGNORECASE)
+                               for f in filters)]
+            test = profile.RegexFilter(filters)
+            assert [n for n in self._NAMES if test(n, None)] == expected
+
+class TestResolveSkips(object):
+    """Tests for the _resolve_skips function."""
+
+    class _Skip(utils.Test):
+        def is_skip(self):
+            raise TestIsSkip('skipped')
+
+    @pytest.fixture
+    def resolved(self):
+        prof = profile.TestProfile()
+        tests = [('a', self._Skip(['a'])), ('b', utils.Test(['b'])),
+                 ('c', self._Skip(['c']))]
+        backend = mock.Mock()
+        log = mock.Mock()
+        remaining = profile._resolve_skips(
+            [(prof, tests)], log, profile._Writer(backend, [tests]))
+        return remaining, backend, log
+
+    def test_remaining(self, resolved):
+        """Only the tests that don't skip are returned."""
+        remaining, _, _ = resolved
+        assert [n for n, _ in remaining[0][1]] == ['b']
+
+    def test_single_write(self, resolved):
+        """The skips are written with a single backend call."""
+        _, backend, _ = resolved
+        assert backend.write_tests.call_count == 1
+        written = backend.write_tests.call_args[0][0]
+        assert [n for n, _ in written] == ['a', 'c']
+        assert all(r.result == 'skip' for _, r in written)
+        assert not backend.write_test.called
+
+    def test_logged(self, resolved):
+        """The skips are counted by the log."""
+        _, _, log = resolved
+        log.record.assert_called_once_with('skip', 2)
+
+    def test_released(self):
+        """The results of the skipped tests aren't kept by the tests."""
+        test = self._Skip(['a'])
+        tests = [('a', test)]
+        profile._resolve_skips([(profile.TestProfile(), tests)], mock.Mock(),
+                               profile._Writer(mock.Mock(), [tests]))
+        assert test._result is None
+
+
+class TestRun(object):
+    """Tests for the run function."""
+
+    class _Backend(object):
+        """A backend that keeps the results in a dictionary."""
+
+        def __init__(self):
+            self.results = {}
+
+        @contextlib.contextmanager
+        def write_test(self, name):
+            assert name not in self.results
+            self.results[name] = None
+            yield functools.partial(self.results.__setitem__, name)
+
+        def write_tests(self, tests):
+            self.results.update(tests)
+
+    class _Test(utils.Test):
+        """A test that sets its subtests when it's run."""
+
+        def __init__(self, subtests, batch_of=None):
+            super(TestRun._Test, self).__init__(['true'], run_concurrent=True)
+            self.batch_of = batch_of
+            self.__subtests = subtests
+
+        def run(self):
+            self.result.subtests.update(self.__subtests)
+
+    @staticmethod
+    def _run(tests):
+        """Run the tests, and return the results by the full names."""
+        prof = profile.TestProfile()
+        prof.test_list.update(tests)
+        backend = TestRun._Backend()
+        profile.run([prof], 'dummy', backend, 'all')
+        return {grouptools.join(name, subtest): status
+                for name, result in six.iteritems(backend.results)
+                for subtest, status in six.iteritems(result.subtests)}
+
+    def test_batch_of(self):
+        """profile.run: batches are written as the test they are part of."""
+        subtests = {'a': 'pass', 'b': 'fail', 'c': 'crash', 'd': 'pass'}
+        batches = {}
+        for i, names in enumerate([['a', 'b'], ['c'], ['d']]):
+            batches[grouptools.join('dir', 'batch{}'.format(i))] = \
+                self._Test({n: subtests[n] for n in names}, batch_of='dir')
+
+        expected = self._run({'dir': self._Test(subtests)})
+        assert self._run(batches) == expected
@@ -116,6 +116,8 @@ class TestTestResult(object):
                     'exception': 'an exception',
                     'dmesg': 'this is dmesg',
                     'pid': [1934],
+                    'truncated': [{'stream': 'out', 'total': 10,
+                                   'dropped': 5, 'file': None}],
                 }
 
                 cls.test = results.TestResult.from_dict(cls.dict)
@@ -172,6 +174,10 @@ class TestTestResult(object):
                 """sets pid properly."""
                 assert self.test.pid == self.dict['pid']
 
+            def test_truncated(self):
+                """sets truncated properly."""
+                assert self.test.truncated == self.dict['truncated']
+
         class TestResult(object):
             """Tests for TestResult.result getter and setter methods."""
 
@@ -233,6 +239,8 @@ class TestTestResult(object):
             test.dmesg = 'this is dmesg'
             test.pid = 1934
             test.traceback = 'a traceback'
+            test.truncated = [{'stream': 'err', 'total': 10, 'dropped': 5,
+                               'file': 'output/foo.txt'}]
 
             cls.test = test
             cls.json = test.to_json()
@@ -285,6 +293,10 @@ class TestTestResult(object):
             """results.TestResult.to_json: Adds the traceback attribute"""
             assert self.test.traceback == self.json['traceback']
 
+        def test_truncated(self):
+            """results.TestResult.to_json: Adds the truncated attribute"""
+            assert self.test.truncated == self.json['truncated']
+
     class TestUpdate(object):
         """Tests for TestResult.update."""
 
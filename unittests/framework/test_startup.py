@@ -0,0 +1,134 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Startup imports of the piglit command.
+
+These run the piglit script in a new interpreter, and check which modules are
+in sys.modules when it finishes. They're meant to catch something like an
+eager import of mako or of every test class.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import os
+import subprocess
+import sys
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import pytest
+
+from .backends import shared
+
+# pylint: disable=no-self-use
+
+_PIGLIT = os.path.join(os.path.dirname(__file__), '..', '..', 'piglit')
+
+# Run a script as __main__ and then write the names of the imported modules to
+# a file.
+_WRAPPER = """
+import json, runpy, sys
+out = sys.argv[1]
+sys.argv = sys.argv[2:]
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit as e:
+    if e.code:
+        raise
+with open(out, 'w') as f:
+    json.dump(sorted(sys.modules), f)
+"""
+
+
+def _imported(tmpdir, *args):
+    """Run piglit with args, and return the names of the imported modules.
+
+    The results cache is put in tmpdir, so that nothing is written to the
+    user's cache.
+
+    """
+    out = tmpdir.join('modules.json')
+    env = os.environ.copy()
+    env['XDG_CACHE_HOME'] = str(tmpdir.join('cache'))
+    proc = subprocess.Popen(
+        [sys.executable, '-c', _WRAPPER, str(out), _PIGLIT] + list(args),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    _, err = proc.communicate()
+    assert proc.returncode == 0, err
+
+    with out.open('r') as f:
+        return set(json.load(f))
+
+
+class TestHelp(object):
+    """Tests for piglit --help."""
+
+    @pytest.fixture(scope='class')
+    def imported(self, tmpdir_factory):
+        return _imported(tmpdir_factory.mktemp('startup'), '--help')
+
+    def test_no_programs(self, imported):
+        """None of the program modules are imported."""
+        assert not [m for m in imported if m.startswith('framework.programs')]
+
+    def test_no_backends(self, imported):
+        """None of the backends are imported."""
+        assert not [m for m in imported if m.startswith('framework.backends')]
+
+
+class TestSummaryConsole(object):
+    """Tests for piglit summary console -s."""
+
+    @pytest.fixture(scope='class')
+    def imported(self, tmpdir_factory):
+        tmpdir = tmpdir_factory.mktemp('startup')
+        results = tmpdir.join('results.json')
+        with results.open('w') as f:
+            json.dump(shared.JSON, f)
+        return _imported(tmpdir, 'summary', 'console', '-s', str(results))
+
+    @pytest.mark.parametrize('module', [
+        'mako',
+        'framework.profile',
+        'framework.backends.junit',
+    ])
+    def test_not_imported(self, imported, module):
+        """Modules only needed by other commands aren't imported."""
+        assert module not in imported
+
+
+def test_backends_lazy():
+    """Importing framework.backends doesn't import a backend or the cache."""
+    proc = subprocess.Popen(
+        [sys.executable, '-c',
+         'import json, sys; import framework.backends; '
+         'print(json.dumps(sorted(sys.modules)))'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        cwd=os.path.join(os.path.dirname(__file__), '..', '..'))
+    out, err = proc.communicate()
+    assert proc.returncode == 0, err
+
+    modules = json.loads(out.decode('utf-8'))
+    assert 'framework.backends.cache' not in modules
+    assert 'framework.backends.json' not in modules
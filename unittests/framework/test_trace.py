@@ -0,0 +1,117 @@
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# This permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE AUTHOR(S) BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF
+# OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""Tests for the trace module."""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals
+)
+import threading
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import six
+
+from framework import trace
+
+# pylint: disable=no-self-use,protected-access
+
+
+def _events(tracer, cat):
+    return [e for e in tracer.to_json()['traceEvents'] if e.get('cat') == cat]
+
+
+class TestTracer(object):
+    """Tests for the Tracer class."""
+
+    def test_test_event(self):
+        """trace.Tracer.test: records a complete event with its args."""
+        tracer = trace.Tracer()
+        with tracer.test('foo', 'serial') as args:
+            args['status'] = 'pass'
+
+        event, = _events(tracer, 'test')
+        assert event['name'] == 'foo'
+        assert event['ph'] == 'X'
+        assert event['pid'] == trace.POOLS['serial']
+        assert event['tid'] == 1
+        assert event['dur'] >= 0
+        assert event['args'] == {'status': 'pass'}
+
+    def test_phase(self):
+        """trace.phase: records phases of the running test."""
+        tracer = trace.Tracer()
+        with tracer.test('foo', 'concurrent'):
+            with trace.phase('spawn'):
+                pass
+
+        event, = _events(tracer, 'phase')
+        assert event['name'] == 'spawn'
+        assert event['pid'] == trace.POOLS['concurrent']
+
+    def test_phase_untraced(self):
+        """trace.phase: does nothing outside of a traced test."""
+        tracer = trace.Tracer()
+        with trace.phase('spawn'):
+            pass
+        with tracer.test('foo', 'concurrent'):
+            pass
+        with trace.phase('spawn'):
+            pass
+
+        assert _events(tracer, 'phase') == []
+
+    def test_workers(self):
+        """trace.Tracer.test: each thread in a pool gets its own worker id."""
+        tracer = trace.Tracer()
+        barrier = threading.Event()
+
+        def run(name):
+            with tracer.test(name, 'concurrent'):
+                barrier.wait(5)
+
+        threads = [threading.Thread(target=run, args=(n,))
+                   for n in ['a', 'b']]
+        for t in threads:
+            t.start()
+        barrier.set()
+        for t in threads:
+            t.join()
+
+        assert sorted(e['tid'] for e in _events(tracer, 'test')) == [1, 2]
+
+    def test_write(self, tmpdir):
+        """trace.Tracer.write: writes a trace event format file."""
+        tracer = trace.Tracer()
+        with tracer.test('foo', 'serial'):
+            pass
+        p = tmpdir.join('trace.json')
+        tracer.write(six.text_type(p))
+
+        with open(six.text_type(p)) as f:
+            data = json.load(f)
+        assert data['displayTimeUnit'] == 'ms'
+        names = [e['args']['name'] for e in data['traceEvents']
+                 if e['ph'] == 'M' and e['name'] == 'process_name']
+        assert sorted(names) == ['concurrent', 'serial']
+